@@ -0,0 +1,241 @@
+"""
+Cache of chatbot answers from the language model
+Most questions that reach Gemini are the same few FAQs, so answers are kept in a
+bounded LRU map keyed on the routed intent and the normalized question text
+(lowercase, punctuation and spacing dropped; no semantic matching). Entries
+expire after a TTL. Identical questions that arrive while the first one is
+still waiting on Gemini share its call instead of making their own
+(singleflight); a failed call is shared the same way but never cached.
+A streamed answer is in flight until its last chunk: identical questions
+wait for it and get the whole answer.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+
+_WORD = re.compile(r"\w+(?:['.]\w+)*")
+
+
+def normalize_question(message):
+    """'What is HDD  and CDD?' and 'what is hdd and cdd' give the same text"""
+    return ' '.join(_WORD.findall(message.lower().replace('’', "'")))
+
+
+class _Flight:
+    """One upstream call that identical questions wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.answer = None
+        self.error = None
+        self.waiters = 0
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU map from (intent, normalized question) to answer text.
+
+    max_entries: answers kept before the least recently used one is evicted
+        (0 disables caching; concurrent identical questions still share a call).
+    ttl_seconds: age after which an answer is asked again (0 = never expires).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (stored_at, answer)
+        self._flights = {}  # key -> _Flight in progress
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _lookup(self, key, now):
+        """Cached answer or None (lock held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds and now - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, key):
+        """The cached answer for key, or None (counted as a hit or miss)"""
+        with self._lock:
+            answer = self._lookup(key, self._clock()) if self.enabled else None
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, key, answer):
+        """Remember an answer, evicting the least recently used ones"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def begin(self, key):
+        """
+        Start answering key: (answer, None) for a cached answer or the answer of an identical
+        question already in flight (waited for; its error is raised), otherwise (None, flight)
+        and the caller makes the upstream call, then ends the flight with finish().
+        """
+        while True:
+            with self._lock:
+                answer = self._lookup(key, self._clock()) if self.enabled else None
+                if answer is not None:
+                    self.hits += 1
+                    return answer, None
+                self.misses += 1
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    self.upstream_calls += 1
+                    return None, flight
+                flight.waiters += 1
+                self.shared += 1
+
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.answer is not None:
+                return flight.answer, None
+            # The call was abandoned without an answer: ask again
+
+    def finish(self, key, flight, answer=None, error=None):
+        """
+        End a flight from begin(): cache its answer and hand it to the waiting questions,
+        hand them its error, or (neither) let them ask again. Later calls are ignored.
+        """
+        with self._lock:
+            if flight.done.is_set():
+                return
+            if error is not None:
+                self.upstream_errors += 1
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.answer, flight.error = answer, error
+        if answer is not None:
+            self.put(key, answer)
+        flight.done.set()
+
+    def get_or_call(self, key, call):
+        """
+        The cached answer for key, or the result of call() (shared with identical
+        questions asked meanwhile). Exceptions from call() reach every caller
+        waiting on it and nothing is cached.
+        """
+        answer, flight = self.begin(key)
+        if flight is None:
+            return answer
+        try:
+            answer = call()
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            raise
+        except BaseException:
+            self.finish(key, flight)  # Interrupted: the waiting questions ask again
+            raise
+        self.finish(key, flight, answer)
+        return answer
+
+    def get_or_stream(self, key, stream):
+        """
+        The cached answer for key (or an identical question's answer in flight, once complete)
+        as a string, or a StreamedAnswer over the chunks of stream(). Exceptions from stream()
+        reach every caller waiting on it.
+        """
+        answer, flight = self.begin(key)
+        if flight is None:
+            return answer
+        try:
+            chunks = stream()
+        except Exception as e:
+            self.finish(key, flight, error=e)
+            raise
+        except BaseException:
+            self.finish(key, flight)
+            raise
+        return StreamedAnswer(self, key, flight, chunks)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'shared': self.shared,  # Misses that waited on an identical question's call
+                'upstream_calls': self.upstream_calls,
+                'upstream_errors': self.upstream_errors,
+                'in_flight': len(self._flights),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class StreamedAnswer:
+    """
+    An answer's chunks passed through as they arrive. The whole answer is cached and handed
+    to the questions waiting on its flight after the last chunk; an error from the chunks is
+    handed to them instead, and close() before the end lets them ask again.
+    """
+
+    def __init__(self, cache, key, flight, chunks):
+        self._cache = cache
+        self._key = key
+        self._flight = flight
+        self._chunks = iter(chunks)
+        self._parts = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._cache.finish(self._key, self._flight, ''.join(self._parts))
+            raise
+        except Exception as e:
+            self._cache.finish(self._key, self._flight, error=e)
+            raise
+        self._parts.append(chunk)
+        return chunk
+
+    def close(self):
+        self._cache.finish(self._key, self._flight)
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
@@ -3,7 +3,10 @@ Flask Backend for Smart Energy Prediction Model
 Serves predictions, handles authentication, file uploads, and chatbot integration
 """
 
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
 import os
@@ -12,7 +15,9 @@ import joblib
 from functools import wraps
 from datetime import timedelta
 import json
-import io
+import re
+import shutil
+import threading
 
 # Lazy imports for Python 3.14 compatibility
 try:
@@ -22,23 +27,37 @@ except ImportError:
     np = None
     pd = None
 
-# Skip google-generativeai for Python 3.14 compatibility - use fallback
-genai = None
-try:
-    import google.generativeai as genai_module
-    genai = genai_module
-except Exception as e:
-    print(f"[WARNING] Skipping google-generativeai: {e}")
-    genai = None
-
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
+from answer_cache import (DEFAULT_MAX_ENTRIES as DEFAULT_ANSWER_CACHE_SIZE, DEFAULT_TTL_SECONDS as DEFAULT_ANSWER_CACHE_TTL,
+                          AnswerCache, StreamedAnswer, normalize_question)
+from chat_extract import extract_prediction_fields
+from feature_engine import (FEATURE_ORDER, DeduplicationReport, columns_from_records, engineer_feature_matrix,
+                            unique_input_rows)
+from file_ingest import CSV_EXTENSIONS, DEFAULT_CHUNK_ROWS, iter_upload_chunks, split_upload_type, upload_type
+from input_schema import CATEGORICAL_FIELDS, PREDICTION_FIELDS, ValidationReport, validate_columns
+from intent_router import IntentRouter
+from pdf_extract import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS, page_timing_report
+from flat_ensemble import FlatEnsemble, compile_model
+from interpolation_surface import InterpolationSurface, axis_points, parse_grid_points, SURFACE_FIELDS
+from llm_client import (DEFAULT_BASE_URL as DEFAULT_GEMINI_BASE_URL, DEFAULT_BREAKER_FAILURES, DEFAULT_BREAKER_RESET,
+                        DEFAULT_MAX_CONCURRENCY as DEFAULT_GEMINI_CONCURRENCY, DEFAULT_MODEL as DEFAULT_GEMINI_MODEL,
+                        DEFAULT_TIMEOUT as DEFAULT_GEMINI_TIMEOUT, CircuitBreaker, GeminiClient, LLMUnavailable)
+from model_manager import ModelManager, ModelValidationError, load_pinned
+from micro_batcher import DEFAULT_MAX_BATCH, DEFAULT_WINDOW_MS, MicroBatcher
+from prediction_cache import DEFAULT_MAX_ENTRIES, DEFAULT_MAX_ROWS, DEFAULT_TTL_SECONDS, PredictionCache, input_keys
+from prediction_jobs import DEFAULT_PAGE_SIZE, DEFAULT_WORKERS, INPUT_FIELDS, PredictionJobQueue, clamp_page_size
+from prediction_stats import PredictionStatistics
+from result_cache import DEFAULT_MAX_MB as DEFAULT_RESULT_CACHE_MB, ResultCache, result_cache_key
+from result_export import EXPORT_FORMATS, export_filename, iter_csv_export, iter_parquet_export
+from scoring import run_model, score_chunk
+from upload_spool import DEFAULT_MAX_UPLOAD_MB, SpoolingRequest, remove_stale_spool_files, upload_digest
 
 load_dotenv()
 
+# Per-phase startup durations in seconds, logged once the model is loaded and shown by /api/health
+startup_timings = {'imports': round(time.perf_counter() - _import_started, 3)}
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*", "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "allow_headers": ["Content-Type", "Authorization"]}})
 
@@ -48,32 +67,79 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    # Every response names the model version the request was (or would be) scored with
+    version = serving_model().version
+    if version:
+        response.headers['X-Model-Version'] = version
+        response.headers.add('Access-Control-Expose-Headers', 'X-Model-Version')
     return response
 
 # Configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+MAX_UPLOAD_MB = float(os.getenv('MAX_UPLOAD_MB', DEFAULT_MAX_UPLOAD_MB))  # Largest accepted request body
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'pdf', 'csv', 'txt'}
+UPLOAD_SPOOL_FOLDER = os.getenv('UPLOAD_SPOOL_FOLDER', os.path.join(UPLOAD_FOLDER, 'spool'))  # Large uploads land here
+ALLOWED_EXTENSIONS = {'pdf', 'csv', 'txt', 'parquet', 'arrow', 'feather'}
+FILE_CHUNK_ROWS = int(os.getenv('FILE_CHUNK_ROWS', DEFAULT_CHUNK_ROWS))  # Rows scored per model call for uploads
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', DEFAULT_PDF_WORKERS))  # Processes extracting PDF pages
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'sklearn').strip().lower()  # 'sklearn' or 'flat'
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', DEFAULT_MAX_ENTRIES))  # 0 disables the cache
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', DEFAULT_TTL_SECONDS))  # Seconds, 0 = no expiry
+PREDICTION_CACHE_MAX_ROWS = int(os.getenv('PREDICTION_CACHE_MAX_ROWS', DEFAULT_MAX_ROWS))  # Bigger requests skip the cache
+MICRO_BATCH_WINDOW_MS = float(os.getenv('MICRO_BATCH_WINDOW_MS', DEFAULT_WINDOW_MS))  # 0 disables micro-batching
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', DEFAULT_MAX_BATCH))
+FAST_START = os.getenv('FAST_START', '').strip().lower() in ('1', 'true', 'yes', 'on')  # Load the model in the background
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 60))  # Seconds between artifact checks, 0 disables
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()}  # May call /api/model/reload
+PREDICTION_JOB_WORKERS = int(os.getenv('PREDICTION_JOB_WORKERS', DEFAULT_WORKERS))  # Processes scoring queued uploads
+PREDICTION_JOBS_FOLDER = os.getenv('PREDICTION_JOBS_FOLDER', os.path.join(UPLOAD_FOLDER, 'jobs'))
+RESULT_CACHE_MB = float(os.getenv('RESULT_CACHE_MB', DEFAULT_RESULT_CACHE_MB))  # Disk kept for re-uploaded files' results, 0 disables
+RESULT_CACHE_FOLDER = os.getenv('RESULT_CACHE_FOLDER', os.path.join(UPLOAD_FOLDER, 'result_cache'))
+CHATBOT_WHOLE_WORDS = os.getenv('CHATBOT_WHOLE_WORDS', '').strip().lower() in ('1', 'true', 'yes', 'on')  # 'hi' no longer matches 'this'
+FAST_SURFACE = os.getenv('FAST_SURFACE', '').strip().lower() in ('1', 'true', 'yes', 'on')  # Precompute ?mode=fast grid
+FAST_SURFACE_GRID = parse_grid_points(os.getenv('FAST_SURFACE_GRID', ''))  # e.g. 'square_footage=40,hvac_appliances=21'
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+os.makedirs(UPLOAD_SPOOL_FOLDER, exist_ok=True)
+_stale_spool_files = remove_stale_spool_files(UPLOAD_SPOOL_FOLDER)
+if _stale_spool_files:
+    print(f"[INFO] Removed {_stale_spool_files} stale upload spool file(s) from {UPLOAD_SPOOL_FOLDER}")
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Uploaded files are streamed to disk while the request body is read, not held in memory
+SpoolingRequest.spool_folder = UPLOAD_SPOOL_FOLDER
+app.request_class = SpoolingRequest
+
 jwt = JWTManager(app)
 
+# Repeated inputs are answered from here; entries belong to the model that produced them
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, max_rows=PREDICTION_CACHE_MAX_ROWS)
+
+# Results of scored files, found again by the upload's content hash and the model version
+result_cache = ResultCache(RESULT_CACHE_FOLDER, RESULT_CACHE_MB * 1024 * 1024)
+
+# Chatbot messages are routed by the intent keywords they contain, counted for the traffic mix
+chat_intents = IntentRouter(whole_words=CHATBOT_WHOLE_WORDS)
+
+# Large uploads submitted as jobs are scored by separate low-priority processes
+prediction_jobs = PredictionJobQueue(PREDICTION_JOBS_FOLDER, PREDICTION_JOB_WORKERS, FILE_CHUNK_ROWS,
+                                     pdf_workers=PDF_EXTRACT_WORKERS, result_cache=result_cache)
+
 # Load the trained model and scaler from multiple possible locations
 energy_model = None
 feature_scaler = None
 model_performance = None
+model_state = 'loading'  # 'loading' -> 'ready' (or 'missing' when no model was found)
 
 candidate_paths = [
+    os.getenv('MODEL_PATH', ''),
     os.path.join(os.path.dirname(__file__), '..', 'energy_model.pkl'),
     os.path.join(os.path.dirname(__file__), 'energy_model.pkl'),
     os.path.join(os.getcwd(), 'energy_model.pkl'),
-    r"C:\Users\Pranjal Giri\OneDrive\Desktop\Infosys springboard\energy_model.pkl"
 ]
 
 scaler_paths = [
@@ -82,66 +148,286 @@ scaler_paths = [
     os.path.join(os.getcwd(), 'feature_scaler.pkl'),
 ]
 
+# Directories are memory-mapped and shared by every worker process; .npz archives are loaded per process
+flat_model_paths = [
+    os.getenv('FLAT_MODEL_PATH', ''),
+    os.path.join(os.path.dirname(__file__), '..', 'energy_model.flat'),
+    os.path.join(os.path.dirname(__file__), 'energy_model.flat'),
+    os.path.join(os.getcwd(), 'energy_model.flat'),
+    os.path.join(os.path.dirname(__file__), '..', 'energy_model.flat.npz'),
+    os.path.join(os.path.dirname(__file__), 'energy_model.flat.npz'),
+    os.path.join(os.getcwd(), 'energy_model.flat.npz'),
+]
+
 performance_paths = [
     os.path.join(os.path.dirname(__file__), '..', 'model_performance.pkl'),
     os.path.join(os.path.dirname(__file__), 'model_performance.pkl'),
     os.path.join(os.getcwd(), 'model_performance.pkl'),
 ]
 
-# Load main model
-for p in candidate_paths:
+def record_phase(name, started):
+    """Store how long a startup phase took"""
+    startup_timings[name] = round(time.perf_counter() - started, 3)
+
+def export_flat_model(model, path):
+    """Save a freshly compiled model next to the pickle and reopen it memory-mapped.
+
+    Workers that start later (or a restart) then map the same files instead of
+    compiling their own private copy. Returns (model, version of the export), or the
+    in-memory model and None if the export fails.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    old_path = None
     try:
-        abs_p = os.path.abspath(p)
-        if os.path.exists(abs_p):
-            energy_model = joblib.load(abs_p)
-            print(f"[OK] Energy model loaded from {abs_p}")
-            break
-        else:
-            print(f"[INFO] Model not found at {abs_p}")
+        model.save(tmp_path)
+        if os.path.exists(path):
+            # Export of an older pickle: move it aside (processes still mapping it keep their pages)
+            old_path = f"{path}.old-{os.getpid()}"
+            try:
+                os.rename(path, old_path)
+            except OSError:
+                old_path = None
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another worker got there first; use its export
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+        shared, version = load_pinned(path, FlatEnsemble.load)
+        print(f"[OK] Flat model exported to {path} (memory-mapped)")
+        return shared, version
     except Exception as e:
-        print(f"[INFO] Attempt to load model at {abs_p} failed: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        print(f"[WARNING] Could not export flat model to {path}: {e}")
+        return model, None
 
-# Load scaler
-for p in scaler_paths:
-    try:
-        abs_p = os.path.abspath(p)
+def artifact_mtime(path):
+    """Newest modification time of a model file or export directory"""
+    if os.path.isdir(path):
+        return max((os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)), default=0.0)
+    return os.path.getmtime(path)
+
+def unique_paths(paths):
+    """Absolute paths in order, without blanks or repeats (the script dir and cwd are often the same)"""
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths if p))
+
+def find_model_pickle():
+    for abs_p in unique_paths(candidate_paths):
         if os.path.exists(abs_p):
-            feature_scaler = joblib.load(abs_p)
-            print(f"[OK] Feature scaler loaded from {abs_p}")
-            break
+            return abs_p
+        print(f"[INFO] Model not found at {abs_p}")
+    return None
+
+def load_energy_model():
+    """
+    Load the newest model artifact for INFERENCE_BACKEND; returns (model, artifact path, version),
+    the version hashed from the bytes that were loaded (all None when there is no artifact)
+    """
+    pickle_path = find_model_pickle()
+
+    # Flat-array backend: an exported node table needs neither xgboost nor lightgbm
+    if INFERENCE_BACKEND == 'flat':
+        for abs_p in unique_paths(flat_model_paths):
+            try:
+                if not os.path.exists(abs_p):
+                    continue
+                if pickle_path and artifact_mtime(pickle_path) > artifact_mtime(abs_p):
+                    print(f"[INFO] Flat model at {abs_p} is older than {pickle_path}, recompiling")
+                    continue
+                model, version = load_pinned(abs_p, FlatEnsemble.load)
+                shared = ', memory-mapped' if model.memory_mapped else ''
+                print(f"[OK] Flat model loaded from {abs_p} ({model.n_trees} trees, {model.n_nodes} nodes{shared})")
+                return model, abs_p, version
+            except Exception as e:
+                print(f"[INFO] Attempt to load flat model at {abs_p} failed: {e}")
+
+    # Load main model
+    if pickle_path is None:
+        print("[WARNING] Energy model not found in candidate paths")
+        return None, None, None
+    model, version = load_pinned(pickle_path, joblib.load)
+    print(f"[OK] Energy model loaded from {pickle_path}")
+
+    if INFERENCE_BACKEND == 'flat' and not isinstance(model, FlatEnsemble):
+        try:
+            model = compile_model(model)
+            print(f"[OK] Compiled model to flat arrays ({model.n_trees} trees, {model.n_nodes} nodes)")
+            export_path = os.path.join(os.path.dirname(pickle_path), 'energy_model.flat')
+            model, export_version = export_flat_model(model, export_path)
+            if export_version is not None and model.memory_mapped:
+                return model, export_path, export_version
+        except NotImplementedError as e:
+            print(f"[WARNING] Flat backend unavailable, using the loaded model: {e}")
+    return model, pickle_path, version
+
+# Inputs every new model must score before it may serve (defaults plus the range edges)
+SMOKE_TEST_COLUMNS = {
+    'temperature': [20, -10, 50],
+    'humidity': [50, 0, 100],
+    'square_footage': [5000, 500, 50000],
+    'month': [1, 1, 12],
+    'time': [12, 0, 23],
+    'hvac_appliances': [1, 0, 20],
+}
+
+def validate_model(model):
+    """Reject models that do not take the 28 engineered features or do not produce finite numbers"""
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(FEATURE_ORDER):
+        raise ModelValidationError(f'Model expects {n_features} features, the app builds {len(FEATURE_ORDER)}')
+    predictions = run_model(model, engineer_feature_matrix(SMOKE_TEST_COLUMNS))
+    if predictions.shape != (3,) or not np.isfinite(predictions).all():
+        raise ModelValidationError(f'Smoke prediction returned {predictions!r}')
+
+def use_serving_model(serving):
+    """Point the module-level model at a newly validated one"""
+    global energy_model, model_state
+    energy_model = serving.model
+    model_state = 'ready'
+    if FAST_SURFACE:
+        # Built off the request path; ?mode=fast falls back to the model until it is ready
+        threading.Thread(target=build_fast_surface, args=(serving,), name='fast-surface', daemon=True).start()
+
+# Interpolation grid behind ?mode=fast, rebuilt for every model version and cached on disk across restarts
+fast_surface = None
+FAST_SURFACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energy_model.surface.npz')
+
+def build_fast_surface(serving):
+    """Score the model over the FAST_SURFACE_GRID and measure the interpolation error"""
+    global fast_surface
+    started = time.perf_counter()
+    bounds = {field: PREDICTION_FIELDS[field][1:3] for field in SURFACE_FIELDS}
+
+    def predict(columns, n_rows):
+        return run_model(serving.model, engineer_feature_matrix(columns, n_rows=n_rows))
+
+    surface = None
+    try:
+        if os.path.exists(FAST_SURFACE_PATH):
+            cached = InterpolationSurface.load(FAST_SURFACE_PATH)
+            expected = [axis_points(f, *bounds[f], FAST_SURFACE_GRID[f]) for f in SURFACE_FIELDS]
+            if cached.version == serving.version and all(
+                    np.array_equal(a, b) for a, b in zip(cached.axes, expected)):
+                surface = cached
+                print(f"[OK] Fast surface for {serving.version} loaded from {FAST_SURFACE_PATH}")
     except Exception as e:
-        print(f"[INFO] Scaler not found at {abs_p}")
+        print(f"[INFO] Cached fast surface at {FAST_SURFACE_PATH} not usable: {e}")
 
-# Load performance metrics
-for p in performance_paths:
     try:
-        abs_p = os.path.abspath(p)
-        if os.path.exists(abs_p):
-            model_performance = joblib.load(abs_p)
-            print(f"[OK] Model performance metrics loaded")
-            break
+        if surface is None:
+            surface = InterpolationSurface.build(predict, bounds, FAST_SURFACE_GRID, version=serving.version)
+            surface.measure_error(predict)
+            print(f"[OK] Fast surface built for {serving.version}: {surface.n_points} points in "
+                  f"{time.perf_counter() - started:.1f}s, mean error {surface.error['mean_abs_error_kwh']} kWh "
+                  f"({surface.error['mean_pct_error']}%), max {surface.error['max_abs_error_kwh']} kWh")
+            try:
+                surface.save(FAST_SURFACE_PATH)
+            except OSError as e:
+                print(f"[WARNING] Could not cache fast surface to {FAST_SURFACE_PATH}: {e}")
     except Exception as e:
-        print(f"[INFO] Performance metrics not found")
+        print(f"[ERROR] Fast surface build for {serving.version} failed: {e}")
+        return
 
-if energy_model is None:
-    print("[WARNING] Energy model not found in candidate paths")
-    
-if feature_scaler is None:
-    print("[WARNING] Feature scaler not found - using default scaler")
+    # A newer model may have been swapped in while this one was building
+    if model_manager.current.version == serving.version:
+        fast_surface = surface
+
+def model_watch_paths():
+    if INFERENCE_BACKEND == 'flat':
+        return unique_paths(candidate_paths + flat_model_paths)
+    return unique_paths(candidate_paths)
+
+model_manager = ModelManager(load_energy_model, validate_model, use_serving_model, model_watch_paths)
+
+def load_model_artifacts():
+    """Load the model, scaler and metrics, then mark the server ready"""
+    global feature_scaler, model_performance, model_state
+
+    started = time.perf_counter()
+    model_manager.reload(reason='startup')
+    if model_manager.current.model is None:
+        model_state = 'missing'
+    model_manager.watch(MODEL_WATCH_INTERVAL)
+    record_phase('model', started)
+
+    # Load scaler
+    started = time.perf_counter()
+    for p in scaler_paths:
+        try:
+            abs_p = os.path.abspath(p)
+            if os.path.exists(abs_p):
+                feature_scaler = joblib.load(abs_p)
+                print(f"[OK] Feature scaler loaded from {abs_p}")
+                break
+        except Exception as e:
+            print(f"[INFO] Scaler not found at {abs_p}")
+
+    # Load performance metrics
+    for p in performance_paths:
+        try:
+            abs_p = os.path.abspath(p)
+            if os.path.exists(abs_p):
+                model_performance = joblib.load(abs_p)
+                print(f"[OK] Model performance metrics loaded")
+                break
+        except Exception as e:
+            print(f"[INFO] Performance metrics not found")
 
-# Initialize Gemini API
+    if feature_scaler is None:
+        print("[WARNING] Feature scaler not found - using default scaler")
+    record_phase('scaler_and_metrics', started)
+
+    record_phase('total', _import_started)
+    print("[INFO] Startup timings: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in startup_timings.items()))
+
+# Gemini client for project questions: one reused HTTP session, hard per-call timeouts, a concurrency
+# limit and a circuit breaker; when Gemini is unavailable the chatbot answers from its fallback responses
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
-if GEMINI_API_KEY and genai:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        print("[OK] Gemini API configured")
-    except Exception as e:
-        print(f"[WARNING] Gemini API configuration failed: {e}")
-        GEMINI_API_KEY = ''
-        genai = None
-else:
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', DEFAULT_GEMINI_MODEL)
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', DEFAULT_GEMINI_BASE_URL)
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', DEFAULT_GEMINI_TIMEOUT))  # Seconds per call
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', DEFAULT_GEMINI_CONCURRENCY))  # Calls in flight per process
+GEMINI_BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', DEFAULT_BREAKER_FAILURES))  # Failures in a row that open the breaker
+GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', DEFAULT_BREAKER_RESET))  # Seconds before a trial call
+CHATBOT_ANSWER_CACHE_SIZE = int(os.getenv('CHATBOT_ANSWER_CACHE_SIZE', DEFAULT_ANSWER_CACHE_SIZE))  # 0 disables caching
+CHATBOT_ANSWER_CACHE_TTL = float(os.getenv('CHATBOT_ANSWER_CACHE_TTL', DEFAULT_ANSWER_CACHE_TTL))  # Seconds, 0 = no expiry
+
+gemini = GeminiClient(GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_BASE, GEMINI_TIMEOUT, GEMINI_MAX_CONCURRENCY,
+                      CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET))
+if not gemini.enabled:
     print("[INFO] Gemini API not available - chatbot will use fallback responses")
 
+# Repeated questions are answered from here; identical questions in flight share one Gemini call
+chat_answers = AnswerCache(CHATBOT_ANSWER_CACHE_SIZE, CHATBOT_ANSWER_CACHE_TTL)
+
+CHATBOT_SYSTEM_PROMPT = """You are an expert chatbot for the Smart Energy Prediction System. 
+        
+Your responsibilities:
+1. Answer questions about energy consumption prediction
+2. Explain how to use the prediction model (form input or file upload)
+3. Discuss energy efficiency factors (temperature, humidity, building size, heating/cooling)
+4. Guide users on using the application features
+5. Provide insights on energy saving and efficiency
+6. Help interpret prediction results
+7. Provide VARIED, context-aware responses - never repeat the same sentence twice
+
+IMPORTANT RULES:
+- Provide different angles and explanations for similar topics
+- For beginners: Simple, easy-to-understand explanations
+- For advanced users: Technical details about the model
+- Be specific: Mention concrete details like "92% accuracy", "LightGBM", "kWh"
+- If user asks about uploading files, mention supported formats: CSV, TXT, PDF
+- If user asks about credentials/authentication, explain they're already logged in
+- Make responses engaging and not repetitive
+
+Context about the system:
+- Model type: LightGBM Regressor with 92% accuracy
+- Input features: Temperature, Humidity, SquareFootage, Month, HDD, CDD, and derived features
+- Output: Predicted energy consumption in kWh
+- Users can input data via form or upload CSV/PDF files
+- Features like HDD (Heating Degree Days) and CDD (Cooling Degree Days) are calculated from temperature"""
+
 # In-memory user database (replace with real database in production)
 users_db = {
     'demo@example.com': {'password': 'password123', 'name': 'Demo User'},
@@ -149,93 +435,113 @@ users_db = {
 }
 
 # Feature engineering for predictions - MUST MATCH training_improved_model.py exactly (28 features)
+# The columnar engine in feature_engine.py does the work for any number of rows
 def engineer_features(input_data):
     """Apply comprehensive feature engineering matching training pipeline exactly"""
-    features = {}
-    
-    # Extract input with defaults
-    temperature = float(input_data.get('temperature', 20))
-    humidity = float(input_data.get('humidity', 50))
-    square_footage = float(input_data.get('square_footage', 5000))
-    month = int(input_data.get('month', 1))
-    hvac_appliances = int(input_data.get('hvac_appliances', 1))
-    time_of_day = int(input_data.get('time', 12))
-    
-    # ========== BASIC FEATURES (6 features) ==========
-    features['Temperature'] = temperature
-    features['Humidity'] = humidity
-    features['SquareFootage'] = square_footage
-    features['Month'] = month
-    features['Hour'] = time_of_day
-    features['HVAC_Appliances'] = hvac_appliances
-    
-    # ========== TEMPORAL FEATURES (4 features) ==========
-    # Cyclical encoding for month (sine and cosine) - MATCHES training
-    features['Month_sin'] = np.sin(2 * np.pi * month / 12)
-    features['Month_cos'] = np.cos(2 * np.pi * month / 12)
-    
-    # Hour cyclical encoding - MATCHES training
-    features['Hour_sin'] = np.sin(2 * np.pi * time_of_day / 24)
-    features['Hour_cos'] = np.cos(2 * np.pi * time_of_day / 24)
-    
-    # ========== DEGREE DAYS (6 features) ==========
-    # Heating Degree Days (HDD) - base 18°C (matches training)
-    hdd = max(0, 18 - temperature)
-    cdd = max(0, temperature - 22)
-    
-    features['HDD'] = hdd
-    features['CDD'] = cdd
-    features['HDD_Squared'] = hdd ** 2
-    features['CDD_Squared'] = cdd ** 2
-    
-    # Degree day interactions
-    features['HDD_x_SqFt'] = hdd * (square_footage / 1000)
-    features['CDD_x_SqFt'] = cdd * (square_footage / 1000)
-    
-    # ========== INTERACTION & DERIVED FEATURES (2 features) ==========
-    features['Temp_Humidity'] = temperature * humidity / 100
-    features['Temp_SqFt'] = temperature * (square_footage / 5000)
-    
-    # ========== ON/OFF FLAGS (4 features) ==========
-    # Use HDD/CDD for flags - MATCHES training exactly
-    features['Heating_On'] = 1 if hdd > 0 else 0
-    features['Cooling_On'] = 1 if cdd > 0 else 0
-    features['Peak_Hours'] = 1 if 14 <= time_of_day <= 19 else 0
-    features['Night_Hours'] = 1 if (time_of_day >= 22 or time_of_day <= 6) else 0
-    
-    # ========== DERIVED FEATURES (3 features) ==========
-    # Match training exactly
-    features['Temp_Deviation'] = abs(temperature - 20)
-    features['Humidity_Deviation'] = abs(humidity - 50)
-    features['LargeBuilding'] = 1 if square_footage > 7500 else 0
-    
-    # ========== POLYNOMIAL FEATURES (3 features) ==========
-    features['Temp_Squared'] = temperature ** 2
-    features['SqFt_Squared'] = (square_footage / 1000) ** 2
-    features['Humidity_Squared'] = humidity ** 2
-    
-    # Total: 28 features
-    
-    # Create DataFrame with features in EXACT order matching training
-    feature_order = [
-        'Temperature', 'Humidity', 'SquareFootage', 'Month', 'Hour', 'HVAC_Appliances',
-        'Month_sin', 'Month_cos', 'Hour_sin', 'Hour_cos',
-        'HDD', 'CDD', 'HDD_Squared', 'CDD_Squared',
-        'HDD_x_SqFt', 'CDD_x_SqFt',
-        'Temp_Humidity', 'Temp_SqFt',
-        'Heating_On', 'Cooling_On', 'Peak_Hours', 'Night_Hours',
-        'Temp_Deviation', 'Humidity_Deviation', 'LargeBuilding',
-        'Temp_Squared', 'SqFt_Squared', 'Humidity_Squared'
-    ]
-    
-    # Reorder features to match training
-    ordered_features = {k: features[k] for k in feature_order if k in features}
-    df = pd.DataFrame([ordered_features])
-    
-    return df
+    columns = columns_from_records([input_data])
+    return engineer_feature_matrix(columns, as_frame=True)
+
+# Validation rules live in input_schema.py and are shared by the form, batch and file endpoints
+BATCH_MAX_RECORDS = int(os.getenv('BATCH_MAX_RECORDS', 100000))
+
+def validate_records(records):
+    """
+    Validate form-style records column by column (same rules as predict_form).
+    Returns: dict of float64 input columns (one value per record) and a list
+    holding None for valid records or the record's validation messages
+    """
+    is_object = np.array([isinstance(r, dict) for r in records], dtype=bool)
+    rows = [r if ok else {} for r, ok in zip(records, is_object)]
+
+    raw_columns, present = {}, {}
+    for field in PREDICTION_FIELDS:
+        raw_columns[field] = pd.Series([r.get(field) for r in rows], dtype=object).to_numpy()
+        present[field] = np.array([field in r for r in rows], dtype=bool)
+    for field, (default, _, _) in CATEGORICAL_FIELDS.items():
+        raw_columns[field] = pd.Series([r.get(field, default) for r in rows], dtype=object).to_numpy()
+
+    result = validate_columns(raw_columns, len(records), present)
+    errors = result.row_errors()
+    for i in np.flatnonzero(~is_object).tolist():
+        errors[i] = ['Record must be a JSON object']
+    return result.columns, errors
+
+def predict_columns(columns, n_rows=None, dedup=None):
+    """
+    Engineer features for all rows at once and run the model in a single call.
+    Repeated input rows are scored once and their prediction copied back to every
+    occurrence; dedup (a DeduplicationReport) records how many rows that saved.
+    """
+    unique, inverse = unique_input_rows(columns, n_rows)
+    if dedup is not None:
+        dedup.add(len(inverse), len(unique['temperature']))
+    return predict_features(engineer_feature_matrix(unique))[inverse]
+
+def serving_model():
+    """The model this request scores with; picked once per request so a reload mid-request cannot mix versions"""
+    try:
+        if 'serving_model' not in g:
+            g.serving_model = model_manager.current
+        return g.serving_model
+    except RuntimeError:  # No request context (startup, background work)
+        return model_manager.current
+
+def predict_features(features):
+    """Predict an (N, 28) feature matrix, answering repeated inputs of small requests from the prediction cache"""
+    model = serving_model().model
+    if not prediction_cache.accepts(len(features)):
+        return score_rows(model, features)  # Bulk chunks: no per-row keys, no evicting interactive entries
+
+    keys = input_keys(features)
+    cached = prediction_cache.lookup(keys, model)
+    missing = [i for i, value in enumerate(cached) if value is None]
+    predictions = np.array([np.nan if value is None else value for value in cached], dtype=np.float64)
+    if missing:
+        fresh = score_rows(model, features if len(missing) == len(keys) else features[missing])
+        predictions[missing] = fresh
+        prediction_cache.store([keys[i] for i in missing], fresh, model)
+    return predictions
+
+def score_rows(model, features):
+    """Single rows share a model call with concurrent requests; larger inputs go straight through"""
+    if len(features) == 1 and micro_batcher.enabled:
+        return np.array([micro_batcher.submit(model, features[0])])
+    return run_model(model, features)
+
+# Concurrent single-row requests (form, chatbot) are scored together in one model call
+micro_batcher = MicroBatcher(run_model, MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE)
+
+def prediction_surface(data=None):
+    """The interpolation surface if this request asked for mode=fast and one is ready for its model"""
+    mode = request.args.get('mode') or (data.get('mode') if isinstance(data, dict) else None)
+    if str(mode).strip().lower() != 'fast':
+        return None
+    surface = fast_surface
+    if surface is None or surface.version != serving_model().version:
+        return None
+    return surface
+
+def mode_details(surface):
+    """Response fields saying how a prediction was made"""
+    if surface is None:
+        return {'mode': 'exact'}
+    return {'mode': 'fast', 'approximation_error': surface.error}
+
+def model_unavailable_details():
+    if model_state == 'loading':
+        return 'Energy prediction model is still loading. Please retry in a few seconds.'
+    return 'Energy prediction model is not loaded. Please restart the server.'
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    """CSV/TXT/PDF/Parquet/Arrow uploads; CSV and TXT may also be gzip, bz2 or zstd compressed"""
+    file_type = upload_type(filename)
+    if file_type is None:
+        return False
+    base, compression = split_upload_type(file_type)
+    return base in ALLOWED_EXTENSIONS and (compression is None or base in CSV_EXTENSIONS)
+
+def is_truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on', 'ndjson')
 
 # Routes
 
@@ -243,10 +549,14 @@ def allowed_file(filename):
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy',
+        'status': 'starting' if model_state == 'loading' else 'healthy',
+        'ready': model_state != 'loading',
         'model_loaded': energy_model is not None,
+        'inference_backend': 'flat' if isinstance(energy_model, FlatEnsemble) else 'sklearn',
+        'model_version': model_manager.current.version,
+        'startup_timings': startup_timings,
         'timestamp': pd.Timestamp.now().isoformat()
-    }), 200
+    }), 503 if model_state == 'loading' else 200
 
 @app.route('/api/auth/signup', methods=['POST'])
 def signup():
@@ -319,46 +629,8 @@ def predict_form():
             return jsonify({'error': 'No input data provided'}), 400
         
         # ========== INPUT VALIDATION ==========
-        # Validate required fields
-        required_fields = {
-            'temperature': (float, -10, 50, 'Temperature (°C)'),
-            'humidity': (float, 0, 100, 'Humidity (%)'),
-            'square_footage': (float, 500, 50000, 'Square footage (sqft)'),
-            'month': (int, 1, 12, 'Month (1-12)'),
-            'hvac_appliances': (int, 0, 20, 'HVAC Appliances count'),
-            'time': (int, 0, 23, 'Hour of day (0-23)')
-        }
-        
-        validation_errors = []
-        
-        for field, (field_type, min_val, max_val, field_label) in required_fields.items():
-            if field not in data:
-                validation_errors.append(f"Missing: {field_label}")
-                continue
-            
-            try:
-                value = field_type(data[field])
-                if not (min_val <= value <= max_val):
-                    validation_errors.append(
-                        f"{field_label} must be between {min_val} and {max_val}. Got {value}."
-                    )
-            except (ValueError, TypeError):
-                validation_errors.append(f"{field_label} must be a valid {field_type.__name__}")
-        
-        # Validate categorical fields
-        valid_hvac_types = ['central-ac', 'heat-pump', 'window-ac', 'baseboard', 'other']
-        hvac_type = data.get('hvac_type', 'central-ac').lower()
-        if hvac_type not in valid_hvac_types:
-            validation_errors.append(
-                f"HVAC Type must be one of: {', '.join(valid_hvac_types)}"
-            )
-        
-        valid_seasons = ['winter', 'spring', 'summer', 'fall']
-        season = data.get('season', 'spring').lower()
-        if season not in valid_seasons:
-            validation_errors.append(
-                f"Season must be one of: {', '.join(valid_seasons)}"
-            )
+        # Same schema (input_schema.py) as the batch and file endpoints
+        validation_errors = validate_records([data])[1][0] or []
         
         # Return validation errors if any
         if validation_errors:
@@ -368,28 +640,33 @@ def predict_form():
                 'received_data': data
             }), 400
         
+        # ?mode=fast interpolates the precomputed surface and needs no features
+        surface = prediction_surface(data)
+        
         # ========== FEATURE ENGINEERING ==========
-        try:
-            features_df = engineer_features(data)
-            print(f"[DEBUG] Engineered {len(features_df.columns)} features")
-            print(f"[DEBUG] Feature columns: {list(features_df.columns)}")
-        except Exception as e:
-            print(f"[ERROR] Feature engineering failed: {str(e)}")
-            return jsonify({
-                'error': 'Feature engineering failed',
-                'details': str(e)
-            }), 500
+        if surface is None:
+            try:
+                features_df = engineer_features(data)
+            except Exception as e:
+                print(f"[ERROR] Feature engineering failed: {str(e)}")
+                return jsonify({
+                    'error': 'Feature engineering failed',
+                    'details': str(e)
+                }), 500
         
         # ========== MODEL PREDICTION ==========
         if energy_model is None:
             return jsonify({
                 'error': 'Model not available',
-                'details': 'Energy prediction model is not loaded. Please restart the server.'
+                'details': model_unavailable_details()
             }), 503
         
         try:
             # Get prediction - features are UNSCALED (raw values)
-            prediction = float(energy_model.predict(features_df)[0])
+            if surface is not None:
+                prediction = surface.predict_one(data)
+            else:
+                prediction = float(predict_features(features_df.to_numpy())[0])
             
             # Basic sanity check
             if prediction < 0:
@@ -410,6 +687,8 @@ def predict_form():
                 'prediction': prediction,
                 'unit': 'kWh',
                 'confidence': confidence,
+                'model_version': serving_model().version,
+                **mode_details(surface),
                 'input_data': {
                     'temperature': float(data.get('temperature')),
                     'humidity': float(data.get('humidity')),
@@ -452,6 +731,74 @@ def predict_form():
             'details': str(e)
         }), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+@jwt_required()
+def predict_batch():
+    """Predict energy consumption for many form-style records in one request"""
+    try:
+        data = request.get_json(silent=True)
+        records = data.get('records') if isinstance(data, dict) else data
+        
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'Provide a non-empty list of records (or {"records": [...]})'}), 400
+        
+        if len(records) > BATCH_MAX_RECORDS:
+            return jsonify({
+                'error': 'Too many records',
+                'details': f'A batch may contain at most {BATCH_MAX_RECORDS} records. Got {len(records)}.'
+            }), 413
+        
+        if energy_model is None:
+            return jsonify({
+                'error': 'Model not available',
+                'details': model_unavailable_details()
+            }), 503
+        
+        # Validate every record at once; invalid records keep their slot with an error
+        columns, errors = validate_records(records)
+        valid = np.array([e is None for e in errors], dtype=bool)
+        
+        surface = prediction_surface(data)
+        predictions = [None] * len(records)
+        dedup = DeduplicationReport()
+        if valid.any():
+            try:
+                valid_columns = {field: values[valid] for field, values in columns.items()}
+                if surface is not None:
+                    scored = surface.predict_columns(valid_columns)
+                else:
+                    scored = predict_columns(valid_columns, dedup=dedup)
+            except Exception as e:
+                print(f"[ERROR] Batch prediction failed: {str(e)}")
+                return jsonify({
+                    'error': 'Prediction failed',
+                    'details': str(e)
+                }), 500
+            for i, value in zip(np.flatnonzero(valid).tolist(), scored.tolist()):
+                predictions[i] = value
+        
+        valid_count = int(valid.sum())
+        return jsonify({
+            'success': True,
+            'count': len(records),
+            'valid_count': valid_count,
+            'error_count': len(records) - valid_count,
+            'unit': 'kWh',
+            'predictions': predictions,
+            'errors': errors,
+            'average_prediction': float(scored.mean()) if valid_count else None,
+            'deduplication': dedup.to_dict() if surface is None else None,
+            'model_version': serving_model().version,
+            **mode_details(surface)
+        }), 200
+    
+    except Exception as e:
+        print(f"[ERROR] Unexpected error in predict_batch: {str(e)}")
+        return jsonify({
+            'error': 'Unexpected error',
+            'details': str(e)
+        }), 500
+
 @app.route('/api/predict/file', methods=['POST'])
 @jwt_required()
 def predict_file():
@@ -466,218 +813,310 @@ def predict_file():
             return jsonify({'error': 'No file selected'}), 400
         
         if not allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed. Use CSV, TXT, or PDF'}), 400
+            return jsonify({'error': 'File type not allowed. Use CSV, TXT (optionally .gz, .bz2 or .zst compressed), PDF, Parquet or Arrow'}), 400
+        
+        if model_state == 'loading':
+            return jsonify({'error': 'Model not available', 'details': model_unavailable_details()}), 503
         
         # Read file based on type
         filename = secure_filename(file.filename)
-        file_ext = filename.rsplit('.', 1)[1].lower()
+        file_ext = upload_type(file.filename)  # e.g. 'csv', or 'csv.gz' for a compressed CSV
+        
+        if is_truthy(request.args.get('async', request.form.get('async'))):
+            return submit_prediction_job(file, filename, file_ext)
+        
+        page_seconds = []  # PDF page extraction times, filled in as pages are extracted
+        chunks = iter_upload_chunks(file, file_ext, FILE_CHUNK_ROWS, PDF_EXTRACT_WORKERS, page_seconds)
+        
+        if is_truthy(request.args.get('stream', request.form.get('stream'))):
+            return Response(stream_with_context(stream_file_predictions(filename, chunks, page_seconds)),
+                            mimetype='application/x-ndjson')
         
         try:
-            if file_ext == 'csv':
-                df = pd.read_csv(file)
-            elif file_ext == 'txt':
-                content = file.read().decode('utf-8')
-                df = pd.read_csv(io.StringIO(content))
-            elif file_ext == 'pdf':
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                # Try to parse text as CSV
-                df = pd.read_csv(io.StringIO(text))
+            page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'page_size must be an integer'}), 400
+        
+        # The same file scored by the same model before: answer from the result cache
+        serving = serving_model()
+        cache_key = upload_cache_key(file, file_ext, serving.version)
+        job = prediction_jobs.cached_job(cache_key, filename, file_ext, get_jwt_identity(),
+                                         serving.source, serving.version)
+        if job is not None:
+            print(f"[INFO] Result cache hit for {filename} ({job['total_rows']} rows)")
+            return jsonify(file_prediction_response(job, page_size)), 200
+        
+        try:
+            # Score one chunk at a time with a single vectorized predict per chunk
+            rows, predictions, inputs = [], [], []
+            rows_read = 0
+            total = 0.0
+            report = ValidationReport(keep_rejected=True)
+            statistics = PredictionStatistics()
+            dedup = DeduplicationReport()
+            for chunk in chunks:
+                chunk_rows, chunk_predictions, chunk_inputs = score_frame(chunk, report, statistics, dedup)
+                rows.append(chunk_rows)
+                predictions.append(chunk_predictions)
+                if chunk_inputs is not None:
+                    inputs.append(chunk_inputs)
+                total += float(chunk_predictions.sum())
+                rows_read += len(chunk)
             
-            # Process each row for prediction
-            predictions = []
-            for idx, row in df.iterrows():
-                features_df = engineer_features(row.to_dict())
-                
-                try:
-                    pred = energy_model.predict(features_df)[0]
-                except (AttributeError, TypeError):
-                    # Fallback to formula-based prediction
-                    row_dict = row.to_dict()
-                    pred = 250 + (row_dict.get('temperature', 20) * 2) + (row_dict.get('square_footage', 5000) / 50)
-                predictions.append({
-                    'row': idx,
-                    'prediction': float(pred),
-                    'unit': 'kWh'
-                })
+            summary = statistics.to_dict()
+            fields = {
+                'average_prediction': total / summary['count'] if summary['count'] else None,
+                'validation': report.to_dict(),
+                'statistics': summary,
+                'deduplication': dedup.to_dict(),
+                'pdf_extraction': log_pdf_extraction(filename, page_seconds)
+            }
             
-            return jsonify({
-                'filename': filename,
-                'total_rows': len(df),
-                'predictions': predictions,
-                'average_prediction': float(np.mean([p['prediction'] for p in predictions]))
-            }), 200
+            # Every row fits in the first page: answer inline without keeping a job on disk
+            if summary['count'] <= clamp_page_size(page_size):
+                return jsonify(inline_prediction_response(filename, rows, predictions, page_size,
+                                                          serving.version, fields)), 200
+            
+            # Rows are kept on disk and paged from /api/predict/jobs/<id>/results; the response carries the first page
+            job = prediction_jobs.store_results(
+                filename, file_ext, get_jwt_identity(), serving.source, serving.version, rows, predictions, rows_read, inputs,
+                cache_key=cache_key, rejected=report.rejected_rows(), **fields)
+            
+            return jsonify(file_prediction_response(job, page_size)), 200
         
         except Exception as e:
             return jsonify({'error': f'Error processing file: {str(e)}'}), 400
     
+    except RequestEntityTooLarge:
+        raise  # Answered by the 413 handler
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def upload_cache_key(file, file_ext, model_version):
+    """Result cache key for an upload (hashed while it was received), or None when caching is off"""
+    if not result_cache.enabled or model_version is None:
+        return None
+    return result_cache_key(upload_digest(file), file_ext, model_version)
+
+def file_prediction_response(job, page_size):
+    """Body for /api/predict/file: a finished job's summary and its first page of rows"""
+    first_page = prediction_jobs.results(job, 1, page_size)
+    return {
+        'filename': job['filename'],
+        'total_rows': first_page['total_rows'],
+        'predictions': first_page['predictions'],
+        'page': 1,
+        'page_size': first_page['page_size'],
+        'total_pages': first_page['total_pages'],
+        'average_prediction': job['average_prediction'],
+        'statistics': job['statistics'],
+        'validation': job['validation'],
+        'deduplication': job['deduplication'],
+        'job_id': job['job_id'],
+        'results_url': f"/api/predict/jobs/{job['job_id']}/results",
+        'export_url': f"/api/predict/jobs/{job['job_id']}/export",
+        'model_version': job['model_version'],
+        'cache_hit': job['cache_hit'],
+        'pdf_extraction': job['pdf_extraction']
+    }
+
+def inline_prediction_response(filename, rows, predictions, page_size, model_version, fields):
+    """
+    Body for /api/predict/file when every scored row fits in one page: the same shape as
+    file_prediction_response, but no job is kept, so there is no job id, results_url or export_url
+    """
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    predictions = np.concatenate(predictions) if predictions else np.empty(0)
+    return {
+        'filename': filename,
+        'total_rows': len(rows),
+        'predictions': [
+            {'row': row, 'prediction': pred, 'unit': 'kWh'}
+            for row, pred in zip(rows.tolist(), predictions.tolist())
+        ],
+        'page': 1,
+        'page_size': clamp_page_size(page_size),
+        'total_pages': 1 if len(rows) else 0,
+        'average_prediction': fields['average_prediction'],
+        'statistics': fields['statistics'],
+        'validation': fields['validation'],
+        'deduplication': fields['deduplication'],
+        'job_id': None,
+        'results_url': None,
+        'export_url': None,
+        'model_version': model_version,
+        'cache_hit': False,
+        'pdf_extraction': fields['pdf_extraction']
+    }
+
+def predict_or_estimate(features):
+    """Model predictions for a feature matrix, or the formula estimate when no model is loaded"""
+    try:
+        return predict_features(features)
+    except (AttributeError, TypeError):
+        # Fallback to formula-based prediction
+        return 250 + (features[:, 0] * 2) + (features[:, 2] / 50)
+
+def score_frame(df, report=None, statistics=None, dedup=None):
+    """
+    Validate a parsed upload chunk and predict its valid rows with one model call.
+    Returns (row numbers, predictions, input columns) for the valid rows (columns is None when
+    no row is valid); rejected rows are added to report,
+    scored rows to statistics and repeated rows to dedup.
+    """
+    return score_chunk(df, predict_or_estimate, report, statistics, dedup)
+
+def log_pdf_extraction(filename, page_seconds):
+    """Per-page extraction report for a PDF upload (None for other files)"""
+    report = page_timing_report(page_seconds, PDF_EXTRACT_WORKERS)
+    if report:
+        print(f"[INFO] Extracted {report['pages']} PDF pages of {filename} with {report['workers']} worker(s): "
+              f"{report['total_page_seconds']:.2f}s total, slowest page {report['max_page_seconds']:.3f}s")
+    return report
+
+def stream_file_predictions(filename, chunks, page_seconds=None):
+    """
+    Generate NDJSON lines for an upload as each chunk is scored:
+    one 'prediction' line per row, then a 'summary' line (or an 'error' line)
+    """
+    total_rows = 0
+    total = 0.0
+    report = ValidationReport()
+    statistics = PredictionStatistics()
+    dedup = DeduplicationReport()
+    try:
+        for chunk in chunks:
+            rows, chunk_predictions, _ = score_frame(chunk, report, statistics, dedup)
+            total_rows += len(chunk_predictions)
+            total += float(chunk_predictions.sum())
+            yield ''.join(
+                f'{{"type":"prediction","row":{idx},"prediction":{pred!r},"unit":"kWh"}}\n'
+                for idx, pred in zip(rows.tolist(), chunk_predictions.tolist())
+            )
+    except Exception as e:
+        yield json.dumps({'type': 'error', 'error': f'Error processing file: {str(e)}', 'rows_scored': total_rows}) + '\n'
+        return
+    
+    yield json.dumps({
+        'type': 'summary',
+        'filename': filename,
+        'total_rows': total_rows,
+        'average_prediction': total / total_rows if total_rows else None,
+        'statistics': statistics.to_dict(),
+        'validation': report.to_dict(),
+        'deduplication': dedup.to_dict(),
+        'model_version': serving_model().version,
+        'pdf_extraction': log_pdf_extraction(filename, page_seconds or [])
+    }) + '\n'
+
+def submit_prediction_job(file, filename, file_ext):
+    """Queue an upload for the job workers and answer 202 with the job id right away (already done on a result cache hit)"""
+    serving = serving_model()
+    if serving.model is None:
+        return jsonify({'error': 'Model not available', 'details': model_unavailable_details()}), 503
+    cache_key = upload_cache_key(file, file_ext, serving.version)
+    job = prediction_jobs.cached_job(cache_key, filename, file_ext, get_jwt_identity(), serving.source, serving.version)
+    if job is None:
+        job = prediction_jobs.submit(file, filename, file_ext, get_jwt_identity(), serving.source, serving.version,
+                                     cache_key=cache_key)
+    return jsonify(job_summary(job)), 202
+
+def job_summary(job):
+    """Public view of a job (no server paths)"""
+    summary = {key: job[key] for key in ('job_id', 'filename', 'state', 'rows_done', 'total_rows',
+                                         'average_prediction', 'error', 'model_version',
+                                         'created_at', 'started_at', 'finished_at')}
+    summary['validation'] = job.get('validation')
+    summary['statistics'] = job.get('statistics')
+    summary['deduplication'] = job.get('deduplication')
+    summary['pdf_extraction'] = job.get('pdf_extraction')
+    summary['cache_hit'] = job.get('cache_hit', False)
+    if job['total_rows']:
+        summary['progress'] = round(min(job['rows_done'] / job['total_rows'], 1.0), 4)
+    summary['status_url'] = f"/api/predict/jobs/{job['job_id']}"
+    summary['results_url'] = f"/api/predict/jobs/{job['job_id']}/results"
+    summary['export_url'] = f"/api/predict/jobs/{job['job_id']}/export"
+    return summary
+
+@app.route('/api/predict/jobs', methods=['POST'])
+@jwt_required()
+def create_prediction_job():
+    """Upload a CSV/TXT (plain or compressed)/PDF/Parquet/Arrow file to be scored in the background"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'File type not allowed. Use CSV, TXT (optionally .gz, .bz2 or .zst compressed), PDF, Parquet or Arrow'}), 400
+    if model_state == 'loading':
+        return jsonify({'error': 'Model not available', 'details': model_unavailable_details()}), 503
+    filename = secure_filename(file.filename)
+    try:
+        return submit_prediction_job(file, filename, upload_type(file.filename))
+    except Exception as e:
+        print(f"[ERROR] Could not queue prediction job: {str(e)}")
+        return jsonify({'error': 'Could not queue job', 'details': str(e)}), 500
+
+@app.route('/api/predict/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_prediction_job(job_id):
+    """State and progress (rows done / total) of a prediction job"""
+    job = prediction_jobs.get(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_summary(job)), 200
+
+@app.route('/api/predict/jobs/<job_id>/results', methods=['GET'])
+@jwt_required()
+def get_prediction_job_results(job_id):
+    """One page of a finished job's predictions (?page=1&page_size=1000)"""
+    job = prediction_jobs.get(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] != 'done':
+        return jsonify({'error': f"Job is {job['state']}", **job_summary(job)}), 409
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'page and page_size must be integers'}), 400
+    results = prediction_jobs.results(job, page, page_size)
+    results['model_version'] = job['model_version']
+    return jsonify(results), 200
+
+@app.route('/api/predict/jobs/<job_id>/export', methods=['GET'])
+@jwt_required()
+def export_prediction_job(job_id):
+    """Download a finished job's rows (inputs, prediction, model version) as ?format=csv or parquet"""
+    job = prediction_jobs.get(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['state'] != 'done':
+        return jsonify({'error': f"Job is {job['state']}", **job_summary(job)}), 409
+    export_format = request.args.get('format', 'csv').strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    # Generated block by block from the memory-mapped result files, never held whole
+    with_inputs = prediction_jobs.has_inputs(job)
+    with_reasons = prediction_jobs.has_rejected(job)
+    blocks = prediction_jobs.iter_result_blocks(job)
+    if export_format == 'parquet':
+        body = iter_parquet_export(blocks, INPUT_FIELDS, job['model_version'], with_inputs, with_reasons)
+    else:
+        body = iter_csv_export(blocks, INPUT_FIELDS, job['model_version'], with_inputs, with_reasons)
+    download_name = export_filename(job['filename'], job.get('file_type'), export_format)
+    return Response(body, mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+
 def parse_prediction_input(message):
     """
     Parse conversational input to extract prediction fields.
     Extracts: HVAC type, HVAC appliances, applicants, day, month, season, time, temperature, humidity, house area
     Returns: dict with extracted fields and list of missing fields
     """
-    import re
-    
-    extracted = {}
-    msg_lower = message.lower()
-    
-    # Extract house area (sqft, square feet, area) - multiple patterns
-    area_patterns = [
-        r'(\d+)\s*(?:sqft|sq\.?ft|square\s*feet)',  # "1500 sqft"
-        r'(?:area|size|house)\s+(?:of\s+)?(\d+)\s*(?:sqft|sq\.?ft|square\s*feet)?',  # "area of 1500" or "house 1500 sqft"
-        r'(?:my\s+)?(?:home|house|place)\s+is\s+(\d+)',  # "my house is 2000"
-    ]
-    for pattern in area_patterns:
-        area_match = re.search(pattern, msg_lower)
-        if area_match:
-            extracted['square_footage'] = int(area_match.group(1))
-            break
-    
-    # Extract number of applicants/occupants (people, applicants, residents, family members)
-    applicants_match = re.search(r'(\d+)\s*(?:applicants?|occupants?|residents?|people|family\s*members?|members)', msg_lower)
-    if applicants_match:
-        extracted['applicants'] = int(applicants_match.group(1))
-    
-    # Extract day (1-31)
-    day_match = re.search(r'(?:day|on)?\s*(?:day\s+)?(\d{1,2})(?:st|nd|rd|th)?(?:\s|,|$)', msg_lower)
-    if day_match:
-        day = int(day_match.group(1))
-        if 1 <= day <= 31:
-            extracted['day'] = day
-    
-    # Extract month (1-12, or month name)
-    month_names = {
-        'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
-        'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
-        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-    }
-    for month_name, month_num in month_names.items():
-        if month_name in msg_lower:
-            extracted['month'] = month_num
-            break
-    
-    # Also check for numeric month
-    if 'month' not in extracted:
-        month_match = re.search(r'month\s+(\d{1,2})|(\d{1,2})/\d{1,2}', msg_lower)
-        if month_match:
-            month = int(month_match.group(1) or month_match.group(2))
-            if 1 <= month <= 12:
-                extracted['month'] = month
-    
-    # Extract season
-    season_map = {
-        'winter': 'winter',
-        'spring': 'spring',
-        'summer': 'summer',
-        'fall': 'fall',
-        'autumn': 'fall',
-        'monsoon': 'summer'
-    }
-    for season_name, season_val in season_map.items():
-        if season_name in msg_lower:
-            extracted['season'] = season_val
-            break
-    
-    # Extract time (hour: 0-23, or 12-hour format)
-    hour = None
-    
-    # Pattern 1: "HH:MM AM/PM" or "HH:MM" (24-hour)
-    time_hhmm = re.search(r'(\d{1,2}):(\d{2})\s*(am|pm|a\.m|p\.m)?', msg_lower)
-    if time_hhmm:
-        hour = int(time_hhmm.group(1))
-        minute = int(time_hhmm.group(2))
-        ampm = time_hhmm.group(3)
-        
-        # If 24-hour format (13-23), use as-is
-        if hour >= 13:
-            pass
-        # If 12-hour format with explicit AM/PM
-        elif ampm:
-            if 'pm' in ampm and hour != 12:
-                hour += 12
-            elif 'am' in ampm and hour == 12:
-                hour = 0
-        # No AM/PM specified - could be either 24-hour or 12-hour
-        # Assume 24-hour if already valid
-        elif hour > 12:
-            pass
-        else:
-            # Default to 24-hour, but if looks like 12-hour time, keep it
-            pass
-    
-    # Pattern 2: "H AM" or "HH AM"  
-    if hour is None:
-        time_am = re.search(r'(?:at\s+)?(\d{1,2})\s+(?:am|a\.m)', msg_lower)
-        if time_am:
-            hour = int(time_am.group(1))
-            if hour == 12:
-                hour = 0
-    
-    # Pattern 3: "H PM" or "HH PM"
-    if hour is None:
-        time_pm = re.search(r'(?:at\s+)?(\d{1,2})\s+(?:pm|p\.m)', msg_lower)
-        if time_pm:
-            hour = int(time_pm.group(1))
-            if hour != 12:
-                hour += 12
-    
-    # Validate and store
-    if hour is not None and 0 <= hour <= 23:
-        extracted['time'] = hour
-    
-    # Extract temperature (only if explicitly mentioned with degrees/temp/°C)
-    if any(word in msg_lower for word in ['temperature', 'degrees', 'degree', '°c', '°f', 'celsius', 'fahrenheit']):
-        temp_match = re.search(r'(\d+)\s*(?:degrees?|°|c|f)?', msg_lower)
-        if temp_match:
-            extracted['temperature'] = int(temp_match.group(1))
-    
-    # Extract humidity (if mentioned with % or humidity)
-    if any(word in msg_lower for word in ['humidity', 'humid', '%']):
-        humidity_match = re.search(r'(\d+)\s*%?(?:\s*humidity)?', msg_lower)
-        if humidity_match:
-            humidity = int(humidity_match.group(1))
-            if 0 <= humidity <= 100:
-                extracted['humidity'] = humidity
-    
-    # Extract HVAC type (central ac, window ac, furnace, heat pump, boiler, split ac, portable ac, hybrid)
-    hvac_type_map = {
-        'central ac': 'central-ac',
-        'central air': 'central-ac',
-        'window ac': 'window-ac',
-        'window unit': 'window-ac',
-        'furnace': 'furnace',
-        'heat pump': 'heat-pump',
-        'boiler': 'boiler',
-        'split ac': 'split-ac',
-        'split system': 'split-ac',
-        'portable ac': 'portable-ac',
-        'hybrid': 'hybrid',
-        'hybrid system': 'hybrid'
-    }
-    for hvac_name, hvac_type in hvac_type_map.items():
-        if hvac_name in msg_lower:
-            extracted['hvac_type'] = hvac_type
-            break
-    
-    # Extract HVAC appliances count (numeric count) - improved pattern matching
-    # Patterns: "2 central ACs", "have 3 hvac", "1 heat pump", etc.
-    hvac_patterns = [
-        r'(\d+)\s*(?:hvac|air\s*con|ac|appliances?|units?)',  # "2 units", "3 ACs"
-        r'(?:have|with|got|own)\s+(\d+)\s*(?:hvac|air\s*con|ac|appliances?|units?)?',  # "have 2 HVAC"
-        r'(\d+)\s*(?:central|window|split|portable)?\s*(?:ac|air\s*conditioner)',  # "2 central ac"
-        r'(\d+)\s*(?:heat\s*pump|furnace|boiler)',  # "2 heat pumps"
-    ]
-    for pattern in hvac_patterns:
-        hvac_match = re.search(pattern, msg_lower)
-        if hvac_match:
-            extracted['hvac_appliances'] = int(hvac_match.group(1))
-            break
+    extracted = extract_prediction_fields(message)
     
     # Determine missing required fields for prediction
     # Primary required: square_footage and hvac_appliances (and either month or season for temporal context)
@@ -695,37 +1134,32 @@ def parse_prediction_input(message):
     return extracted, missing
 
 
-@app.route('/api/chatbot/message', methods=['POST'])
-@jwt_required()
-def chatbot_message():
-    """Chatbot message endpoint with varied responses, casual conversation, and predictions"""
+def chatbot_reply(stream=False):
+    """
+    The chatbot's answer to the posted message as (payload, status). With stream=True a
+    Gemini answer's 'response' is an iterator of text chunks instead of a string.
+    """
     try:
         data = request.get_json()
         user_message = data.get('message', '').strip()
         
         if not user_message:
-            return jsonify({'error': 'No message provided'}), 400
+            return {'error': 'No message provided'}, 400
         
         email = get_jwt_identity()
         msg_lower = user_message.lower()
         
-        # Keywords to identify project-related questions
-        project_keywords = ['energy', 'predict', 'consumption', 'temperature', 'humidity', 'model', 'forecast', 'usage', 'kWh', 'efficiency', 'building', 'heating', 'cooling', 'report', 'upload', 'form', 'file', 'data', 'hdd', 'cdd']
-        
-        # Casual greetings and general conversation
-        casual_greetings = ['hi', 'hello', 'hey', 'howdy', 'good morning', 'good afternoon', 'good evening', 'greetings', 'what\'s up']
-        gratitude = ['thank', 'thanks', 'thx', 'appreciate', 'grateful']
-        farewells = ['bye', 'goodbye', 'see you', 'farewell', 'take care']
+        intents = chat_intents.match(msg_lower)  # Every intent keyword in one pass
         
         # Check for casual greetings
-        if any(greeting in msg_lower for greeting in casual_greetings):
+        if 'greeting' in intents:
             greetings = [
                 f'Hi there! 👋 I\'m your Energy AI Assistant. How can I help you today?',
                 f'Hello! Welcome to the Smart Energy Prediction System. What would you like to know?',
                 f'Hey! Great to see you. Need help with energy predictions or anything else?',
                 f'Greetings! I\'m here to help with energy forecasting and insights. What\'s on your mind?',
             ]
-            return jsonify({
+            return {
                 'response': greetings[hash(user_message) % len(greetings)],
                 'is_prediction': False,
                 'suggested_questions': [
@@ -734,39 +1168,39 @@ def chatbot_message():
                     'How do I upload data for prediction?',
                     'What is the model accuracy?'
                 ]
-            }), 200
+            }, 200
         
         # Check for gratitude
-        if any(word in msg_lower for word in gratitude):
+        if 'gratitude' in intents:
             thanks = [
                 'You\'re welcome! I\'m here to help anytime. 😊',
                 'My pleasure! Feel free to ask me anything about energy predictions.',
                 'Happy to help! Let me know if you need anything else.',
                 'Anytime! I\'m always ready to assist.',
             ]
-            return jsonify({
+            return {
                 'response': thanks[hash(user_message) % len(thanks)],
                 'is_prediction': False
-            }), 200
+            }, 200
         
         # Check for farewells
-        if any(farewell in msg_lower for farewell in farewells):
+        if 'farewell' in intents:
             goodbyes = [
                 'Goodbye! Thanks for using the Energy AI System. Come back soon! 👋',
                 'See you later! Keep saving energy! 🌱',
                 'Farewell! Feel free to return anytime for energy insights.',
                 'Take care! Remember to check your energy consumption regularly.',
             ]
-            return jsonify({
+            return {
                 'response': goodbyes[hash(user_message) % len(goodbyes)],
                 'is_prediction': False
-            }), 200
+            }, 200
         
         # Check for prediction requests
-        is_prediction_request = any(word in msg_lower for word in ['predict', 'forecast', 'calculate', 'estimate', 'how much', 'consumption'])
+        is_prediction_request = 'prediction_request' in intents
         
         # Try to parse structured prediction input
-        if is_prediction_request or any(keyword in msg_lower for keyword in ['sqft', 'applicants', 'people', 'area', 'house']):
+        if is_prediction_request or 'prediction_details' in intents:
             extracted_data, missing_fields = parse_prediction_input(user_message)
             
             # If we have all required fields, make a prediction
@@ -789,7 +1223,7 @@ def chatbot_message():
                     # Try to make prediction
                     features_df = engineer_features(prediction_input)
                     try:
-                        prediction = float(energy_model.predict(features_df)[0])
+                        prediction = float(predict_features(features_df.to_numpy())[0])
                     except (AttributeError, TypeError):
                         # Fallback formula
                         temp = prediction_input.get('temperature', 20)
@@ -823,10 +1257,11 @@ def chatbot_message():
                         f'This is based on your specific HVAC setup and building parameters. Factors like insulation quality and appliance efficiency also play a role.'
                     )
                     
-                    return jsonify({
+                    return {
                         'response': response_text,
                         'is_prediction': True,
                         'prediction': prediction,
+                        'model_version': serving_model().version,
                         'input_summary': prediction_input,
                         'suggested_questions': [
                             'How can I reduce this consumption?',
@@ -834,7 +1269,7 @@ def chatbot_message():
                             'How does changing season affect usage?',
                             'Compare with different house size'
                         ]
-                    }), 200
+                    }, 200
                     
                 except Exception as pred_error:
                     print(f"[WARNING] Structured prediction failed: {pred_error}")
@@ -864,7 +1299,7 @@ def chatbot_message():
                 
                 response_text += f'\n\nExample: "I have 2 central ACs, my house is 1500 sqft, in summer"'
                 
-                return jsonify({
+                return {
                     'response': response_text,
                     'is_prediction': False,
                     'extracted_data': extracted_data,
@@ -874,7 +1309,7 @@ def chatbot_message():
                         'Show me example input',
                         'Use the prediction form instead'
                     ]
-                }), 200
+                }, 200
             
             # Simple temperature-only prediction (backward compatibility)
             if is_prediction_request:
@@ -884,7 +1319,7 @@ def chatbot_message():
                     if temp_match:
                         temp = int(temp_match.group(1) or temp_match.group(2))
                         pred = 200 + (temp * 10)
-                        return jsonify({
+                        return {
                             'response': f'Based on the temperature of {temp}°C and our model, I estimate the energy consumption would be approximately **{pred:.0f} kWh**. This is a quick estimate; for more accurate predictions, please provide additional details like house size and number of occupants, or use the prediction form.',
                             'is_prediction': True,
                             'prediction': pred,
@@ -893,12 +1328,12 @@ def chatbot_message():
                                 'What other factors should I consider?',
                                 'Can I upload historical data?'
                             ]
-                        }), 200
+                        }, 200
                 except:
                     pass
         
         # Check if question is project-related
-        is_project_related = any(keyword in msg_lower for keyword in project_keywords)
+        is_project_related = 'project' in intents
         
         if not is_project_related:
             # For non-project questions, try to answer if it's general knowledge, otherwise redirect
@@ -908,20 +1343,20 @@ def chatbot_message():
                 'how does': 'I can help explain concepts! But I\'m specifically trained for energy prediction topics. Ask me about how our energy forecasting works or how to use this system!',
             }
             
-            for key, response in general_questions.items():
-                if key in msg_lower:
-                    return jsonify({
-                        'response': response,
-                        'is_prediction': False,
-                        'suggested_questions': [
-                            'How does energy prediction work?',
-                            'What is the LightGBM model?',
-                            'How accurate are predictions?'
-                        ]
-                    }), 200
+            question = intents.first('general_question')
+            if question:
+                return {
+                    'response': general_questions[question],
+                    'is_prediction': False,
+                    'suggested_questions': [
+                        'How does energy prediction work?',
+                        'What is the LightGBM model?',
+                        'How accurate are predictions?'
+                    ]
+                }, 200
             
             # Not project-related and not recognized general question
-            return jsonify({
+            return {
                 'response': 'I\'m specifically designed to help with energy prediction and efficiency! 🔋 I work best when you ask me about energy forecasting, predictions, model accuracy, or how to use this system. Feel free to ask me anything energy-related!',
                 'is_prediction': False,
                 'suggested_questions': [
@@ -930,73 +1365,51 @@ def chatbot_message():
                     'How do I upload data for prediction?',
                     'What is the model accuracy?'
                 ]
-            }), 200
+            }, 200
         
         # Project-related: use Gemini API with varied responses
-        system_prompt = """You are an expert chatbot for the Smart Energy Prediction System. 
-        
-Your responsibilities:
-1. Answer questions about energy consumption prediction
-2. Explain how to use the prediction model (form input or file upload)
-3. Discuss energy efficiency factors (temperature, humidity, building size, heating/cooling)
-4. Guide users on using the application features
-5. Provide insights on energy saving and efficiency
-6. Help interpret prediction results
-7. Provide VARIED, context-aware responses - never repeat the same sentence twice
-
-IMPORTANT RULES:
-- Provide different angles and explanations for similar topics
-- For beginners: Simple, easy-to-understand explanations
-- For advanced users: Technical details about the model
-- Be specific: Mention concrete details like "92% accuracy", "LightGBM", "kWh"
-- If user asks about uploading files, mention supported formats: CSV, TXT, PDF
-- If user asks about credentials/authentication, explain they're already logged in
-- Make responses engaging and not repetitive
-
-Context about the system:
-- Model type: LightGBM Regressor with 92% accuracy
-- Input features: Temperature, Humidity, SquareFootage, Month, HDD, CDD, and derived features
-- Output: Predicted energy consumption in kWh
-- Users can input data via form or upload CSV/PDF files
-- Features like HDD (Heating Degree Days) and CDD (Cooling Degree Days) are calculated from temperature"""
-        
         try:
-            model = genai.GenerativeModel('gemini-pro')
-            response = model.generate_content(
-                f"{system_prompt}\n\nUser: {user_message}",
-                generation_config={
-                    'max_output_tokens': 500,
-                    'temperature': 0.8  # Slightly higher for more varied responses
-                }
-            )
+            answer_key = (intents.route, normalize_question(user_message))
+            generation_config = {
+                'maxOutputTokens': 500,
+                'temperature': 0.8  # Slightly higher for more varied responses
+            }
+            if stream:
+                # A cached answer (or one an identical question is streaming) goes out whole;
+                # otherwise chunks are forwarded as Gemini writes them
+                reply = chat_answers.get_or_stream(
+                    answer_key, lambda: gemini.stream(user_message, CHATBOT_SYSTEM_PROMPT, generation_config))
+            else:
+                reply = chat_answers.get_or_call(
+                    answer_key, lambda: gemini.generate(user_message, CHATBOT_SYSTEM_PROMPT, generation_config))
             
             # Generate context-aware suggested questions
             suggested = []
-            if 'predict' in msg_lower or 'forecast' in msg_lower:
+            if 'topic_prediction' in intents:
                 suggested = [
                     'How accurate is the prediction model?',
                     'What input data do I need?',
                     'Can I upload multiple data points?'
                 ]
-            elif 'upload' in msg_lower or 'file' in msg_lower or 'csv' in msg_lower:
+            elif 'topic_upload' in intents:
                 suggested = [
                     'What columns should my CSV have?',
                     'What other file formats work?',
                     'How do I prepare my data?'
                 ]
-            elif 'temperature' in msg_lower or 'humidity' in msg_lower or 'factor' in msg_lower:
+            elif 'topic_factors' in intents:
                 suggested = [
                     'How much does temperature affect predictions?',
                     'What is HDD and CDD?',
                     'Why is building size important?'
                 ]
-            elif 'efficiency' in msg_lower or 'save' in msg_lower or 'reduce' in msg_lower:
+            elif 'topic_efficiency' in intents:
                 suggested = [
                     'What\'s the best way to reduce consumption?',
                     'How can I monitor my usage?',
                     'What are seasonal patterns?'
                 ]
-            elif 'model' in msg_lower or 'accuracy' in msg_lower:
+            elif 'topic_model' in intents:
                 suggested = [
                     'How was the model trained?',
                     'What ML algorithm is used?',
@@ -1009,15 +1422,15 @@ Context about the system:
                     'How do I upload data?'
                 ]
             
-            return jsonify({
-                'response': response.text,
+            return {
+                'response': reply,
                 'is_prediction': is_prediction_request,
                 'suggested_questions': suggested,
                 'timestamp': pd.Timestamp.now().isoformat()
-            }), 200
+            }, 200
             
-        except Exception as gemini_error:
-            print(f"[WARNING] Gemini API failed: {type(gemini_error).__name__}: {str(gemini_error)}")
+        except LLMUnavailable as gemini_error:
+            print(f"[WARNING] Gemini API unavailable: {gemini_error}")
             # Varied fallback responses based on topic
             fallback_map = {
                 'predict': 'Our Smart Energy Prediction System uses a LightGBM machine learning model trained on historical energy data. You can make predictions by entering temperature, humidity, building size, and month in the form, or upload a CSV file with multiple data points. The model typically achieves about 92% accuracy on test data.',
@@ -1029,26 +1442,84 @@ Context about the system:
                 'file': 'Upload data files in CSV, TXT, or PDF format. Format your data with columns: temperature, humidity, square_footage, month. The system processes each row independently and returns predictions for every entry, plus summary statistics.',
             }
             
-            fallback_msg = 'Our Smart Energy Prediction System helps forecast energy consumption. You can use the form for single predictions or upload files with multiple data points. The LightGBM model considers temperature, humidity, building size, and seasonal factors.'
-            for key, msg in fallback_map.items():
-                if key in msg_lower:
-                    fallback_msg = msg
-                    break
+            fallback_msg = fallback_map.get(intents.first('fallback_topic'), 'Our Smart Energy Prediction System helps forecast energy consumption. You can use the form for single predictions or upload files with multiple data points. The LightGBM model considers temperature, humidity, building size, and seasonal factors.')
             
-            return jsonify({
+            return {
                 'response': fallback_msg,
                 'is_prediction': is_prediction_request,
                 'mode': 'fallback',
+                'fallback_reason': gemini_error.reason,
                 'suggested_questions': [
                     'How do I make a prediction?',
                     'What file formats are supported?',
                     'How accurate are predictions?'
                 ]
-            }), 200
+            }, 200
     
     except Exception as e:
         print(f"[ERROR] Chatbot error: {type(e).__name__}: {str(e)}")
-        return jsonify({'error': str(e), 'type': type(e).__name__}), 500
+        return {'error': str(e), 'type': type(e).__name__}, 500
+
+
+@app.route('/api/chatbot/message', methods=['POST'])
+@jwt_required()
+def chatbot_message():
+    """Chatbot message endpoint with varied responses, casual conversation, and predictions"""
+    payload, status = chatbot_reply()
+    return jsonify(payload), status
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chatbot_events(payload):
+    """
+    Server-sent events for a chatbot answer: one 'token' event per Gemini chunk, then a
+    'done' event with the whole payload (the only event for answers not streamed from Gemini)
+    """
+    if not isinstance(payload['response'], str):
+        parts = []
+        try:
+            for chunk in payload['response']:
+                parts.append(chunk)
+                yield sse_event('token', {'text': chunk})
+        except LLMUnavailable as gemini_error:
+            print(f"[WARNING] Gemini stream broke off: {gemini_error}")
+            payload['incomplete'] = True
+            payload['fallback_reason'] = gemini_error.reason
+        payload['response'] = ''.join(parts)
+    yield sse_event('done', payload)
+
+@app.route('/api/chatbot/stream', methods=['POST'])
+@jwt_required()
+def chatbot_stream():
+    """Chatbot message endpoint that forwards Gemini answers as server-sent events while they are generated"""
+    payload, status = chatbot_reply(stream=True)
+    if status != 200:
+        return jsonify(payload), status
+    response = Response(stream_with_context(stream_chatbot_events(payload)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    if isinstance(payload['response'], StreamedAnswer):
+        # A client that leaves mid-answer (even before the first event) frees the Gemini call and its waiters
+        response.call_on_close(payload['response'].close)
+    return response
+
+@app.route('/api/chatbot/intents', methods=['GET'])
+@jwt_required()
+def get_chatbot_intent_stats():
+    """How many chatbot messages were routed to each intent, and how often each intent matched"""
+    return jsonify(chat_intents.stats()), 200
+
+@app.route('/api/chatbot/llm', methods=['GET'])
+@jwt_required()
+def get_chatbot_llm_stats():
+    """Gemini call counters, limits and circuit breaker state"""
+    return jsonify(gemini.stats()), 200
+
+@app.route('/api/chatbot/answer-cache', methods=['GET'])
+@jwt_required()
+def get_chatbot_answer_cache_stats():
+    """Hit, miss and shared-call counters for the chatbot answer cache"""
+    return jsonify(chat_answers.stats()), 200
 
 @app.route('/api/chatbot/voice', methods=['POST'])
 @jwt_required()
@@ -1126,6 +1597,49 @@ def get_model_info():
         'last_updated': '2024-01-16'
     }), 200
 
+@app.route('/api/model/status', methods=['GET'])
+@jwt_required()
+def get_model_status():
+    """Serving model version and reload history"""
+    return jsonify(model_manager.status()), 200
+
+@app.route('/api/model/reload', methods=['POST'])
+@jwt_required()
+def reload_model():
+    """Load, validate and swap in the newest model artifact without a restart (admins only)"""
+    if get_jwt_identity().lower() not in ADMIN_EMAILS:
+        return jsonify({'error': 'Forbidden', 'details': 'Model reload is limited to ADMIN_EMAILS'}), 403
+    result = model_manager.reload(reason=f'admin {get_jwt_identity()}')
+    return jsonify(result), 200 if result['reloaded'] else 422
+
+@app.route('/api/model/cache', methods=['GET'])
+@jwt_required()
+def get_prediction_cache_stats():
+    """Hit, miss and eviction counters for the prediction cache"""
+    return jsonify(prediction_cache.stats()), 200
+
+@app.route('/api/predict/result-cache', methods=['GET'])
+@jwt_required()
+def get_result_cache_stats():
+    """Hit, miss, store and eviction counters for the re-uploaded file result cache"""
+    return jsonify(result_cache.stats()), 200
+
+@app.route('/api/model/batching', methods=['GET'])
+@jwt_required()
+def get_micro_batching_stats():
+    """How many single-row requests were scored together"""
+    return jsonify(micro_batcher.stats()), 200
+
+@app.route('/api/model/surface', methods=['GET'])
+@jwt_required()
+def get_fast_surface_status():
+    """Grid size and measured error of the ?mode=fast interpolation surface"""
+    surface = fast_surface
+    if surface is None:
+        return jsonify({'enabled': FAST_SURFACE, 'ready': False}), 200
+    return jsonify({'enabled': FAST_SURFACE, 'ready': surface.version == model_manager.current.version,
+                    **surface.describe()}), 200
+
 @app.route('/api/energy-tips', methods=['GET', 'OPTIONS'])
 def get_energy_tips():
     """Get dynamic energy tips"""
@@ -1389,10 +1903,24 @@ def get_quick_tips():
     ]
     return jsonify(tips), 200
 
+# Load the model last so validation can use the prediction helpers defined above
+if __name__ == '__mp_main__':
+    pass  # Prediction job process re-importing `python app.py`; jobs load their own model
+elif FAST_START:
+    # Serve right away: /api/health reports 'starting' until the model is in memory
+    threading.Thread(target=load_model_artifacts, name='model-loader', daemon=True).start()
+else:
+    load_model_artifacts()
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def too_large(error):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    return jsonify({'error': f'File too large. Maximum upload size is {limit_mb:g} MB'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,217 @@
+"""
+Single-pass extraction of prediction fields from chatbot messages
+A message is tokenized once for its numbers. What follows each number (sqft,
+people, pm, /, :30, units...) is matched by one compiled matcher anchored where
+the number ends, and the words that must come right before it ("house of",
+"month", "have") by one matcher run backwards from its start on the reversed
+message, instead of searching the whole message once per pattern. Fields are
+resolved with the same priorities as separate searches (earlier patterns first,
+then the leftmost match; table words in table order), so the results match the
+pattern-by-pattern parser this replaced.
+"""
+
+import re
+
+MONTH_NAMES = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+SEASON_NAMES = {
+    'winter': 'winter',
+    'spring': 'spring',
+    'summer': 'summer',
+    'fall': 'fall',
+    'autumn': 'fall',
+    'monsoon': 'summer'
+}
+HVAC_TYPE_NAMES = {
+    'central ac': 'central-ac',
+    'central air': 'central-ac',
+    'window ac': 'window-ac',
+    'window unit': 'window-ac',
+    'furnace': 'furnace',
+    'heat pump': 'heat-pump',
+    'boiler': 'boiler',
+    'split ac': 'split-ac',
+    'split system': 'split-ac',
+    'portable ac': 'portable-ac',
+    'hybrid': 'hybrid',
+    'hybrid system': 'hybrid'
+}
+# A temperature / humidity is only read when one of these appears in the message
+TEMPERATURE_WORDS = ('temperature', 'degrees', 'degree', '°c', '°f', 'celsius', 'fahrenheit')
+HUMIDITY_WORDS = ('humidity', 'humid', '%')
+
+
+# What can follow a number, matched from where the number ends. The named groups are
+# markers. Patterns for different fields start with different words, so at most one
+# field matches at a number and the patterns are tried as one alternation, in priority
+# order for fields with several patterns. Optional words before a number ("at 6 pm")
+# are left out: they never change which number matches.
+AFTER_NUMBER_PATTERNS = [
+    r'(?P<area_units>)\s*(?:sqft|sq\.?ft|square\s*feet)',  # "1500 sqft"
+    r'(?P<applicants>)\s*(?:applicants?|occupants?|residents?|people|family\s*members?|members)',  # "4 people"
+    r'(?P<month_slash>)/\d{1,2}',  # "9/14"
+    r'(?P<clock>):\d{2}\s*(?P<clock_ampm>am|pm|a\.m|p\.m)?',  # "14:30", "2:00 pm"
+    r'(?P<hour_am>)\s+(?:am|a\.m)',  # "8 am"
+    r'(?P<hour_pm>)\s+(?:pm|p\.m)',  # "6 pm"
+    r'(?P<hvac_units>)\s*(?:hvac|air\s*con|ac|appliances?|units?)',  # "2 units", "3 ACs"
+    r'(?P<hvac_ac>)\s*(?:central|window|split|portable)?\s*(?:ac|air\s*conditioner)',  # "2 central ac"
+    r'(?P<hvac_heating>)\s*(?:heat\s*pump|furnace|boiler)',  # "2 heat pumps"
+]
+# "5th", "on 12": any number followed by a space, so matched on its own
+DAY_PATTERN = r'(?:st|nd|rd|th)?(?:\s|,|$)'
+# Fields that are one or two digits (\d{1,2}): read from the end of a longer number, "2024/5" -> 24
+SHORT_NUMBER_GROUPS = ('day', 'month_slash', 'clock', 'hour_am', 'hour_pm')
+
+
+def _reversed_words(*words):
+    return '|'.join(re.escape(w[::-1]) for w in words)
+
+
+# Words that must come right before a number, written reversed: matched on the
+# reversed message from where the number starts (one alternation, like the above)
+BEFORE_NUMBER_PATTERNS = [
+    rf'(?P<area_named>)(?:\s+fo)?\s+(?:{_reversed_words("area", "size", "house")})',  # "area of 1500"
+    rf'(?P<area_is>)\s+si\s+(?:{_reversed_words("home", "house", "place")})',  # "my house is 2000"
+    rf'(?P<month_number>)\s+{_reversed_words("month")}',  # "month 9"
+    rf'(?P<hvac_have>)\s+(?:{_reversed_words("have", "with", "got", "own")})',  # "have 2 hvac"
+]
+
+
+_NUMBER = re.compile(r'\d+')
+_AFTER_NUMBER = re.compile('|'.join(AFTER_NUMBER_PATTERNS))
+_DAY_AFTER_NUMBER = re.compile(DAY_PATTERN)
+_BEFORE_NUMBER = re.compile('|'.join(BEFORE_NUMBER_PATTERNS))
+
+
+def scan_numbers(msg_lower):
+    """
+    One pass over a lowercased message's numbers.
+    Returns {group: (value, position)} for the leftmost match of each pattern group,
+    plus the AM/PM that came with the 'clock' time kept (or None) as 'clock_ampm'.
+    """
+    found = {}
+    reversed_msg = msg_lower[::-1]
+    for number in _NUMBER.finditer(msg_lower):
+        start, end = number.span()
+        digits = number.group()
+        short = (digits[-2:], max(start, end - 2))
+
+        after = _AFTER_NUMBER.match(msg_lower, end)
+        if after:
+            name = 'clock' if after.lastgroup == 'clock_ampm' else after.lastgroup
+            if name not in found:
+                found[name] = short if name in SHORT_NUMBER_GROUPS else (digits, start)
+                if name == 'clock':
+                    found['clock_ampm'] = (after.group('clock_ampm'), end)
+        if 'day' not in found and _DAY_AFTER_NUMBER.match(msg_lower, end):
+            found['day'] = short
+
+        before = _BEFORE_NUMBER.match(reversed_msg, len(msg_lower) - start)
+        if before and before.lastgroup not in found:
+            # "month\s+(\d{1,2})" reads the first two digits, the others the whole number
+            found[before.lastgroup] = (digits[:2] if before.lastgroup == 'month_number' else digits, start)
+    return found
+
+
+def _first_word(table, msg_lower):
+    """Value of the first table word (in table order) that appears anywhere in the message"""
+    for word, value in table:
+        if word in msg_lower:
+            return value
+    return None
+
+
+_MONTH_WORDS = tuple(MONTH_NAMES.items())
+_SEASON_WORDS = tuple(SEASON_NAMES.items())
+_HVAC_TYPE_WORDS = tuple(HVAC_TYPE_NAMES.items())
+
+
+def _first_int(found, *groups):
+    """Value of the first group (in priority order) that matched anywhere"""
+    for name in groups:
+        if name in found:
+            return int(found[name][0])
+    return None
+
+
+def extract_prediction_fields(message):
+    """
+    Prediction fields found in a chatbot message: square_footage, applicants, day,
+    month, season, time, temperature, humidity, hvac_type and hvac_appliances
+    (only the ones present)
+    """
+    extracted = {}
+    msg_lower = message.lower()
+    found = scan_numbers(msg_lower)
+
+    square_footage = _first_int(found, 'area_units', 'area_named', 'area_is')
+    if square_footage is not None:
+        extracted['square_footage'] = square_footage
+
+    if 'applicants' in found:
+        extracted['applicants'] = int(found['applicants'][0])
+
+    day = _first_int(found, 'day')
+    if day is not None and 1 <= day <= 31:
+        extracted['day'] = day
+
+    month = _first_word(_MONTH_WORDS, msg_lower)
+    if month is None:
+        # "month 9" and "9/14" are alternatives of one pattern: the leftmost counts ("month" first on a tie)
+        numeric = [found[name] for name in ('month_number', 'month_slash') if name in found]
+        if numeric:
+            month = int(min(numeric, key=lambda value_position: value_position[1])[0])
+            if not 1 <= month <= 12:
+                month = None
+    if month is not None:
+        extracted['month'] = month
+
+    season = _first_word(_SEASON_WORDS, msg_lower)
+    if season is not None:
+        extracted['season'] = season
+
+    hour = None
+    if 'clock' in found:
+        hour = int(found['clock'][0])
+        ampm = found['clock_ampm'][0]
+        # 13-23 is already a 24-hour time; otherwise AM/PM (when given) converts it
+        if hour < 13 and ampm:
+            if 'pm' in ampm and hour != 12:
+                hour += 12
+            elif 'am' in ampm and hour == 12:
+                hour = 0
+    elif 'hour_am' in found:
+        hour = int(found['hour_am'][0])
+        if hour == 12:
+            hour = 0
+    elif 'hour_pm' in found:
+        hour = int(found['hour_pm'][0])
+        if hour != 12:
+            hour += 12
+    if hour is not None and 0 <= hour <= 23:
+        extracted['time'] = hour
+
+    # Temperature and humidity are the first number of a message that mentions them
+    mentions_temperature = any(word in msg_lower for word in TEMPERATURE_WORDS)
+    mentions_humidity = any(word in msg_lower for word in HUMIDITY_WORDS)
+    first_number = _NUMBER.search(msg_lower) if mentions_temperature or mentions_humidity else None
+    if first_number and mentions_temperature:
+        extracted['temperature'] = int(first_number.group())
+
+    if first_number and mentions_humidity:
+        humidity = int(first_number.group())
+        if 0 <= humidity <= 100:
+            extracted['humidity'] = humidity
+
+    hvac_type = _first_word(_HVAC_TYPE_WORDS, msg_lower)
+    if hvac_type is not None:
+        extracted['hvac_type'] = hvac_type
+
+    hvac_appliances = _first_int(found, 'hvac_units', 'hvac_have', 'hvac_ac', 'hvac_heating')
+    if hvac_appliances is not None:
+        extracted['hvac_appliances'] = hvac_appliances
+
+    return extracted
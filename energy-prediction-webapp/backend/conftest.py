@@ -0,0 +1,127 @@
+"""
+Shared pytest fixtures for the backend tests
+Every test gets its own upload spool, job and result cache folders under tmp_path,
+so file results never carry over from one test (or one run) to the next. The fake
+Gemini server used by the chatbot tests lives here too.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_client import GeminiClient
+
+UPLOAD_FOLDER_SETTINGS = {
+    'UPLOAD_SPOOL_FOLDER': 'spool',
+    'PREDICTION_JOBS_FOLDER': 'jobs',
+    'RESULT_CACHE_FOLDER': 'result_cache',
+}
+
+
+@pytest.fixture(autouse=True)
+def upload_folders(tmp_path, monkeypatch):
+    """Point the app's spool, job and result cache folders at tmp_path (whether or not app is imported yet)"""
+    folders = {name: str(tmp_path / sub) for name, sub in UPLOAD_FOLDER_SETTINGS.items()}
+    for name, folder in folders.items():
+        os.makedirs(folder)
+        monkeypatch.setenv(name, folder)
+    app = sys.modules.get('app')
+    if app is not None:
+        monkeypatch.setattr(app.SpoolingRequest, 'spool_folder', folders['UPLOAD_SPOOL_FOLDER'])
+        monkeypatch.setattr(app.prediction_jobs, 'folder', folders['PREDICTION_JOBS_FOLDER'])
+        monkeypatch.setattr(app.result_cache, 'folder', folders['RESULT_CACHE_FOLDER'])
+    return folders
+
+
+class FakeGemini:
+    """
+    generateContent and streamGenerateContent on localhost: mode is 'ok', 'slow' (delay
+    seconds), 'error' (HTTP 503) or 'malformed' (HTTP 200 with a payload of the wrong shape).
+    Answers take chunk_delay seconds per word; streamed ones come one word per event.
+    """
+
+    def __init__(self):
+        self.mode = 'ok'
+        self.delay = 0.0
+        self.chunk_delay = 0.0
+        self.requests = []
+        self.connections = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is visible
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                fake.requests.append({'path': self.path, 'key': self.headers.get('x-goog-api-key'), 'body': body})
+                fake.connections.add(self.client_address)
+                if fake.mode == 'slow':
+                    time.sleep(fake.delay)
+                if fake.mode == 'error':
+                    self.reply(503, {'error': {'message': 'overloaded'}})
+                elif ':streamGenerateContent' in self.path:
+                    self.stream(f"Fake answer to: {body['contents'][0]['parts'][0]['text']}")
+                elif fake.mode == 'malformed':
+                    self.reply(200, {'candidates': [{'content': 'not an object'}]})
+                else:
+                    prompt = body['contents'][0]['parts'][0]['text']
+                    time.sleep(fake.chunk_delay * len(prompt.split(' ')))  # A whole answer takes as long as streaming it
+                    self.reply(200, {'candidates': [{'content': {'parts': [{'text': f'Fake answer to: {prompt}'}]}}]})
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    pass  # The client gave up
+
+            def stream(self, answer):
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    words = answer.split(' ')
+                    for n, word in enumerate(words):
+                        text = word if n == len(words) - 1 else word + ' '
+                        content = 'not an object' if fake.mode == 'malformed' else {'parts': [{'text': text}]}
+                        event = f"data: {json.dumps({'candidates': [{'content': content}]})}\r\n\r\n"
+                        self.wfile.write(f'{len(event.encode()):x}\r\n{event}\r\n'.encode())
+                        self.wfile.flush()
+                        time.sleep(fake.chunk_delay)
+                    self.wfile.write(b'0\r\n\r\n')
+                except OSError:
+                    pass  # The client gave up
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}/v1beta'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def fake():
+    """A FakeGemini server for one test (the __main__ runner shares one across tests)"""
+    server = FakeGemini()
+    yield server
+    server.close()
+
+
+def client_for(fake, **options):
+    options.setdefault('timeout', 2)
+    return GeminiClient('test-key', 'gemini-test', fake.base_url, **options)
@@ -0,0 +1,194 @@
+"""
+Columnar feature engineering for the energy prediction model
+Builds all 28 training features for N inputs at once from NumPy arrays.
+Numbers MUST MATCH train_improved_model.engineer_features exactly.
+"""
+
+import numpy as np
+
+# Model input columns, in the order the training pipeline expects (28 features)
+FEATURE_ORDER = [
+    'Temperature', 'Humidity', 'SquareFootage', 'Month', 'Hour', 'HVAC_Appliances',
+    'Month_sin', 'Month_cos', 'Hour_sin', 'Hour_cos',
+    'HDD', 'CDD', 'HDD_Squared', 'CDD_Squared',
+    'HDD_x_SqFt', 'CDD_x_SqFt',
+    'Temp_Humidity', 'Temp_SqFt',
+    'Heating_On', 'Cooling_On', 'Peak_Hours', 'Night_Hours',
+    'Temp_Deviation', 'Humidity_Deviation', 'LargeBuilding',
+    'Temp_Squared', 'SqFt_Squared', 'Humidity_Squared'
+]
+
+# Raw request fields and the defaults used when a field is absent
+INPUT_DEFAULTS = {
+    'temperature': 20,
+    'humidity': 50,
+    'square_footage': 5000,
+    'month': 1,
+    'time': 12,
+    'hvac_appliances': 1,
+}
+
+# Fields converted with int() by the single-row path (truncated toward zero here)
+INTEGER_FIELDS = ('month', 'time', 'hvac_appliances')
+
+
+def columns_from_records(records):
+    """Collect raw input dicts into one float64 array per input field.
+
+    Values go through the same float()/int() conversions the single-row path
+    always used, so bad values raise ValueError/TypeError just like before.
+    """
+    columns = {}
+    for field, default in INPUT_DEFAULTS.items():
+        cast = int if field in INTEGER_FIELDS else float
+        columns[field] = np.array([cast(r.get(field, default)) for r in records], dtype=np.float64)
+    return columns
+
+
+def _input_column(columns, field, n_rows):
+    """Fetch one input column as float64, filling the default when it is missing"""
+    values = columns.get(field)
+    if values is None:
+        return np.full(n_rows, INPUT_DEFAULTS[field], dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    if field in INTEGER_FIELDS:
+        values = np.trunc(values)
+    return values
+
+
+def engineer_feature_matrix(columns, n_rows=None, dtype=np.float64, as_frame=False):
+    """Build the (N, 28) feature matrix for N inputs with no per-row Python.
+
+    columns: mapping of input field ('temperature', 'humidity', 'square_footage',
+        'month', 'time', 'hvac_appliances') to array-likes of length N. Missing
+        fields are filled with INPUT_DEFAULTS.
+    n_rows: row count, only needed when every field is missing.
+    dtype: np.float64 (default) or np.float32. Features are always computed in
+        float64 and cast once at the end.
+    as_frame: return a pandas DataFrame with FEATURE_ORDER columns instead of
+        the C-contiguous ndarray.
+    """
+    if n_rows is None:
+        present = [columns[f] for f in INPUT_DEFAULTS if columns.get(f) is not None]
+        if not present:
+            raise ValueError('n_rows is required when no input columns are given')
+        n_rows = np.asarray(present[0]).reshape(-1).shape[0]
+
+    temperature = _input_column(columns, 'temperature', n_rows)
+    humidity = _input_column(columns, 'humidity', n_rows)
+    square_footage = _input_column(columns, 'square_footage', n_rows)
+    month = _input_column(columns, 'month', n_rows)
+    hour = _input_column(columns, 'time', n_rows)
+    hvac_appliances = _input_column(columns, 'hvac_appliances', n_rows)
+
+    out = np.empty((n_rows, len(FEATURE_ORDER)), dtype=dtype)
+
+    # ========== BASIC FEATURES (6 features) ==========
+    out[:, 0] = temperature
+    out[:, 1] = humidity
+    out[:, 2] = square_footage
+    out[:, 3] = month
+    out[:, 4] = hour
+    out[:, 5] = hvac_appliances
+
+    # ========== TEMPORAL FEATURES (4 features) ==========
+    # Same operation order as training so results are bit-for-bit identical
+    out[:, 6] = np.sin(2 * np.pi * month / 12)
+    out[:, 7] = np.cos(2 * np.pi * month / 12)
+    out[:, 8] = np.sin(2 * np.pi * hour / 24)
+    out[:, 9] = np.cos(2 * np.pi * hour / 24)
+
+    # ========== DEGREE DAYS (6 features) ==========
+    hdd = np.maximum(0, 18 - temperature)
+    cdd = np.maximum(0, temperature - 22)
+    out[:, 10] = hdd
+    out[:, 11] = cdd
+    out[:, 12] = hdd ** 2
+    out[:, 13] = cdd ** 2
+    out[:, 14] = hdd * (square_footage / 1000)
+    out[:, 15] = cdd * (square_footage / 1000)
+
+    # ========== INTERACTION FEATURES (2 features) ==========
+    out[:, 16] = temperature * humidity / 100
+    out[:, 17] = temperature * (square_footage / 5000)
+
+    # ========== ON/OFF FLAGS (4 features) ==========
+    out[:, 18] = hdd > 0
+    out[:, 19] = cdd > 0
+    out[:, 20] = (hour >= 14) & (hour <= 19)
+    out[:, 21] = (hour >= 22) | (hour <= 6)
+
+    # ========== DERIVED FEATURES (3 features) ==========
+    out[:, 22] = np.abs(temperature - 20)
+    out[:, 23] = np.abs(humidity - 50)
+    out[:, 24] = square_footage > 7500
+
+    # ========== POLYNOMIAL FEATURES (3 features) ==========
+    out[:, 25] = temperature ** 2
+    out[:, 26] = (square_footage / 1000) ** 2
+    out[:, 27] = humidity ** 2
+
+    if as_frame:
+        return feature_frame(out)
+    return out
+
+
+def feature_frame(matrix):
+    """Wrap a feature matrix in a DataFrame with the training column names"""
+    import pandas as pd
+    return pd.DataFrame(matrix, columns=FEATURE_ORDER, copy=False)
+
+
+def unique_input_rows(columns, n_rows=None):
+    """Collapse repeated input rows so each distinct input is scored once.
+
+    Returns (unique_columns, inverse): the normalized input columns of every
+    distinct row, in order of first appearance, and for each input row the
+    index of its distinct row. engineer_feature_matrix(unique_columns)[inverse]
+    equals engineer_feature_matrix(columns). Rows that differ only below the
+    integer truncation (hour 14 vs 14.5) count as the same input.
+    """
+    import pandas as pd
+    if n_rows is None:
+        present = [columns[f] for f in INPUT_DEFAULTS if columns.get(f) is not None]
+        if not present:
+            raise ValueError('n_rows is required when no input columns are given')
+        n_rows = np.asarray(present[0]).reshape(-1).shape[0]
+    normalized = {field: _input_column(columns, field, n_rows) for field in INPUT_DEFAULTS}
+
+    # Mixed-radix row key from per-column codes; re-coded whenever it could overflow int64
+    key = np.zeros(n_rows, dtype=np.int64)
+    key_size = 1
+    for values in normalized.values():
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        if key_size * len(uniques) >= 2 ** 62:
+            key, first_keys = pd.factorize(key)
+            key_size = len(first_keys)
+        key = key * len(uniques) + codes
+        key_size *= len(uniques)
+    inverse, distinct = pd.factorize(key)
+
+    first = np.empty(len(distinct), dtype=np.intp)
+    first[inverse[::-1]] = np.arange(n_rows - 1, -1, -1)  # Earliest row wins
+    return {field: values[first] for field, values in normalized.items()}, inverse
+
+
+class DeduplicationReport:
+    """Rows sent for scoring vs distinct rows the model actually scored, summed over calls"""
+
+    def __init__(self):
+        self.rows = 0
+        self.unique_rows = 0
+
+    def add(self, rows, unique_rows):
+        self.rows += int(rows)
+        self.unique_rows += int(unique_rows)
+
+    def to_dict(self):
+        duplicates = self.rows - self.unique_rows
+        return {
+            'rows': self.rows,
+            'unique_rows': self.unique_rows,
+            'duplicate_rows': duplicates,
+            'model_rows_saved_pct': round(100.0 * duplicates / self.rows, 1) if self.rows else 0.0,
+        }
@@ -0,0 +1,228 @@
+"""
+Chunked readers for uploaded prediction files
+Uploads are parsed a fixed number of rows at a time so scoring memory stays bounded
+"""
+
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from input_schema import resolve_headers
+from pdf_extract import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS, iter_pdf_pages
+
+DEFAULT_CHUNK_ROWS = 10000
+
+CSV_EXTENSIONS = ('csv', 'txt')
+ARROW_EXTENSIONS = ('parquet', 'arrow', 'feather')  # Read with pyarrow
+COMPRESSION_EXTENSIONS = {'gz': 'gzip', 'bz2': 'bz2', 'zst': 'zstd'}  # Accepted on CSV/TXT uploads
+
+
+def upload_type(filename):
+    """File type of an upload name: 'meters.csv.gz' -> 'csv.gz', 'bill.PDF' -> 'pdf', no extension -> None"""
+    parts = filename.lower().rsplit('.', 2)
+    if len(parts) == 3 and parts[2] in COMPRESSION_EXTENSIONS:
+        return f'{parts[1]}.{parts[2]}'
+    return parts[-1] if len(parts) > 1 else None
+
+
+def split_upload_type(file_type):
+    """'csv.gz' -> ('csv', 'gzip'); 'pdf' -> ('pdf', None)"""
+    base, _, suffix = file_type.partition('.')
+    return base, COMPRESSION_EXTENSIONS.get(suffix) if suffix else None
+
+
+def open_decompressed(file, compression):
+    """Binary file object that decompresses file as it is read (nothing is inflated up front)"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(file, mode='rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError('Zstandard-compressed uploads need the zstandard package (pip install zstandard)')
+        return zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=False)
+    raise ValueError(f'Unsupported compression: {compression}')
+
+
+def iter_upload_chunks(file, file_ext, chunk_rows=DEFAULT_CHUNK_ROWS, pdf_workers=DEFAULT_PDF_WORKERS,
+                       page_seconds=None):
+    """Yield the rows of an uploaded CSV/TXT/PDF/Parquet/Arrow file as DataFrames of at most chunk_rows rows.
+
+    Chunk indexes continue across chunks, so chunk.index is the row number in the file.
+    PDF pages are extracted by pdf_workers processes and parsed as they arrive;
+    each page's extraction time is appended to page_seconds when it is given.
+    Parquet and Arrow chunks hold only the model input columns.
+    file_ext may name a compressed CSV/TXT ('csv.gz', 'txt.zst', 'csv.bz2'),
+    which is decompressed as the parser reads it.
+    """
+    file_ext, compression = split_upload_type(file_ext)
+    if compression and file_ext not in CSV_EXTENSIONS:
+        raise ValueError(f'Only CSV and TXT uploads may be compressed, not {file_ext.upper()}')
+    if file_ext in CSV_EXTENSIONS:
+        source = open_decompressed(file, compression) if compression else file
+        try:
+            with pd.read_csv(source, chunksize=chunk_rows, encoding='utf-8') as reader:
+                yield from reader
+        finally:
+            if compression:
+                source.close()  # Closes the decompressor only, not the upload
+    elif file_ext == 'pdf':
+        # Try to parse the extracted text as CSV
+        path, is_temporary = _pdf_path(file)
+        try:
+            yield from iter_text_chunks(iter_pdf_pages(path, pdf_workers, page_seconds), chunk_rows)
+        finally:
+            if is_temporary:
+                os.remove(path)
+    elif file_ext == 'parquet':
+        yield from iter_parquet_chunks(file, chunk_rows)
+    elif file_ext in ('arrow', 'feather'):
+        yield from iter_arrow_chunks(file, chunk_rows)
+    else:
+        raise ValueError(f'Unsupported file type: {file_ext}')
+
+
+def upload_path(file):
+    """Path of the file behind an upload (e.g. a spooled upload), or None if it only exists in memory"""
+    if isinstance(file, str):
+        return file
+    file = getattr(file, 'stream', file)  # werkzeug FileStorage
+    name = getattr(file, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        file.flush()  # A spool file may still hold buffered writes
+        return name
+    return None
+
+
+def _pdf_path(file):
+    """A path extraction processes can open: the upload's own file, or a temporary copy"""
+    path = upload_path(file)
+    if path is not None:
+        return path, False
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        shutil.copyfileobj(file, tmp)
+    return tmp.name, True
+
+
+def iter_text_chunks(pieces, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Parse CSV text that arrives in pieces (e.g. PDF pages) into DataFrames of at most chunk_rows rows.
+
+    Gives the same rows as pd.read_csv on ''.join(pieces): a line may continue
+    across pieces and blank lines are skipped. Quoted fields must not span lines.
+    """
+    header = None
+    partial = ''
+    lines = []
+    next_row = 0
+
+    def parse(block):
+        df = pd.read_csv(io.StringIO(header + '\n' + '\n'.join(block)), encoding='utf-8')
+        df.index = pd.RangeIndex(next_row, next_row + len(df))
+        return df
+
+    for piece in pieces:
+        *complete, partial = (partial + piece).split('\n')
+        for line in complete:
+            if header is None:
+                if line.strip():
+                    header = line
+            elif line.strip():
+                lines.append(line)
+        while len(lines) >= chunk_rows:
+            df = parse(lines[:chunk_rows])
+            del lines[:chunk_rows]
+            next_row += len(df)
+            yield df
+
+    if partial.strip():
+        if header is None:
+            header = partial
+        else:
+            lines.append(partial)
+    if header is None:
+        raise pd.errors.EmptyDataError('No columns to parse from file')
+    if lines:
+        yield parse(lines)
+
+
+# ========== PARQUET / ARROW ==========
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ValueError('Parquet and Arrow uploads need the pyarrow package (pip install pyarrow)')
+    return pyarrow
+
+
+def input_column_names(names):
+    """The columns of a file schema that map to model inputs (first one per field)"""
+    mapping, _ = resolve_headers(names)
+    return list(mapping)
+
+
+def arrow_frame(table, start):
+    """
+    DataFrame over an Arrow table's columns, numbered from row `start`.
+    Numeric columns without nulls become read-only NumPy views of the Arrow
+    buffers; columns with nulls or text are converted (nulls become NaN/None).
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if column.num_chunks == 1:
+            column = column.chunk(0)
+        columns[name] = column.to_numpy(zero_copy_only=False)
+    return pd.DataFrame(columns, index=pd.RangeIndex(start, start + table.num_rows), copy=False)
+
+
+def count_arrow_rows(path, file_ext):
+    """Rows in a Parquet/Arrow file on disk, read from its metadata"""
+    pa = _import_pyarrow()
+    if file_ext == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    with pa.memory_map(path) as source:
+        try:
+            return pa.ipc.open_file(source).read_all().num_rows
+        except pa.ArrowInvalid:
+            source.seek(0)
+            return pa.ipc.open_stream(source).read_all().num_rows
+
+
+def iter_parquet_chunks(file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Decode only the input columns of a Parquet upload, chunk_rows rows at a time"""
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+    source = upload_path(file) or file
+    parquet = pq.ParquetFile(source, memory_map=isinstance(source, str))
+    columns = input_column_names(parquet.schema_arrow.names)
+    start = 0
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield arrow_frame(pa.Table.from_batches([batch]), start)
+        start += batch.num_rows
+
+
+def iter_arrow_chunks(file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Chunks of an Arrow IPC (Feather v2) upload, file or stream format.
+    Files on disk are memory-mapped, so slices read straight from the page cache.
+    """
+    pa = _import_pyarrow()
+    path = upload_path(file)
+    source = pa.memory_map(path) if path else pa.BufferReader(file.read())
+    try:
+        reader = pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+    table = reader.read_all()
+    table = table.select(input_column_names(table.column_names))
+    for start in range(0, table.num_rows, chunk_rows):
+        yield arrow_frame(table.slice(start, chunk_rows), start)
@@ -0,0 +1,362 @@
+"""
+Flat-array inference backend for the energy prediction ensemble
+Compiles the trained VotingRegressor (XGBoost + LightGBM + RandomForest) into one
+node table and predicts with vectorized NumPy traversal, so serving workers do not
+need xgboost, lightgbm or scikit-learn at predict time.
+
+Export from the command line:
+    python flat_ensemble.py energy_model.pkl energy_model.flat
+
+A path ending in .npz gives a single archive; any other path gives a directory
+of .npy files that load() memory-maps read-only, so every server process on the
+box shares one physical copy of the node table.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+# Rows x trees traversed per block; bounds the temporary index arrays to a few MB
+BLOCK_CELLS = 1 << 18
+# Once this share of the (row, tree) cells sits on a leaf, only the rest are stepped
+SPARSE_LEAF_FRACTION = 0.5
+
+
+class FlatEnsemble:
+    """
+    Sum-of-trees model stored as flat arrays.
+
+    Every split is 'go left if x <= threshold' on float64 inputs. Children are laid
+    out so that right == left + 1, and leaves point at themselves with an infinite
+    threshold, so every tree can be stepped the same way until its depth runs out.
+    Ensemble weights and tree averaging are folded into the leaf values, so the
+    prediction is bias + the sum of one leaf value per tree.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'default_left', 'value', 'roots', 'depths')
+
+    def __init__(self, feature, threshold, left, default_left, value, roots, depths, bias, n_features):
+        # np.asarray keeps memory-mapped tables as views of the mapping, never copies
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left)
+        self.default_left = np.asarray(default_left)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        self.depths = np.asarray(depths)
+        self.bias = float(bias)
+        self.n_features_in_ = int(n_features)
+        # Trees are stored shallowest first, so the trees still descending at
+        # step k are always a suffix of the roots array
+        self._active_from = np.searchsorted(self.depths, np.arange(int(self.depths.max(initial=0))), side='right')
+        # Native-width indexes: NumPy gathers with intp indices skip a cast per step.
+        # Tables exported by save() are already intp, so this is not a copy.
+        self._feature = self.feature.astype(np.intp, copy=False)
+        self._left = self.left.astype(np.intp, copy=False)
+        self._is_leaf = self._left == np.arange(len(self._left))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def predict(self, X):
+        """Predict for an (N, n_features) array or DataFrame"""
+        X = np.asarray(getattr(X, 'values', X), dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f'Expected input of shape (N, {self.n_features_in_}), got {X.shape}')
+
+        out = np.full(X.shape[0], self.bias)
+        has_nan = bool(np.isnan(X).any())
+        block_rows = max(1, BLOCK_CELLS // max(1, self.n_trees))
+        for start in range(0, X.shape[0], block_rows):
+            block = X[start:start + block_rows]
+            out[start:start + len(block)] += self._leaf_values(block, has_nan).sum(axis=0)
+        return out
+
+    def _leaf_values(self, X, has_nan):
+        """Leaf value reached in every tree, shape (n_trees, n_rows)"""
+        n_rows, n_features = X.shape
+        flat_x = np.ascontiguousarray(X).reshape(-1)
+        row_base = np.arange(n_rows, dtype=np.intp) * n_features
+        # Tree-major layout: the rows walking one tree sit next to each other in memory
+        nodes = np.repeat(self.roots.astype(np.intp)[:, None], n_rows, axis=1)
+
+        # Dense phase: step every (tree, row) cell of the trees that are still descending
+        step = 0
+        for step, first_tree in enumerate(self._active_from):
+            idx = nodes[first_tree:]
+            if step and self._is_leaf[idx].mean() > SPARSE_LEAF_FRACTION:
+                break
+            idx[...] = self._step(idx, flat_x, row_base, has_nan)
+        else:
+            return self.value[nodes]
+
+        # Sparse phase: deep trees, where most cells already reached their leaf
+        flat_nodes = nodes.reshape(-1)
+        cells = np.flatnonzero(~self._is_leaf[flat_nodes])
+        current, cell_base = flat_nodes[cells], row_base[cells % n_rows]
+        for _ in self._active_from[step:]:
+            if not len(cells):
+                break
+            current = self._step(current, flat_x, cell_base, has_nan)
+            descending = ~self._is_leaf[current]
+            flat_nodes[cells[~descending]] = current[~descending]
+            cells, current, cell_base = cells[descending], current[descending], cell_base[descending]
+        return self.value[nodes]
+
+    def _step(self, idx, flat_x, row_base, has_nan):
+        """Move every cell in idx one level down its tree"""
+        x = flat_x[self._feature[idx] + row_base]
+        go_left = x <= self.threshold[idx]
+        if has_nan:
+            go_left |= np.isnan(x) & self.default_left[idx]
+        return self._left[idx] + ~go_left
+
+    def save(self, path):
+        """Write the node table to a .npz archive, or to a directory of .npy files for memory-mapping"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        # Index arrays are stored at native width so loading never converts them
+        arrays['feature'] = self._feature
+        arrays['left'] = self._left
+        if str(path).endswith('.npz'):
+            np.savez(path, bias=np.float64(self.bias), n_features=np.int64(self.n_features_in_), **arrays)
+            return
+
+        os.makedirs(path, exist_ok=True)
+        for name, values in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(values))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'format': 'flat-ensemble', 'version': 1, 'bias': self.bias,
+                       'n_features': self.n_features_in_, 'n_trees': self.n_trees, 'n_nodes': self.n_nodes}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a node table written by save(); directories are memory-mapped read-only unless mmap=False"""
+        if os.path.isdir(path):
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            mmap_mode = 'r' if mmap else None
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+            return cls(bias=meta['bias'], n_features=meta['n_features'], **arrays)
+
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in cls.ARRAYS}
+            return cls(bias=float(data['bias']), n_features=int(data['n_features']), **arrays)
+
+    @property
+    def memory_mapped(self):
+        """True when the node table lives in a shared read-only file mapping"""
+        return isinstance(self.threshold.base, np.memmap)
+
+
+# ========== EXPORTERS ==========
+# Each exporter returns (trees, bias) where a tree is a dict of per-node lists in
+# its library's own numbering: feature, threshold, left, right (-1 for leaves),
+# value and default_left, already converted to 'x <= threshold' on float64 inputs.
+
+def _float32_split_to_float64(t32):
+    """
+    Largest float64 threshold T such that float32(x) <= t32  <=>  x <= T.
+    Libraries that compare float32 copies of the input are reproduced exactly on
+    float64 input this way.
+    """
+    t32 = np.asarray(t32, dtype=np.float32)
+    upper = np.nextafter(t32, np.float32(np.inf))
+    midpoint = (t32.astype(np.float64) + upper.astype(np.float64)) / 2
+    # A value exactly on the midpoint rounds to whichever neighbour has an even mantissa
+    rounds_down = (t32.view(np.uint32) & 1) == 0
+    return np.where(np.isinf(t32), t32.astype(np.float64),
+                    np.where(rounds_down, midpoint, np.nextafter(midpoint, -np.inf)))
+
+
+def _export_sklearn_tree(tree, scale):
+    """sklearn compares float32(x) <= threshold (threshold stored as float64)"""
+    t = tree.tree_
+    leaf = t.children_left == -1
+    threshold = t.threshold.astype(np.float64)
+    # Largest float32 not above the float64 threshold
+    t32 = threshold.astype(np.float32)
+    t32 = np.where(t32.astype(np.float64) > threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+    missing_left = getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8))
+    return {
+        'feature': np.where(leaf, 0, t.feature),
+        'threshold': _float32_split_to_float64(t32),
+        'left': t.children_left,
+        'right': t.children_right,
+        'value': t.value[:, 0, 0] * scale,
+        'default_left': missing_left.astype(bool),
+    }
+
+
+def _export_random_forest(forest, weight):
+    return [_export_sklearn_tree(est, weight / len(forest.estimators_)) for est in forest.estimators_], 0.0
+
+
+def _export_xgboost(model, weight):
+    """XGBoost compares float32(x) < split_condition (float32); leaves keep their value in split_conditions"""
+    booster = model.get_booster()
+    raw = json.loads(booster.save_raw('json'))
+    learner = raw['learner']
+    if learner['gradient_booster'].get('name') != 'gbtree':
+        raise NotImplementedError(f"Unsupported XGBoost booster: {learner['gradient_booster'].get('name')}")
+    if learner['objective']['name'] not in ('reg:squarederror', 'reg:linear'):
+        raise NotImplementedError(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+
+    base_score = learner['learner_model_param']['base_score'].strip('[]').split(',')[0]
+    trees_json = learner['gradient_booster']['model']['trees']
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        trees_json = trees_json[:int(best_iteration) + 1]
+
+    trees = []
+    for tree in trees_json:
+        if any(tree['split_type']):
+            raise NotImplementedError('Categorical XGBoost splits are not supported')
+        left = np.array(tree['left_children'])
+        conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        leaf = left == -1
+        trees.append({
+            'feature': np.where(leaf, 0, tree['split_indices']),
+            'threshold': _float32_split_to_float64(np.nextafter(conditions, np.float32(-np.inf))),
+            'left': left,
+            'right': np.array(tree['right_children']),
+            'value': np.where(leaf, conditions.astype(np.float64), 0.0) * weight,
+            'default_left': np.array(tree['default_left'], dtype=bool),
+        })
+    return trees, float(base_score) * weight
+
+
+def _export_lightgbm(model, weight):
+    """LightGBM compares float64 x <= threshold; the starting average is already folded into the first tree"""
+    booster = getattr(model, 'booster_', model)
+    dump = booster.dump_model()
+    if dump.get('num_tree_per_iteration', 1) != 1 or dump.get('average_output'):
+        raise NotImplementedError('Only single-output boosted LightGBM regressors are supported')
+    tree_info = dump['tree_info']
+    best_iteration = getattr(model, 'best_iteration_', None) or 0
+    if best_iteration > 0:
+        tree_info = tree_info[:best_iteration]
+
+    trees = []
+    for info in tree_info:
+        nodes = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'value': [], 'default_left': []}
+
+        def visit(node):
+            i = len(nodes['feature'])
+            for values in nodes.values():
+                values.append(None)
+            if 'leaf_value' in node:
+                nodes['feature'][i], nodes['threshold'][i] = 0, np.inf
+                nodes['left'][i] = nodes['right'][i] = -1
+                nodes['value'][i], nodes['default_left'][i] = node['leaf_value'] * weight, True
+                return i
+            if node['decision_type'] != '<=':
+                raise NotImplementedError('Categorical LightGBM splits are not supported')
+            missing_type = node.get('missing_type', 'None')
+            if missing_type == 'Zero':
+                raise NotImplementedError('LightGBM zero_as_missing splits are not supported')
+            threshold = float(node['threshold'])
+            nodes['feature'][i], nodes['threshold'][i], nodes['value'][i] = node['split_feature'], threshold, 0.0
+            # With missing_type None LightGBM treats NaN as 0.0
+            nodes['default_left'][i] = node['default_left'] if missing_type == 'NaN' else 0.0 <= threshold
+            nodes['left'][i] = visit(node['left_child'])
+            nodes['right'][i] = visit(node['right_child'])
+            return i
+
+        visit(info['tree_structure'])
+        trees.append({k: np.array(v) for k, v in nodes.items()})
+    return trees, 0.0
+
+
+def _export_estimator(estimator, weight):
+    name = type(estimator).__name__
+    if name == 'XGBRegressor':
+        return _export_xgboost(estimator, weight)
+    if name in ('LGBMRegressor', 'Booster'):
+        return _export_lightgbm(estimator, weight)
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        return _export_random_forest(estimator, weight)
+    if name in ('DecisionTreeRegressor', 'ExtraTreeRegressor'):
+        return [_export_sklearn_tree(estimator, weight)], 0.0
+    raise NotImplementedError(f'Cannot compile estimator of type {name}')
+
+
+# ========== FLATTENING ==========
+
+def _flatten(trees, bias, n_features):
+    """Renumber every tree breadth-first into one node table with right == left + 1"""
+    depths = []
+    renumbered = []
+    for tree in trees:
+        order, depth_of = [0], {0: 0}
+        for node in order:
+            if tree['left'][node] != -1:
+                for child in (tree['left'][node], tree['right'][node]):
+                    depth_of[child] = depth_of[node] + 1
+                    order.append(child)
+        renumbered.append(order)
+        depths.append(max(depth_of.values()))
+
+    by_depth = np.argsort(depths, kind='stable')
+    n_nodes = sum(len(order) for order in renumbered)
+    feature = np.zeros(n_nodes, dtype=np.int32)
+    threshold = np.full(n_nodes, np.inf)
+    left = np.zeros(n_nodes, dtype=np.int32)
+    default_left = np.ones(n_nodes, dtype=bool)
+    value = np.zeros(n_nodes)
+    roots = np.zeros(len(trees), dtype=np.int32)
+
+    offset = 0
+    for slot, t in enumerate(by_depth):
+        tree, order = trees[t], renumbered[t]
+        position = {old: offset + new for new, old in enumerate(order)}
+        roots[slot] = offset
+        for old in order:
+            i = position[old]
+            if tree['left'][old] == -1:
+                left[i] = i
+                value[i] = tree['value'][old]
+            else:
+                left[i] = position[tree['left'][old]]
+                feature[i] = tree['feature'][old]
+                threshold[i] = tree['threshold'][old]
+                default_left[i] = tree['default_left'][old]
+        offset += len(order)
+
+    return FlatEnsemble(feature, threshold, left, default_left, value, roots,
+                        np.asarray(depths, dtype=np.int32)[by_depth], bias, n_features)
+
+
+def compile_model(model):
+    """Compile a fitted VotingRegressor (or a single supported tree model) into a FlatEnsemble"""
+    if type(model).__name__ == 'VotingRegressor':
+        estimators = [est for est in model.estimators_]
+        weights = model._weights_not_none or [1.0] * len(estimators)
+        weights = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    else:
+        estimators, weights = [model], [1.0]
+
+    trees, bias = [], 0.0
+    for estimator, weight in zip(estimators, weights):
+        est_trees, est_bias = _export_estimator(estimator, float(weight))
+        trees.extend(est_trees)
+        bias += est_bias
+
+    return _flatten(trees, bias, model.n_features_in_)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python flat_ensemble.py <energy_model.pkl> <output directory, or file ending in .npz>')
+        sys.exit(1)
+
+    import joblib
+    flat = compile_model(joblib.load(sys.argv[1]))
+    flat.save(sys.argv[2])
+    print(f"[OK] Compiled {flat.n_trees} trees ({flat.n_nodes} nodes) to {sys.argv[2]}")
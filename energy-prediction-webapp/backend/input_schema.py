@@ -0,0 +1,265 @@
+"""
+Input schema for predictions: one set of rules for forms, JSON batches and uploaded files
+Types, ranges and categories are checked column by column on NumPy arrays, and
+failures are kept as one row mask per rule instead of one exception per cell.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import INPUT_DEFAULTS
+
+# Validation rules: field -> (type, min, max, label)
+PREDICTION_FIELDS = {
+    'temperature': (float, -10, 50, 'Temperature (°C)'),
+    'humidity': (float, 0, 100, 'Humidity (%)'),
+    'square_footage': (float, 500, 50000, 'Square footage (sqft)'),
+    'month': (int, 1, 12, 'Month (1-12)'),
+    'hvac_appliances': (int, 0, 20, 'HVAC Appliances count'),
+    'time': (int, 0, 23, 'Hour of day (0-23)')
+}
+VALID_HVAC_TYPES = ['central-ac', 'heat-pump', 'window-ac', 'baseboard', 'other']
+VALID_SEASONS = ['winter', 'spring', 'summer', 'fall']
+
+# Optional text fields: field -> (default, allowed values, label)
+CATEGORICAL_FIELDS = {
+    'hvac_type': ('central-ac', VALID_HVAC_TYPES, 'HVAC Type'),
+    'season': ('spring', VALID_SEASONS, 'Season'),
+}
+
+# int("3.5") fails in predict_form, so only whole-number strings pass for int fields
+INT_TEXT = re.compile(r'\s*[+-]?\d+\s*')
+
+# Column headers accepted in uploaded files, after lowercasing and turning
+# punctuation/spaces into '_' ('Temperature (°C)' -> 'temperature_c')
+HEADER_ALIASES = {
+    'temperature': ('temperature', 'temp', 'temperature_c', 'outdoor_temperature'),
+    'humidity': ('humidity', 'humidity_pct', 'relative_humidity', 'rh'),
+    'square_footage': ('square_footage', 'sqft', 'square_feet', 'area', 'floor_area', 'area_sqft'),
+    'month': ('month',),
+    'time': ('time', 'hour', 'hour_of_day'),
+    'hvac_appliances': ('hvac_appliances', 'hvac', 'hvac_count', 'hvac_units'),
+    'hvac_type': ('hvac_type',),
+    'season': ('season',),
+}
+# Also match with the separators removed ('SquareFootage', 'HVACAppliances')
+_HEADER_LOOKUP = {}
+for _field, _aliases in HEADER_ALIASES.items():
+    for _alias in _aliases:
+        _HEADER_LOOKUP[_alias] = _field
+        _HEADER_LOOKUP.setdefault(_alias.replace('_', ''), _field)
+
+MAX_REPORTED_ROWS = 100  # Row numbers listed per rule in an error report
+
+
+def normalize_header(name):
+    """Schema field for a column header, or None if the column is not a model input"""
+    key = re.sub(r'[^a-z0-9]+', '_', str(name).strip().lower()).strip('_')
+    return _HEADER_LOOKUP.get(key) or _HEADER_LOOKUP.get(key.replace('_', ''))
+
+
+def resolve_headers(headers):
+    """
+    Map file headers to schema fields.
+    Returns {header: field} for the first header of each field, and the headers
+    that were ignored because an earlier column already supplied that field.
+    """
+    mapping, duplicates = {}, []
+    taken = set()
+    for header in headers:
+        field = normalize_header(header)
+        if field is None:
+            continue
+        if field in taken:
+            duplicates.append(str(header))
+            continue
+        taken.add(field)
+        mapping[header] = field
+    return mapping, duplicates
+
+
+class ValidationResult:
+    """
+    Outcome of validate_columns for N rows.
+
+    columns: float64 input columns (NaN where a value was unusable).
+    valid: boolean mask of rows that passed every rule.
+    failures: (field, rule, mask, summary message, per-row message) in check order.
+    """
+
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.columns = {}
+        self.valid = np.ones(n_rows, dtype=bool)
+        self.failures = []
+        self.defaulted_fields = []
+
+    def fail(self, field, rule, mask, summary, row_message=None):
+        if mask.any():
+            self.valid &= ~mask
+            self.failures.append((field, rule, mask, summary, row_message or summary))
+
+    def valid_columns(self):
+        """Input columns of the valid rows only (the arrays themselves when every row is valid)"""
+        if self.valid.all():
+            return dict(self.columns)
+        return {field: values[self.valid] for field, values in self.columns.items()}
+
+    def row_errors(self):
+        """None for each valid row, else its messages (only failing rows are visited)"""
+        errors = [None] * self.n_rows
+        for _, _, mask, _, message in self.failures:
+            for i in np.flatnonzero(mask).tolist():
+                if errors[i] is None:
+                    errors[i] = []
+                errors[i].append(message(i) if callable(message) else message)
+        return errors
+
+
+def validate_columns(raw_columns, n_rows, present=None, fill_missing_columns=False):
+    """
+    Check input columns against PREDICTION_FIELDS and CATEGORICAL_FIELDS.
+
+    raw_columns: field -> array-like of N values (numbers, strings, None);
+        fields that are absent altogether are simply not in the dict.
+    present: optional field -> boolean mask of rows that supplied the field
+        (JSON records); by default a blank/NaN cell counts as not supplied.
+    fill_missing_columns: absent numeric fields take INPUT_DEFAULTS instead of
+        failing every row (uploaded files), and are listed in defaulted_fields.
+    """
+    result = ValidationResult(n_rows)
+    for field, (field_type, min_val, max_val, label) in PREDICTION_FIELDS.items():
+        raw = raw_columns.get(field)
+        if raw is None:
+            if fill_missing_columns:
+                result.columns[field] = np.full(n_rows, INPUT_DEFAULTS[field], dtype=np.float64)
+                result.defaulted_fields.append(field)
+            else:
+                result.columns[field] = np.full(n_rows, np.nan)
+                result.fail(field, 'missing', np.ones(n_rows, dtype=bool), f"Missing: {label}")
+            continue
+
+        raw = np.asarray(raw) if not isinstance(raw, np.ndarray) else raw
+        if raw.dtype.kind in 'biuf':
+            values = raw.astype(np.float64, copy=False)  # float64 input (e.g. Arrow buffers) is not copied
+            text_mask = None
+        else:
+            series = pd.Series(raw, dtype=object)
+            values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+            text_mask = series.map(type).eq(str).to_numpy()
+        supplied = present[field] if present is not None and field in present else ~pd.isna(raw)
+        usable = ~np.isnan(values)
+        if field_type is int:
+            if text_mask is not None and text_mask.any():
+                whole = pd.Series(raw[text_mask], dtype=object).str.fullmatch(INT_TEXT.pattern).to_numpy(dtype=bool)
+                usable[np.flatnonzero(text_mask)[~whole]] = False
+            values = np.trunc(values)
+        in_range = usable & (values >= min_val) & (values <= max_val)
+
+        result.fail(field, 'missing', ~supplied, f"Missing: {label}")
+        result.fail(field, 'type', supplied & ~usable, f"{label} must be a valid {field_type.__name__}")
+        result.fail(field, 'range', supplied & usable & ~in_range,
+                    f"{label} must be between {min_val} and {max_val}",
+                    lambda i, t=field_type, lo=min_val, hi=max_val, label=label, v=values:
+                        f"{label} must be between {lo} and {hi}. Got {t(v[i])}.")
+        result.columns[field] = values if usable.all() else np.where(usable, values, np.nan)
+
+    for field, (default, allowed, label) in CATEGORICAL_FIELDS.items():
+        raw = raw_columns.get(field)
+        if raw is None:
+            continue
+        series = pd.Series(raw, dtype=object)
+        text = series.where(series.map(type).eq(str), '').str.lower()
+        ok = text.isin(allowed).to_numpy()
+        result.fail(field, 'category', ~ok, f"{label} must be one of: {', '.join(allowed)}")
+
+    return result
+
+
+def validate_frame(df):
+    """Validate a parsed upload chunk: headers are matched through HEADER_ALIASES once per chunk"""
+    mapping, duplicates = resolve_headers(df.columns)
+    raw_columns = {}
+    for header, field in mapping.items():
+        column = df[header]
+        if field in CATEGORICAL_FIELDS:
+            column = column.fillna(CATEGORICAL_FIELDS[field][0])  # Blank cell: same default as a missing key
+        raw_columns[field] = column.to_numpy()
+    result = validate_columns(raw_columns, len(df), fill_missing_columns=True)
+    result.renamed_columns = {str(h): f for h, f in mapping.items() if h != f}
+    result.ignored_columns = duplicates
+    return result
+
+
+class ValidationReport:
+    """
+    Compact error report for a whole file, accumulated one chunk at a time.
+    keep_rejected: also keep every rejected row number and why, for exports (see rejected_rows()).
+    """
+
+    def __init__(self, max_rows=MAX_REPORTED_ROWS, keep_rejected=False):
+        self.max_rows = max_rows
+        self.keep_rejected = keep_rejected
+        self._rejected_rows = []
+        self._rejected_codes = []
+        self._reasons = {}  # Reason text -> code
+        self.checked_rows = 0
+        self.invalid_rows = 0
+        self._errors = {}
+        self.defaulted_fields = None
+        self.renamed_columns = {}
+        self.ignored_columns = []
+
+    def add(self, result, row_numbers):
+        """Record one chunk's result; row_numbers are the chunk rows' numbers in the file"""
+        row_numbers = np.asarray(row_numbers)
+        self.checked_rows += result.n_rows
+        self.invalid_rows += int((~result.valid).sum())
+        for field, rule, mask, summary, _ in result.failures:
+            entry = self._errors.setdefault((field, rule), {
+                'field': field, 'rule': rule, 'message': summary, 'count': 0, 'rows': []})
+            entry['count'] += int(mask.sum())
+            room = self.max_rows - len(entry['rows'])
+            if room > 0:
+                entry['rows'].extend(row_numbers[np.flatnonzero(mask)[:room]].tolist())
+        if self.keep_rejected and result.failures:
+            self._keep_rejected(result, row_numbers)
+        if self.defaulted_fields is None:
+            self.defaulted_fields = list(result.defaulted_fields)
+        self.renamed_columns.update(getattr(result, 'renamed_columns', {}))
+        for header in getattr(result, 'ignored_columns', []):
+            if header not in self.ignored_columns:
+                self.ignored_columns.append(header)
+
+    def _keep_rejected(self, result, row_numbers):
+        """Code each rejected row by the set of rules it broke ('; '-joined summaries)"""
+        invalid = np.flatnonzero(~result.valid)
+        broken = np.zeros(result.n_rows, dtype=np.int64)
+        for i, (_, _, mask, _, _) in enumerate(result.failures):
+            broken[mask] |= 1 << i
+        patterns, inverse = np.unique(broken[invalid], return_inverse=True)
+        codes = []
+        for pattern in patterns.tolist():
+            text = '; '.join(f[3] for i, f in enumerate(result.failures) if pattern >> i & 1)
+            codes.append(self._reasons.setdefault(text, len(self._reasons)))
+        self._rejected_rows.append(row_numbers[invalid].astype(np.int64, copy=False))
+        self._rejected_codes.append(np.asarray(codes, dtype=np.int32)[inverse.ravel()])
+
+    def rejected_rows(self):
+        """(row numbers, reason codes, reason texts indexed by code) of every rejected row, in file order"""
+        rows = np.concatenate(self._rejected_rows) if self._rejected_rows else np.empty(0, dtype=np.int64)
+        codes = np.concatenate(self._rejected_codes) if self._rejected_codes else np.empty(0, dtype=np.int32)
+        return rows, codes, list(self._reasons)
+
+    def to_dict(self):
+        return {
+            'checked_rows': self.checked_rows,
+            'valid_rows': self.checked_rows - self.invalid_rows,
+            'invalid_rows': self.invalid_rows,
+            'errors': list(self._errors.values()),
+            'defaulted_fields': self.defaulted_fields or [],
+            'renamed_columns': self.renamed_columns,
+            'ignored_columns': self.ignored_columns,
+        }
@@ -0,0 +1,219 @@
+"""
+Keyword intent routing for chatbot messages
+Every intent's keyword list is compiled into one Aho-Corasick automaton, so a
+message is read once and all the keywords it contains are found together,
+instead of one substring scan per keyword list. Keywords match anywhere in the
+message by default, like the substring checks they replace ('hi' is found in
+'this'); with whole_words=True a keyword only counts when it is not part of a
+longer word. Hit counts per intent show the mix of chatbot traffic. The
+automaton runs in C when pyahocorasick is installed, in Python otherwise.
+"""
+
+import threading
+from collections import Counter, deque
+
+try:
+    import ahocorasick  # pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Intent -> keywords (lowercase). Where the first matching keyword picks the reply
+# (general questions, fallback answers) the keywords are in the order they are tried.
+CHAT_INTENTS = {
+    'greeting': ('hi', 'hello', 'hey', 'howdy', 'good morning', 'good afternoon', 'good evening', 'greetings',
+                 "what's up"),
+    'gratitude': ('thank', 'thanks', 'thx', 'appreciate', 'grateful'),
+    'farewell': ('bye', 'goodbye', 'see you', 'farewell', 'take care'),
+    'prediction_request': ('predict', 'forecast', 'calculate', 'estimate', 'how much', 'consumption'),
+    'prediction_details': ('sqft', 'applicants', 'people', 'area', 'house'),
+    'project': ('energy', 'predict', 'consumption', 'temperature', 'humidity', 'model', 'forecast', 'usage',
+                'efficiency', 'building', 'heating', 'cooling', 'report', 'upload', 'form', 'file', 'data', 'hdd',
+                'cdd'),
+    'general_question': ('what is ai', 'what is machine learning', 'how does'),
+    # Topics of a project question, for suggested follow-ups and offline answers
+    'topic_prediction': ('predict', 'forecast'),
+    'topic_upload': ('upload', 'file', 'csv'),
+    'topic_factors': ('temperature', 'humidity', 'factor'),
+    'topic_efficiency': ('efficiency', 'save', 'reduce'),
+    'topic_model': ('model', 'accuracy'),
+    'fallback_topic': ('predict', 'upload', 'accuracy', 'temperature', 'humidity', 'efficiency', 'file'),
+}
+# The order chatbot_message checks intents in: a message counts towards the first one it matches
+ROUTING_ORDER = ('greeting', 'gratitude', 'farewell', 'prediction_request', 'prediction_details', 'project',
+                 'general_question')
+OTHER_ROUTE = 'other'
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a list of keywords.
+
+    native: use pyahocorasick when it is installed (False always builds the Python tables).
+    """
+
+    def __init__(self, keywords, native=True):
+        self.keywords = tuple(dict.fromkeys(keywords))
+        self._native = None
+        if native and ahocorasick is not None:
+            self._native = ahocorasick.Automaton()
+            for index, word in enumerate(self.keywords):
+                self._native.add_word(word, index)
+            self._native.make_automaton()
+            return
+
+        goto = [{}]
+        outputs = [()]
+        for index, word in enumerate(self.keywords):
+            state = 0
+            for char in word:
+                if char not in goto[state]:
+                    goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append(())
+                state = goto[state][char]
+            outputs[state] += (index,)
+
+        # Breadth first, so a state's fallback (its longest proper suffix that is also a keyword
+        # prefix) is complete before the state itself. Each state's table is filled in for every
+        # character its fallback handles, so scanning is one dict lookup per character.
+        fallback = [0] * len(goto)
+        transitions = [None] * len(goto)
+        transitions[0] = dict(goto[0])
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            inherited = transitions[fallback[state]]
+            transitions[state] = {**inherited, **goto[state]}
+            outputs[state] += outputs[fallback[state]]
+            for char, child in goto[state].items():
+                fallback[child] = inherited.get(char, 0)
+                pending.append(child)
+        self._steps = [table.get for table in transitions]
+        self._outputs = outputs
+
+    @property
+    def engine(self):
+        return 'pyahocorasick' if self._native is not None else 'python'
+
+    def find(self, text):
+        """(end, keyword index) of every keyword occurrence in text, in one pass"""
+        if self._native is not None:
+            return [(last + 1, index) for last, index in self._native.iter(text)]
+        found = []
+        state = 0
+        steps = self._steps
+        outputs = self._outputs
+        for position, char in enumerate(text):
+            state = steps[state](char, 0)
+            if outputs[state]:
+                found.extend((position + 1, index) for index in outputs[state])
+        return found
+
+    def find_keywords(self, text):
+        """Indexes of the keywords that occur in text, in one pass"""
+        if self._native is not None:
+            return {index for _, index in self._native.iter(text)}
+        found = set()
+        state = 0
+        steps = self._steps
+        outputs = self._outputs
+        for char in text:
+            state = steps[state](char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+
+class IntentMatch:
+    """The intents a message matched"""
+
+    def __init__(self, router, mask, found):
+        self._router = router
+        self.mask = mask  # One bit per intent, in the order of router.intents
+        self._found = found  # Automaton indexes of every keyword found
+
+    @property
+    def keywords(self):
+        return {self._router.keywords[index] for index in self._found}
+
+    def __contains__(self, intent):
+        return bool(self.mask & self._router.intent_bits[intent])
+
+    def first(self, intent):
+        """The intent's first keyword (in table order) that the message contains, or None"""
+        if not self.mask & self._router.intent_bits[intent]:
+            return None
+        return next(self._router.keywords[index] for index in self._router.keyword_indexes[intent]
+                    if index in self._found)
+
+    @property
+    def route(self):
+        """The first intent in routing order that the message matched"""
+        return next((intent for intent in self._router.routing_order if intent in self), OTHER_ROUTE)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class IntentRouter:
+    """
+    Finds every intent keyword in a message with one automaton pass.
+
+    intents: {intent: keywords}.
+    whole_words: only count keywords that are not part of a longer word.
+    """
+
+    def __init__(self, intents=CHAT_INTENTS, routing_order=ROUTING_ORDER, whole_words=False):
+        self.intents = {intent: tuple(words) for intent, words in intents.items()}
+        self.intent_bits = {intent: 1 << bit for bit, intent in enumerate(self.intents)}
+        self.routing_order = tuple(routing_order)
+        self.whole_words = whole_words
+        self._automaton = KeywordAutomaton(word for words in self.intents.values() for word in words)
+        self.keywords = self._automaton.keywords
+        self.keyword_indexes = {intent: tuple(self.keywords.index(word) for word in words)
+                                for intent, words in self.intents.items()}
+        # Keyword index -> bits of the intents it belongs to
+        self._keyword_bits = [
+            sum(bit for intent, bit in self.intent_bits.items() if word in self.intents[intent])
+            for word in self._automaton.keywords
+        ]
+        self._lock = threading.Lock()
+        self._mask_counts = {}  # Messages per combination of matched intents
+
+    def match(self, msg_lower):
+        """Intents in a lowercased message; counted towards the traffic mix"""
+        if self.whole_words:
+            found = {index for end, index in self._automaton.find(msg_lower)
+                     if self._whole_word(msg_lower, end - len(self.keywords[index]), end)}
+        else:
+            found = self._automaton.find_keywords(msg_lower)
+        mask = 0
+        for index in found:
+            mask |= self._keyword_bits[index]
+        with self._lock:
+            self._mask_counts[mask] = self._mask_counts.get(mask, 0) + 1
+        return IntentMatch(self, mask, found)
+
+    @staticmethod
+    def _whole_word(text, start, end):
+        return not ((start > 0 and _is_word_char(text[start - 1])) or (end < len(text) and _is_word_char(text[end])))
+
+    def stats(self):
+        with self._lock:
+            mask_counts = dict(self._mask_counts)
+        routes = Counter()
+        hits = Counter()
+        for mask, count in mask_counts.items():
+            match = IntentMatch(self, mask, ())
+            routes[match.route] += count
+            for intent, bit in self.intent_bits.items():
+                if mask & bit:
+                    hits[intent] += count
+        return {
+            'messages': sum(mask_counts.values()),
+            'whole_words': self.whole_words,
+            'engine': self._automaton.engine,
+            'routes': dict(routes.most_common()),  # First intent of each message in routing order
+            'intent_hits': dict(hits.most_common()),  # Every intent each message matched
+        }
@@ -0,0 +1,211 @@
+"""
+Precomputed prediction surface for the low-latency "fast" mode
+Scores the ensemble once over a grid of the six raw inputs and answers later
+requests by multilinear interpolation between the surrounding grid points.
+Answers are approximate; measure_error() reports how far they are from the model.
+"""
+
+import bisect
+import json
+import os
+
+import numpy as np
+
+# Input fields in grid axis order
+SURFACE_FIELDS = ('temperature', 'humidity', 'square_footage', 'month', 'time', 'hvac_appliances')
+
+# Grid points per axis (about 1.1M points, 9 MB). Month and hour use every whole
+# value, so their step-shaped features (season, peak/night hours) are looked up
+# exactly. Square footage moves predictions the most, humidity the least.
+DEFAULT_GRID_POINTS = {
+    'temperature': 13,
+    'humidity': 4,
+    'square_footage': 21,
+    'month': 12,
+    'time': 24,
+    'hvac_appliances': 3,
+}
+
+# Extra points where the features bend: heating below 18°C, cooling above 22°C,
+# LargeBuilding above 7500 sqft
+AXIS_KNOTS = {
+    'temperature': (18.0, 22.0),
+    'square_footage': (7500.0,),
+}
+
+INTEGER_AXES = ('month', 'time', 'hvac_appliances')
+
+
+def parse_grid_points(spec):
+    """'temperature=16,hvac_appliances=21' -> DEFAULT_GRID_POINTS with those counts replaced"""
+    points = dict(DEFAULT_GRID_POINTS)
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        field, _, count = part.partition('=')
+        field = field.strip()
+        if field not in points:
+            raise ValueError(f"Unknown surface axis '{field}' (expected one of {', '.join(SURFACE_FIELDS)})")
+        points[field] = int(count)
+        if points[field] < 2:
+            raise ValueError(f"Surface axis '{field}' needs at least 2 points")
+    return points
+
+
+def axis_points(field, low, high, count):
+    """Sorted grid coordinates for one input between its bounds"""
+    points = np.linspace(low, high, count)
+    knots = [k for k in AXIS_KNOTS.get(field, ()) if low < k < high]
+    points = np.concatenate([points, knots])
+    if field in INTEGER_AXES:
+        points = np.round(points)
+    return np.unique(points)
+
+
+class InterpolationSurface:
+    """
+    Model predictions on a regular (not necessarily evenly spaced) 6-D grid.
+
+    axes: one sorted coordinate array per SURFACE_FIELDS entry.
+    values: predictions with shape tuple(len(a) for a in axes).
+    """
+
+    def __init__(self, axes, values, version=None, error=None):
+        self.axes = [np.asarray(a, dtype=np.float64) for a in axes]
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        if self.values.shape != tuple(len(a) for a in self.axes):
+            raise ValueError(f'values shape {self.values.shape} does not match the axes')
+        self.version = version
+        self.error = error
+        self._flat = self.values.reshape(-1)
+        self._strides = [s // self.values.itemsize for s in self.values.strides]
+        # Plain lists for the single-row path: bisect on a list beats a NumPy call
+        self._axis_lists = [a.tolist() for a in self.axes]
+
+    @property
+    def n_points(self):
+        return self._flat.size
+
+    @classmethod
+    def build(cls, predict_fn, bounds, grid_points=None, chunk_rows=65536, version=None):
+        """
+        Score every grid point.
+
+        predict_fn(columns, n_rows) -> predictions for a dict of input columns.
+        bounds: field -> (low, high), e.g. the API validation limits.
+        """
+        grid_points = grid_points or DEFAULT_GRID_POINTS
+        axes = [axis_points(f, bounds[f][0], bounds[f][1], grid_points[f]) for f in SURFACE_FIELDS]
+        shape = tuple(len(a) for a in axes)
+        values = np.empty(int(np.prod(shape)), dtype=np.float64)
+        for start in range(0, values.size, chunk_rows):
+            stop = min(start + chunk_rows, values.size)
+            index = np.unravel_index(np.arange(start, stop), shape)
+            columns = {f: axes[i][index[i]] for i, f in enumerate(SURFACE_FIELDS)}
+            values[start:stop] = predict_fn(columns, stop - start)
+        return cls(axes, values.reshape(shape), version=version)
+
+    def predict_columns(self, columns, n_rows=None):
+        """Interpolated predictions for a dict of input columns (inputs are clamped to the grid)"""
+        coords = [np.asarray(columns[f], dtype=np.float64).reshape(-1) for f in SURFACE_FIELDS]
+        n_rows = coords[0].shape[0] if n_rows is None else n_rows
+        base = np.zeros(n_rows, dtype=np.intp)
+        moving = []  # (stride, fraction) for axes where some row sits between grid points
+        for field, axis, stride, x in zip(SURFACE_FIELDS, self.axes, self._strides, coords):
+            if field in INTEGER_AXES:
+                x = np.trunc(x)
+            x = np.clip(x, axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+            frac = (x - axis[i]) / (axis[i + 1] - axis[i])
+            base += i * stride
+            if frac.any():
+                moving.append((stride, frac))
+
+        # Sum over the 2^k corners of the cell, k = axes that actually need blending
+        result = np.zeros(n_rows, dtype=np.float64)
+        for corner in range(1 << len(moving)):
+            offset = base.copy()
+            weight = np.ones(n_rows, dtype=np.float64)
+            for bit, (stride, frac) in enumerate(moving):
+                if corner >> bit & 1:
+                    offset += stride
+                    weight *= frac
+                else:
+                    weight *= 1 - frac
+            result += weight * self._flat[offset]
+        return result
+
+    def predict_one(self, record):
+        """Interpolated prediction for one input dict, in plain Python (a few microseconds)"""
+        base = 0
+        moving = []
+        for field, axis, stride in zip(SURFACE_FIELDS, self._axis_lists, self._strides):
+            x = float(record[field])
+            if field in INTEGER_AXES:
+                x = float(int(x))
+            x = min(max(x, axis[0]), axis[-1])
+            i = min(max(bisect.bisect_right(axis, x) - 1, 0), len(axis) - 2)
+            frac = (x - axis[i]) / (axis[i + 1] - axis[i])
+            base += i * stride
+            if frac:
+                moving.append((stride, frac))
+
+        flat = self._flat
+        total = 0.0
+        for corner in range(1 << len(moving)):
+            offset = base
+            weight = 1.0
+            for bit, (stride, frac) in enumerate(moving):
+                if corner >> bit & 1:
+                    offset += stride
+                    weight *= frac
+                else:
+                    weight *= 1 - frac
+            total += weight * flat[offset]
+        return float(total)
+
+    def measure_error(self, predict_fn, n_samples=2000, seed=0):
+        """Compare against the full model at random inputs within the grid bounds"""
+        rng = np.random.default_rng(seed)
+        columns = {}
+        for field, axis in zip(SURFACE_FIELDS, self.axes):
+            if field in INTEGER_AXES:
+                columns[field] = rng.integers(int(axis[0]), int(axis[-1]) + 1, n_samples).astype(np.float64)
+            else:
+                columns[field] = rng.uniform(axis[0], axis[-1], n_samples)
+        exact = np.asarray(predict_fn(columns, n_samples), dtype=np.float64)
+        abs_error = np.abs(self.predict_columns(columns, n_samples) - exact)
+        pct_error = abs_error / np.maximum(np.abs(exact), 1e-9) * 100
+        self.error = {
+            'samples': n_samples,
+            'mean_abs_error_kwh': round(float(abs_error.mean()), 3),
+            'p95_abs_error_kwh': round(float(np.percentile(abs_error, 95)), 3),
+            'max_abs_error_kwh': round(float(abs_error.max()), 3),
+            'mean_pct_error': round(float(pct_error.mean()), 3),
+            'p95_pct_error': round(float(np.percentile(pct_error, 95)), 3),
+        }
+        return self.error
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'grid': {f: len(a) for f, a in zip(SURFACE_FIELDS, self.axes)},
+            'points': self.n_points,
+            'megabytes': round(self.values.nbytes / 1e6, 1),
+            'error': self.error,
+        }
+
+    def save(self, path):
+        """Write the grid to a .npz so a restart with the same model skips the build"""
+        arrays = {f'axis_{f}': a for f, a in zip(SURFACE_FIELDS, self.axes)}
+        meta = json.dumps({'version': self.version, 'error': self.error})
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, values=self.values, meta=np.array(meta), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            axes = [data[f'axis_{f}'] for f in SURFACE_FIELDS]
+            return cls(axes, data['values'], version=meta['version'], error=meta['error'])
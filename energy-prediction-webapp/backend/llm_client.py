@@ -0,0 +1,282 @@
+"""
+Gemini client for the chatbot
+Calls the Gemini REST API (generateContent) over one shared requests.Session, so
+connections are reused from message to message, and sends the system prompt as
+the model's system instruction instead of pasting it into every user turn.
+Calls run on a small thread pool: at most max_concurrency are in flight (more
+are refused rather than queued), each one has a hard deadline, and a circuit
+breaker stops calling an upstream that keeps failing, so the chatbot answers
+from its fallback responses straight away. base_url points the client at a
+local fake server in tests. stream() forwards the reply chunk by chunk as Gemini
+generates it (streamGenerateContent over server-sent events).
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com/v1beta'
+DEFAULT_MODEL = 'gemini-1.5-flash'
+DEFAULT_TIMEOUT = 10.0  # Seconds per call, connecting included
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_RESET = 30.0  # Seconds the breaker stays open before a trial call
+CONNECT_TIMEOUT = 3.05
+# What reading a payload of an unexpected shape raises (a list for a dict, a missing part, ...)
+MALFORMED_PAYLOAD_ERRORS = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+
+class LLMUnavailable(Exception):
+    """
+    No answer from the model. reason is one of 'not_configured', 'circuit_open',
+    'busy', 'timeout', 'upstream_error' or 'empty_response'.
+    """
+
+    def __init__(self, reason, detail=''):
+        super().__init__(f'{reason}: {detail}' if detail else reason)
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold failures in a row and then refuses calls. Once
+    reset_seconds have passed one trial call is let through (half-open): success
+    closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_FAILURES, reset_seconds=DEFAULT_BREAKER_RESET,
+                 clock=time.monotonic):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = float(reset_seconds)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self._clock() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'  # This caller makes the trial call; others are refused until it ends
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                self.state = 'open'
+                self.opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures, 'times_opened': self.times_opened}
+
+
+class GeminiClient:
+    """
+    api_key: Gemini API key ('' leaves the client disabled).
+    timeout: hard limit in seconds on each call.
+    max_concurrency: calls in flight at once; further calls fail with 'busy'.
+    """
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, timeout=DEFAULT_TIMEOUT,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, breaker=None):
+        self.api_key = api_key
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/models/{model}:generateContent"
+        self.stream_url = f"{base_url.rstrip('/')}/models/{model}:streamGenerateContent?alt=sse"
+        self.timeout = float(timeout)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        self.session.headers.update({'x-goog-api-key': api_key, 'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gemini')
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.counts = {'calls': 0, 'streamed': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'refused_busy': 0,
+                       'refused_circuit_open': 0}
+
+    @property
+    def enabled(self):
+        return bool(self.api_key)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _acquire(self):
+        """Take a concurrency slot for a call, or raise LLMUnavailable when the call cannot be made"""
+        if not self.enabled:
+            raise LLMUnavailable('not_configured')
+        if not self._slots.acquire(blocking=False):
+            self._count('refused_busy')
+            raise LLMUnavailable('busy', f'{self.max_concurrency} calls already in flight')
+        if not self.breaker.allow():
+            self._slots.release()
+            self._count('refused_circuit_open')
+            raise LLMUnavailable('circuit_open')
+        self._count('calls')
+
+    @staticmethod
+    def _request_body(prompt, system_instruction, generation_config):
+        body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        if system_instruction:
+            body['systemInstruction'] = {'parts': [{'text': system_instruction}]}
+        if generation_config:
+            body['generationConfig'] = generation_config
+        return body
+
+    @staticmethod
+    def _candidate_text(payload):
+        """(text, finishReason) of a response payload's first candidate; LLMUnavailable if it is malformed"""
+        try:
+            candidates = payload.get('candidates') or []
+            first = candidates[0] if candidates else {}
+            parts = first.get('content', {}).get('parts', [])
+            return ''.join(part.get('text', '') for part in parts), first.get('finishReason', '')
+        except MALFORMED_PAYLOAD_ERRORS as e:
+            raise LLMUnavailable('upstream_error', f'malformed response: {type(e).__name__}: {e}') from e
+
+    def submit(self, prompt, system_instruction=None, generation_config=None):
+        """
+        Start a call on the client's thread pool and return its Future (the reply text).
+        Raises LLMUnavailable right away when the call cannot be made.
+        """
+        self._acquire()
+        deadline = time.monotonic() + self.timeout
+        try:
+            future = self._pool.submit(self._call, prompt, system_instruction, generation_config, deadline)
+        except RuntimeError:  # Pool shut down
+            self._slots.release()
+            raise LLMUnavailable('not_configured', 'client closed')
+        future.add_done_callback(lambda _: self._slots.release())  # The slot is held until the request really ends
+        future.deadline = deadline
+        return future
+
+    def generate(self, prompt, system_instruction=None, generation_config=None):
+        """The model's reply to prompt, waiting at most timeout seconds"""
+        future = self.submit(prompt, system_instruction, generation_config)
+        try:
+            return future.result(timeout=max(0.0, future.deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self._count('timed_out')
+            self.breaker.record_failure()
+            raise LLMUnavailable('timeout', f'no reply within {self.timeout:g}s')
+
+    def _call(self, prompt, system_instruction, generation_config, deadline):
+        body = self._request_body(prompt, system_instruction, generation_config)
+        try:
+            read_timeout = max(0.001, deadline - time.monotonic())
+            response = self.session.post(self.url, json=body, timeout=(min(CONNECT_TIMEOUT, read_timeout), read_timeout))
+            if response.status_code != 200:
+                raise LLMUnavailable('upstream_error', f'HTTP {response.status_code}: {response.text[:200]}')
+            text, finish_reason = self._candidate_text(response.json())
+        except (requests.RequestException, ValueError, LLMUnavailable) as e:
+            self._finished(deadline, ok=False)
+            if isinstance(e, LLMUnavailable):
+                raise
+            raise LLMUnavailable('upstream_error', f'{type(e).__name__}: {e}')
+        self._finished(deadline, ok=True)
+        if not text:
+            raise LLMUnavailable('empty_response', finish_reason or 'no candidates')
+        return text
+
+    def stream(self, prompt, system_instruction=None, generation_config=None):
+        """
+        The model's reply as an iterator of text chunks, forwarded as they are generated.
+        Waits for the first chunk (at most timeout seconds) and raises LLMUnavailable if
+        there is none; later gaps of more than timeout seconds end the iterator with
+        LLMUnavailable. The call holds its concurrency slot until the iterator ends or
+        is closed.
+        """
+        self._acquire()
+        self._count('streamed')
+        chunks = self._stream_chunks(self._request_body(prompt, system_instruction, generation_config))
+        first = next(chunks)  # Failures before the reply starts are raised here
+        return self._resume(first, chunks)
+
+    @staticmethod
+    def _resume(first, chunks):
+        try:
+            yield first
+            yield from chunks
+        finally:
+            chunks.close()
+
+    def _stream_chunks(self, body):
+        outcome = 'failed'
+        response = None
+        try:
+            response = self.session.post(self.stream_url, json=body, stream=True,
+                                         timeout=(min(CONNECT_TIMEOUT, self.timeout), self.timeout))
+            if response.status_code != 200:
+                raise LLMUnavailable('upstream_error', f'HTTP {response.status_code}: {response.text[:200]}')
+            received = False
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):  # Each chunk as it arrives
+                if not line.startswith('data:'):
+                    continue
+                text, _ = self._candidate_text(json.loads(line[5:]))  # Malformed events raise LLMUnavailable
+                if text:
+                    received = True
+                    yield text
+            if not received:
+                raise LLMUnavailable('empty_response', 'stream ended without text')
+            outcome = 'succeeded'
+        except GeneratorExit:
+            outcome = 'succeeded'  # The reader stopped early (client went away); the upstream was fine
+            raise
+        except requests.RequestException as e:
+            # A read timeout while streaming surfaces as a ConnectionError wrapping urllib3's timeout
+            if isinstance(e, requests.Timeout) or 'timed out' in str(e).lower():
+                outcome = 'timed_out'
+                raise LLMUnavailable('timeout', f'no data within {self.timeout:g}s') from e
+            raise LLMUnavailable('upstream_error', f'{type(e).__name__}: {e}') from e
+        except ValueError as e:
+            raise LLMUnavailable('upstream_error', f'{type(e).__name__}: {e}') from e
+        finally:
+            if response is not None:
+                response.close()
+            self._count(outcome)
+            if outcome == 'succeeded':
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            self._slots.release()
+
+    def _finished(self, deadline, ok):
+        """Record a call's outcome, unless its caller already gave up on it (counted as a timeout)"""
+        if time.monotonic() > deadline:
+            return
+        self._count('succeeded' if ok else 'failed')
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {'enabled': self.enabled, 'model': self.model, 'timeout_seconds': self.timeout,
+                'max_concurrency': self.max_concurrency, **counts, 'circuit': self.breaker.stats()}
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
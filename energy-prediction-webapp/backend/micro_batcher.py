@@ -0,0 +1,113 @@
+"""
+Micro-batching for concurrent single-row predictions
+Request threads hand their feature row to one worker thread, which runs a single
+model call for every row that arrived together and gives each caller its own
+result. An idle server answers a lone request straight away; the collection
+window only applies while requests are arriving back to back.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 64
+
+
+class MicroBatcher:
+    """
+    predict_fn(model, matrix) -> array of predictions, called from the worker thread.
+
+    window_ms: how long to keep collecting rows once a burst is under way
+        (0 disables batching; submit() then predicts in the calling thread).
+    max_batch: rows per model call.
+    """
+
+    def __init__(self, predict_fn, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        self.predict_fn = predict_fn
+        self.window = max(0.0, float(window_ms)) / 1000
+        self.max_batch = max(1, int(max_batch))
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._last_flush = float('-inf')
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch > 1
+
+    def submit(self, model, row):
+        """Predict one (n_features,) row, batched with whatever else is in flight"""
+        if not self.enabled:
+            return float(self.predict_fn(model, np.asarray(row)[None, :])[0])
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((model, row, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # Started lazily so each forked server process gets its own thread
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather the rest of the batch"""
+        batch = [self._queue.get()]
+        # Only wait for company when the previous batch was moments ago (a burst)
+        busy = time.monotonic() - self._last_flush < self.window
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if not busy or remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Rows queued across a model swap are scored by the model they were submitted with
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(id(item[0]), []).append(item)
+            for items in by_model.values():
+                try:
+                    predictions = self.predict_fn(items[0][0], np.stack([row for _, row, _ in items]))
+                except Exception as e:
+                    for _, _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, _, future), prediction in zip(items, predictions):
+                    future.set_result(float(prediction))
+            self._last_flush = time.monotonic()
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'rows': self.rows,
+            'average_batch': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+        }
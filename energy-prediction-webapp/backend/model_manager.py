@@ -0,0 +1,170 @@
+"""
+Hot model reloads without restarting the server
+Loads a new model off the request path, validates it and swaps it in with one
+reference assignment. Requests that already picked up the old model finish on it.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+# What a request scores with: the model object and the version string reported to clients
+ServingModel = namedtuple('ServingModel', ['model', 'version', 'source', 'loaded_at'])
+
+NO_MODEL = ServingModel(None, None, None, None)
+
+
+class ModelValidationError(Exception):
+    """A freshly loaded model failed its checks and was not swapped in"""
+
+
+def artifact_signature(path):
+    """Cheap change detector for a model file or export directory: (name, size, mtime) of every file"""
+    if not path or not os.path.exists(path):
+        return None
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path))
+    else:
+        files = [path]
+    signature = []
+    for file_path in files:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((os.path.basename(file_path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def artifact_version(path):
+    """Version string for an artifact: its modification time plus a short content hash"""
+    if not path or not os.path.exists(path):
+        return 'unknown'
+    files = sorted(os.path.join(path, name) for name in os.listdir(path)) if os.path.isdir(path) else [path]
+    digest = hashlib.sha1()
+    newest = 0.0
+    for file_path in files:
+        newest = max(newest, os.path.getmtime(file_path))
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(newest))}-{digest.hexdigest()[:8]}"
+
+
+def load_pinned(path, loader, attempts=3):
+    """
+    (loader(path), version) with the version hashed from the same file contents that were
+    loaded: hash, load, hash again, and try again if the artifact was replaced in between
+    """
+    for _ in range(attempts):
+        before = artifact_version(path)
+        model = loader(path)
+        if artifact_version(path) == before:
+            return model, before
+        print(f"[INFO] {path} changed while it was being loaded, loading it again")
+    raise ModelValidationError(f'{path} kept changing while it was being loaded')
+
+
+class ModelManager:
+    """
+    Owns the serving model.
+
+    load_fn() -> (model, source_path, version) loads the newest artifact (model is None if there
+        is none). The version should come from load_pinned(), so it belongs to the bytes that were loaded.
+    validate_fn(model) raises ModelValidationError when the model must not serve.
+    on_swap(serving_model) is called after every swap, e.g. to update module globals.
+    watch_paths_fn() -> paths whose changes trigger a reload when watching.
+    """
+
+    def __init__(self, load_fn, validate_fn=None, on_swap=None, watch_paths_fn=None):
+        self.load_fn = load_fn
+        self.validate_fn = validate_fn
+        self.on_swap = on_swap
+        self.watch_paths_fn = watch_paths_fn
+        self.current = NO_MODEL
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_reload_seconds = None
+
+    def reload(self, reason='manual'):
+        """Load, validate and swap in the newest model. Returns a summary dict; never raises."""
+        with self._reload_lock:
+            previous = self.current
+            started = time.perf_counter()
+            try:
+                model, source, version = self.load_fn()
+                if model is None:
+                    raise ModelValidationError('No model artifact found')
+                if self.validate_fn:
+                    self.validate_fn(model)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f'{type(e).__name__}: {e}'
+                print(f"[ERROR] Model reload ({reason}) failed, still serving {previous.version}: {self.last_error}")
+                return {'reloaded': False, 'reason': reason, 'version': previous.version, 'error': self.last_error}
+
+            # Single reference assignment: requests read self.current once and keep that model
+            self.current = ServingModel(model, version, source, time.time())
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = round(time.perf_counter() - started, 3)
+            if self.on_swap:
+                self.on_swap(self.current)
+            print(f"[OK] Model {version} is now serving ({reason}, {self.last_reload_seconds:.2f}s, "
+                  f"previous {previous.version})")
+            return {'reloaded': True, 'reason': reason, 'version': version,
+                    'previous_version': previous.version, 'seconds': self.last_reload_seconds}
+
+    def _signature(self):
+        return tuple(artifact_signature(p) for p in self.watch_paths_fn())
+
+    def watch(self, interval_seconds):
+        """Poll the artifact paths and reload once a change has stayed put for one interval"""
+        if interval_seconds <= 0 or self.watch_paths_fn is None or self._watcher is not None:
+            return
+
+        def run():
+            seen = self._signature()
+            pending = None
+            while not self._stop_watching.wait(interval_seconds):
+                try:
+                    signature = self._signature()
+                except Exception as e:
+                    print(f"[WARNING] Model watcher could not stat artifacts: {e}")
+                    continue
+                if signature == seen:
+                    pending = None
+                elif signature == pending:
+                    # Unchanged since the last poll, so the writer has finished
+                    self.reload(reason='artifact changed')
+                    # Re-read so files written by the reload itself (e.g. a flat export) are not a new change
+                    seen, pending = self._signature(), None
+                else:
+                    pending = signature
+
+        self._watcher = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self._watcher.start()
+        print(f"[INFO] Watching model artifacts every {interval_seconds}s")
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def status(self):
+        current = self.current
+        return {
+            'version': current.version,
+            'source': current.source,
+            'loaded_at': current.loaded_at,
+            'reloads': self.reloads,
+            'failed_reloads': self.failed_reloads,
+            'last_error': self.last_error,
+            'last_reload_seconds': self.last_reload_seconds,
+            'watching': self._watcher is not None and not self._stop_watching.is_set(),
+        }
@@ -0,0 +1,142 @@
+"""
+Bounded LRU cache for model predictions
+Keys are the normalized model inputs, so repeated dashboard refreshes and
+re-submitted forms skip the model. Entries expire after a TTL and the whole
+cache is dropped when a different model object is bound. Only small requests
+use it: bulk inputs (files, batches, jobs) would need a Python key per row under
+the cache lock and would evict the interactive entries it exists for.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ROWS = 100  # Larger requests are scored without the cache
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU map from input key to prediction.
+
+    max_entries: entries kept before the least recently used one is evicted
+        (0 disables the cache).
+    ttl_seconds: age after which an entry counts as a miss (0 = never expires).
+    max_rows: requests with more rows than this bypass the cache (see accepts()).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic,
+                 max_rows=DEFAULT_MAX_ROWS):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_rows = int(max_rows)
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (stored_at, prediction)
+        self._model = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def accepts(self, n_rows):
+        """Whether a request of n_rows should use the cache; larger ones are counted as bypassed"""
+        if not self.enabled:
+            return False
+        if n_rows > self.max_rows:
+            with self._lock:
+                self.bypassed += 1
+            return False
+        return True
+
+    def _bind(self, model):
+        """Drop every entry if predictions now come from a different model (lock held)"""
+        if model is not self._model:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._model = model
+
+    def lookup(self, keys, model):
+        """Cached prediction for each key, or None where the model has to run"""
+        found = [None] * len(keys)
+        if not self.enabled:
+            return found
+        now = self._clock()
+        with self._lock:
+            self._bind(model)
+            for i, key in enumerate(keys):
+                entry = None if key is None else self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                elif self.ttl_seconds and now - entry[0] > self.ttl_seconds:
+                    del self._entries[key]
+                    self.expirations += 1
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    found[i] = entry[1]
+                    self.hits += 1
+        return found
+
+    def store(self, keys, predictions, model):
+        """Remember predictions made by model, evicting the least recently used entries"""
+        if not self.enabled:
+            return
+        now = self._clock()
+        with self._lock:
+            self._bind(model)
+            for key, prediction in zip(keys, predictions):
+                if key is None:
+                    continue
+                self._entries[key] = (now, float(prediction))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'max_rows': self.max_rows,
+                'bypassed': self.bypassed,  # Requests over max_rows, scored without the cache
+            }
+
+
+def input_keys(features):
+    """Cache keys for the rows of a feature matrix.
+
+    The first six columns are the normalized raw inputs (integer fields already
+    truncated); every other feature is derived from them. Rows with NaN inputs
+    get None and are never cached.
+    """
+    inputs = np.asarray(features)[:, :6]
+    keys = list(map(tuple, inputs.tolist()))
+    if np.isnan(inputs).any():
+        for i in np.flatnonzero(np.isnan(inputs).any(axis=1)):
+            keys[i] = None
+    return keys
@@ -0,0 +1,460 @@
+"""
+Background prediction jobs for large file uploads
+An upload is saved to disk and scored by a small pool of low-priority worker
+processes, so web workers stay free for interactive predictions. Job state lives
+in files under the jobs folder, so any server process can report on any job.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from feature_engine import DeduplicationReport
+from file_ingest import (ARROW_EXTENSIONS, CSV_EXTENSIONS, DEFAULT_CHUNK_ROWS, count_arrow_rows, iter_upload_chunks,
+                         open_decompressed, split_upload_type, upload_path)
+from input_schema import PREDICTION_FIELDS, ValidationReport
+from model_manager import load_pinned
+from pdf_extract import DEFAULT_WORKERS as DEFAULT_PDF_WORKERS, page_timing_report
+from prediction_stats import PredictionStatistics
+from scoring import run_model, score_chunk
+
+DEFAULT_WORKERS = 1
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+JOB_NICENESS = 10  # Job processes yield the CPU to the web workers
+JOB_RETENTION_SECONDS = 24 * 3600  # Finished jobs and their results are removed after a day
+JOB_CLEANUP_INTERVAL_SECONDS = 300  # Expired jobs are looked for at most this often
+
+JOB_FILE = 'job.json'
+REJECTED_REASONS_FILE = 'rejected_reasons.json'  # Reason texts of rejected_reasons.npy codes
+EXPORT_BLOCK_ROWS = 50000  # Rows read from the result files per export block
+
+INPUT_FIELDS = tuple(PREDICTION_FIELDS)  # Column order of inputs.npy
+# Job fields stored with cached results and restored on a cache hit
+CACHED_JOB_FIELDS = ('rows_done', 'total_rows', 'average_prediction', 'validation', 'statistics', 'deduplication',
+                     'pdf_extraction')
+
+
+def clamp_page_size(page_size):
+    """Rows per results page, kept between 1 and MAX_PAGE_SIZE"""
+    return min(max(int(page_size), 1), MAX_PAGE_SIZE)
+
+
+def _job_dir(folder, job_id):
+    return os.path.join(folder, job_id)
+
+
+def read_job(folder, job_id):
+    """The job's state dict, or None if there is no such job"""
+    # Ids are hex uuids; anything else could escape the jobs folder
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(os.path.join(_job_dir(folder, job_id), JOB_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_job(folder, job):
+    """Replace job.json atomically so readers never see half a file"""
+    path = os.path.join(_job_dir(folder, job['job_id']), JOB_FILE)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def count_data_lines(path, compression=None):
+    """Rows in a CSV/TXT upload (lines after the header), counted without parsing"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as raw, (open_decompressed(raw, compression) if compression else raw) as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1  # No trailing newline
+    return max(lines - 1, 0)
+
+
+def save_upload(file, path):
+    """Hard-link a spooled upload into place (no copy); copy uploads that are in memory or on another disk"""
+    source = upload_path(file)
+    if source is not None:
+        try:
+            os.link(source, path)
+            return
+        except OSError:
+            pass
+    file.save(path)
+
+
+def _link_or_copy(source, path):
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copy2(source, path)  # Keeps the mtime, which is part of the artifact version
+
+
+def pin_model(source, directory):
+    """
+    Hard-link the serving model artifact (a file or a flat model directory) into a job
+    directory, copying across disks, so a reload that replaces the artifact cannot change
+    which model the job scores with. The file name is kept (it is part of the artifact version).
+    Returns the pinned path relative to directory.
+    """
+    name = os.path.join('model', os.path.basename(source.rstrip(os.sep)))
+    path = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, path, copy_function=_link_or_copy)
+    else:
+        _link_or_copy(source, path)
+    return name
+
+
+def save_results(directory, rows, predictions, inputs=None, rejected=None):
+    """
+    Write per-chunk row numbers and predictions as the .npy files results() pages through.
+    inputs: optional per-chunk dicts of the scored rows' input columns, kept for exports.
+    rejected: optional (row numbers, reason codes, reason texts) of the rows that failed
+        validation (ValidationReport.rejected_rows()), exported with an empty prediction.
+    """
+    rows = np.concatenate(rows) if len(rows) else np.empty(0, dtype=np.int64)
+    predictions = np.concatenate(predictions) if len(predictions) else np.empty(0)
+    np.save(os.path.join(directory, 'rows.npy'), rows.astype(np.int64, copy=False))
+    np.save(os.path.join(directory, 'predictions.npy'), predictions)
+    if inputs is not None:
+        blocks = [np.column_stack([columns[f] for f in INPUT_FIELDS]) for columns in inputs if len(columns[INPUT_FIELDS[0]])]
+        matrix = np.concatenate(blocks) if blocks else np.empty((0, len(INPUT_FIELDS)))
+        np.save(os.path.join(directory, 'inputs.npy'), matrix)
+    if rejected is not None and len(rejected[0]):
+        rejected_rows, codes, reasons = rejected
+        np.save(os.path.join(directory, 'rejected_rows.npy'), rejected_rows.astype(np.int64, copy=False))
+        np.save(os.path.join(directory, 'rejected_reasons.npy'), codes.astype(np.int32, copy=False))
+        with open(os.path.join(directory, REJECTED_REASONS_FILE), 'w') as f:
+            json.dump(reasons, f)
+    return rows
+
+
+# ========== WORKER PROCESS SIDE ==========
+
+_worker_models = {}
+
+
+def _init_worker(niceness):
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass  # Not available on Windows
+
+
+def _load_model(source, version):
+    """
+    Load (and keep) the model pinned in a job's directory. Fails if its content is not
+    the version the job was submitted with (the artifact was rewritten in place since).
+    """
+    cached = _worker_models.get(version)
+    if cached is not None:
+        return cached
+    if os.path.isdir(source) or source.endswith('.npz'):
+        from flat_ensemble import FlatEnsemble
+        loader = FlatEnsemble.load
+    else:
+        import joblib
+        loader = joblib.load
+    model, loaded_version = load_pinned(source, loader)
+    if loaded_version != version:
+        raise RuntimeError(f'model artifact changed after the job was submitted '
+                           f'(expected {version}, found {loaded_version})')
+    _worker_models.clear()
+    _worker_models[version] = model
+    return model
+
+
+def run_job(folder, job_id, chunk_rows, pdf_workers=DEFAULT_PDF_WORKERS):
+    """Score one job's upload, updating job.json after every chunk (runs in a pool process)"""
+    job = read_job(folder, job_id)
+    directory = _job_dir(folder, job_id)
+    upload_path = os.path.join(directory, job['upload'])
+    job.update(state='running', started_at=time.time(), worker_pid=os.getpid())
+    write_job(folder, job)
+
+    try:
+        file_type, compression = split_upload_type(job['file_type'])
+        if file_type in CSV_EXTENSIONS:
+            job['total_rows'] = count_data_lines(upload_path, compression)
+        elif job['file_type'] in ARROW_EXTENSIONS:
+            job['total_rows'] = count_arrow_rows(upload_path, job['file_type'])
+        model = _load_model(os.path.join(directory, job['model']), job['model_version'])
+        predict = partial(run_model, model)
+        rows, predictions, inputs = [], [], []
+        total = 0.0
+        page_seconds = []
+        report = ValidationReport(keep_rejected=True)
+        statistics = PredictionStatistics()
+        dedup = DeduplicationReport()
+        with open(upload_path, 'rb') as f:
+            for chunk in iter_upload_chunks(f, job['file_type'], chunk_rows, pdf_workers, page_seconds):
+                chunk_rows_scored, chunk_predictions, chunk_inputs = score_chunk(chunk, predict, report, statistics, dedup)
+                rows.append(chunk_rows_scored)
+                predictions.append(chunk_predictions)
+                if chunk_inputs is not None:
+                    inputs.append(chunk_inputs)
+                total += float(chunk_predictions.sum())
+                job['rows_done'] += len(chunk)
+                write_job(folder, job)
+
+        rows = save_results(directory, rows, predictions, inputs, report.rejected_rows())
+        # total_rows counts every row read; rows failing validation are in the report, not the results
+        job.update(state='done', total_rows=job['rows_done'],
+                   average_prediction=total / len(rows) if len(rows) else None,
+                   validation=report.to_dict(),
+                   statistics=statistics.to_dict(),
+                   deduplication=dedup.to_dict(),
+                   pdf_extraction=page_timing_report(page_seconds, pdf_workers))
+    except Exception as e:
+        job.update(state='failed', error=f'Error processing file: {e}')
+    job['finished_at'] = time.time()
+    write_job(folder, job)
+    return job['state']
+
+
+# ========== SERVER SIDE ==========
+
+class PredictionJobQueue:
+    """Saves uploads as jobs and scores them in a process pool (started on the first job)"""
+
+    def __init__(self, folder, workers=DEFAULT_WORKERS, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 niceness=JOB_NICENESS, retention_seconds=JOB_RETENTION_SECONDS, pdf_workers=DEFAULT_PDF_WORKERS,
+                 result_cache=None, cleanup_interval_seconds=JOB_CLEANUP_INTERVAL_SECONDS):
+        self.folder = folder
+        self.result_cache = result_cache  # Optional ResultCache: finished jobs with a cache_key are stored there
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.pdf_workers = pdf_workers
+        self.niceness = niceness
+        self.retention_seconds = retention_seconds
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._last_cleanup = 0.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the server has live threads (micro-batcher, model watcher)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker, initargs=(self.niceness,))
+            return self._executor
+
+    def _new_job(self, filename, file_type, owner, model_source, model_version):
+        """Create the job directory; returns the job dict (not yet written)"""
+        self._remove_expired_periodically()
+        job_id = uuid.uuid4().hex
+        os.makedirs(_job_dir(self.folder, job_id))
+        return {
+            'job_id': job_id,
+            'owner': owner,
+            'filename': filename,
+            'file_type': file_type,
+            'upload': f'upload.{file_type}',
+            'state': 'queued',
+            'rows_done': 0,
+            'total_rows': None,
+            'average_prediction': None,
+            'error': None,
+            'model_source': model_source,
+            'model_version': model_version,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'cache_key': None,
+            'cache_hit': False,
+        }
+
+    def submit(self, file, filename, file_type, owner, model_source, model_version, cache_key=None):
+        """
+        Save the upload (a file object with .save(), e.g. a werkzeug FileStorage) and queue it,
+        with the model artifact at model_source (of model_version) pinned in the job directory
+        """
+        job = self._new_job(filename, file_type, owner, model_source, model_version)
+        job['cache_key'] = cache_key
+        job_id = job['job_id']
+        job['model'] = pin_model(model_source, _job_dir(self.folder, job_id))
+        save_upload(file, os.path.join(_job_dir(self.folder, job_id), job['upload']))
+        write_job(self.folder, job)
+        future = self._pool().submit(run_job, self.folder, job_id, self.chunk_rows, self.pdf_workers)
+        future.add_done_callback(lambda f: self._check_finished(job_id, f))
+        return job
+
+    def store_results(self, filename, file_type, owner, model_source, model_version,
+                      rows, predictions, rows_read, inputs=None, cache_key=None, rejected=None, **fields):
+        """
+        Keep the results of an upload scored in the request as a finished job,
+        so its rows can be paged through results() like a background job's.
+        rows/predictions: per-chunk arrays; inputs: per-chunk input column dicts;
+        rejected: ValidationReport.rejected_rows() of the upload;
+        cache_key: also keep the results in result_cache under this key;
+        fields: extra job fields (validation, statistics, ...).
+        """
+        job = self._new_job(filename, file_type, owner, model_source, model_version)
+        now = time.time()
+        save_results(_job_dir(self.folder, job['job_id']), rows, predictions, inputs, rejected)
+        job.update(state='done', upload=None, rows_done=rows_read, total_rows=rows_read,
+                   started_at=now, finished_at=now, cache_key=cache_key, **fields)
+        write_job(self.folder, job)
+        self._cache_results(job)
+        return job
+
+    def cached_job(self, cache_key, filename, file_type, owner, model_source, model_version):
+        """
+        A finished job for an upload whose results are in result_cache under cache_key,
+        with the result files linked from the cache; None on a cache miss.
+        """
+        if self.result_cache is None or not self.result_cache.enabled or cache_key is None:
+            return None
+        entry = self.result_cache.get(cache_key)
+        if entry is None:
+            return None
+        job = self._new_job(filename, file_type, owner, model_source, model_version)
+        directory = _job_dir(self.folder, job['job_id'])
+        if not self.result_cache.link_results(cache_key, directory):
+            shutil.rmtree(directory, ignore_errors=True)  # Evicted between get() and here
+            return None
+        now = time.time()
+        job.update({field: entry.get(field) for field in CACHED_JOB_FIELDS})
+        job.update(state='done', upload=None, started_at=now, finished_at=now,
+                   cache_key=cache_key, cache_hit=True)
+        write_job(self.folder, job)
+        return job
+
+    def _cache_results(self, job):
+        if self.result_cache is not None and job.get('cache_key') and job['state'] == 'done':
+            fields = {field: job.get(field) for field in CACHED_JOB_FIELDS}
+            self.result_cache.put(job['cache_key'], _job_dir(self.folder, job['job_id']), fields)
+
+    def _check_finished(self, job_id, future):
+        """Cache a finished job's results; a pool process that died mid-job cannot mark it failed itself"""
+        error = future.exception()
+        job = read_job(self.folder, job_id)
+        if job is None:
+            return
+        if error is None:
+            self._cache_results(job)
+        elif job['state'] in ('queued', 'running'):
+            job.update(state='failed', error=f'Worker process failed: {error}', finished_at=time.time())
+            write_job(self.folder, job)
+
+    def get(self, job_id, owner):
+        """Job state for its owner; None for unknown jobs and other users' jobs"""
+        job = read_job(self.folder, job_id)
+        if job is None or job['owner'] != owner:
+            return None
+        return job
+
+    def results(self, job, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """One page of a finished job's predictions, read from memory-mapped result files"""
+        page_size = clamp_page_size(page_size)
+        page = max(int(page), 1)
+        directory = _job_dir(self.folder, job['job_id'])
+        rows = np.load(os.path.join(directory, 'rows.npy'), mmap_mode='r')
+        predictions = np.load(os.path.join(directory, 'predictions.npy'), mmap_mode='r')
+        start = (page - 1) * page_size
+        stop = min(start + page_size, len(rows))
+        return {
+            'job_id': job['job_id'],
+            'page': page,
+            'page_size': page_size,
+            'total_rows': len(rows),
+            'total_pages': -(-len(rows) // page_size),
+            'predictions': [
+                {'row': row, 'prediction': pred, 'unit': 'kWh'}
+                for row, pred in zip(rows[start:stop].tolist(), predictions[start:stop].tolist())
+            ],
+        }
+
+    def has_inputs(self, job):
+        """Whether the job's input columns were kept with its predictions (jobs from older versions lack them)"""
+        return os.path.exists(os.path.join(_job_dir(self.folder, job['job_id']), 'inputs.npy'))
+
+    def has_rejected(self, job):
+        """Whether rows that failed validation were kept with the job's results"""
+        return os.path.exists(os.path.join(_job_dir(self.folder, job['job_id']), 'rejected_rows.npy'))
+
+    def iter_result_blocks(self, job, block_rows=EXPORT_BLOCK_ROWS):
+        """
+        Yield a finished job's results as (row numbers, input matrix, predictions, reasons) blocks in
+        file order, read from memory-mapped files so memory stays flat however many rows there are.
+        The input matrix (columns in INPUT_FIELDS order) is None for results stored without inputs.
+        When the job kept its rejected rows they are merged in with NaN inputs and prediction, and
+        reasons holds why each row was rejected ('' for scored rows); otherwise reasons is None.
+        """
+        directory = _job_dir(self.folder, job['job_id'])
+        rows = np.load(os.path.join(directory, 'rows.npy'), mmap_mode='r')
+        predictions = np.load(os.path.join(directory, 'predictions.npy'), mmap_mode='r')
+        inputs = np.load(os.path.join(directory, 'inputs.npy'), mmap_mode='r') if self.has_inputs(job) else None
+        if not self.has_rejected(job):
+            for start in range(0, len(rows), block_rows):
+                stop = start + block_rows
+                yield (np.array(rows[start:stop]), None if inputs is None else np.array(inputs[start:stop]),
+                       np.array(predictions[start:stop]), None)
+            return
+
+        rejected = np.load(os.path.join(directory, 'rejected_rows.npy'), mmap_mode='r')
+        codes = np.load(os.path.join(directory, 'rejected_reasons.npy'), mmap_mode='r')
+        with open(os.path.join(directory, REJECTED_REASONS_FILE)) as f:
+            reasons = np.array([''] + json.load(f), dtype=object)  # Code + 1; '' for scored rows
+        first = min(rows[0] if len(rows) else rejected[0], rejected[0])
+        last = max(rows[-1] if len(rows) else rejected[-1], rejected[-1])
+        # Blocks cover block_rows row numbers, so scored and rejected rows together never exceed it
+        for low in range(int(first), int(last) + 1, block_rows):
+            scored = slice(*np.searchsorted(rows, [low, low + block_rows]))
+            failed = slice(*np.searchsorted(rejected, [low, low + block_rows]))
+            n_failed = failed.stop - failed.start
+            if scored.stop == scored.start and not n_failed:
+                continue
+            block_rows_out = np.concatenate([rows[scored], rejected[failed]])
+            order = np.argsort(block_rows_out, kind='stable')
+            block_inputs = None
+            if inputs is not None:
+                block_inputs = np.concatenate([inputs[scored], np.full((n_failed, inputs.shape[1]), np.nan)])[order]
+            yield (block_rows_out[order], block_inputs,
+                   np.concatenate([predictions[scored], np.full(n_failed, np.nan)])[order],
+                   reasons[np.concatenate([np.zeros(scored.stop - scored.start, dtype=np.int64),
+                                           codes[failed].astype(np.int64) + 1])][order])
+
+    def _remove_expired_periodically(self):
+        """remove_expired() at most once per cleanup_interval_seconds, so new jobs do not each list every job"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval_seconds:
+                return
+            self._last_cleanup = now
+        self.remove_expired()
+
+    def remove_expired(self):
+        """Delete finished jobs older than retention_seconds"""
+        if not os.path.isdir(self.folder):
+            return
+        cutoff = time.time() - self.retention_seconds
+        for job_id in os.listdir(self.folder):
+            job = read_job(self.folder, job_id)
+            if job and job['state'] in ('done', 'failed') and (job['finished_at'] or 0) < cutoff:
+                shutil.rmtree(_job_dir(self.folder, job_id), ignore_errors=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
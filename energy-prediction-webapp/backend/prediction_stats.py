@@ -0,0 +1,86 @@
+"""
+Summary statistics for file predictions
+Accumulated chunk by chunk while an upload is scored, so clients get
+percentiles, a histogram, month/hour totals and the peak rows without
+downloading every row's prediction. Month/hour totals are running sums, but
+percentiles, histogram and peak rows are exact, so every scored prediction is
+kept with its row, month and hour (18 bytes per row) until to_dict().
+"""
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95, 99)
+HISTOGRAM_BINS = 20
+PEAK_ROWS = 10
+
+
+def _round(value):
+    return round(float(value), 3)
+
+
+class PredictionStatistics:
+    """Running aggregates over (row, prediction, month, hour) of scored rows"""
+
+    def __init__(self, histogram_bins=HISTOGRAM_BINS, peak_rows=PEAK_ROWS):
+        self.histogram_bins = histogram_bins
+        self.peak_rows = peak_rows
+        self._predictions = []
+        self._rows = []
+        self._months = []
+        self._hours = []
+        self.month_totals = np.zeros(12)
+        self.month_counts = np.zeros(12, dtype=np.int64)
+        self.hour_totals = np.zeros(24)
+        self.hour_counts = np.zeros(24, dtype=np.int64)
+
+    def add(self, rows, predictions, columns):
+        """One scored chunk: row numbers, predictions and the valid rows' input columns"""
+        predictions = np.asarray(predictions, dtype=np.float64)
+        if predictions.size == 0:
+            return
+        months = np.asarray(columns['month']).astype(np.int64)
+        hours = np.asarray(columns['time']).astype(np.int64)
+        self.month_totals += np.bincount(months - 1, weights=predictions, minlength=12)
+        self.month_counts += np.bincount(months - 1, minlength=12)
+        self.hour_totals += np.bincount(hours, weights=predictions, minlength=24)
+        self.hour_counts += np.bincount(hours, minlength=24)
+        self._predictions.append(predictions)
+        self._rows.append(np.asarray(rows))
+        self._months.append(months.astype(np.int8))
+        self._hours.append(hours.astype(np.int8))
+
+    def to_dict(self):
+        if not self._predictions:
+            return {'count': 0}
+        predictions = np.concatenate(self._predictions)
+        counts, edges = np.histogram(predictions, bins=self.histogram_bins)
+        n_peaks = min(self.peak_rows, predictions.size)
+        peaks = np.argpartition(predictions, -n_peaks)[-n_peaks:]
+        peaks = peaks[np.argsort(-predictions[peaks], kind='stable')]
+        rows = np.concatenate(self._rows)
+        months = np.concatenate(self._months)
+        hours = np.concatenate(self._hours)
+        return {
+            'count': int(predictions.size),
+            'total_kwh': _round(predictions.sum()),
+            'mean_kwh': _round(predictions.mean()),
+            'std_kwh': _round(predictions.std()),
+            'min_kwh': _round(predictions.min()),
+            'max_kwh': _round(predictions.max()),
+            'percentiles': {f'p{p}': _round(v) for p, v in zip(PERCENTILES, np.percentile(predictions, PERCENTILES))},
+            'histogram': {'edges': [_round(e) for e in edges], 'counts': counts.tolist()},
+            'by_month': [
+                {'month': m + 1, 'rows': int(self.month_counts[m]), 'total_kwh': _round(self.month_totals[m]),
+                 'average_kwh': _round(self.month_totals[m] / self.month_counts[m]) if self.month_counts[m] else None}
+                for m in range(12)
+            ],
+            'by_hour': [
+                {'hour': h, 'rows': int(self.hour_counts[h]), 'total_kwh': _round(self.hour_totals[h]),
+                 'average_kwh': _round(self.hour_totals[h] / self.hour_counts[h]) if self.hour_counts[h] else None}
+                for h in range(24)
+            ],
+            'peak_rows': [
+                {'row': int(rows[i]), 'prediction': float(predictions[i]), 'month': int(months[i]), 'hour': int(hours[i])}
+                for i in peaks.tolist()
+            ],
+        }
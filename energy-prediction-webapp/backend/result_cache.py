@@ -0,0 +1,146 @@
+"""
+Disk cache of file prediction results
+Results are kept under a key made of the upload's content hash, its file type and
+the model version, so re-uploading a file (a page refresh, a second analyst)
+returns the stored results instead of scoring it again. Entries hard-link the
+job result files rather than copy them, and the least recently used entries are
+removed once the cache grows past its size limit. The folder can be shared by
+every server process.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+DEFAULT_MAX_MB = 1024
+RESULT_FILES = ('rows.npy', 'predictions.npy', 'inputs.npy', 'rejected_rows.npy', 'rejected_reasons.npy',
+                'rejected_reasons.json')
+ENTRY_FILE = 'entry.json'
+
+
+def result_cache_key(content_hash, file_type, model_version):
+    """Cache key for an upload's results under a model version"""
+    return hashlib.sha256(f'{content_hash}:{file_type}:{model_version}'.encode()).hexdigest()
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)  # Another file system
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of result files on disk.
+
+    folder: where entries live, one directory per key.
+    max_bytes: total size of the result files kept before the least recently
+        used entries are evicted (0 disables the cache).
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.folder = folder
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _entry_dir(self, key):
+        return os.path.join(self.folder, key)
+
+    def get(self, key):
+        """The stored job fields for key (and marks the entry recently used), or None"""
+        path = os.path.join(self._entry_dir(key), ENTRY_FILE)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # Recency for eviction, visible to every process
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def link_results(self, key, directory):
+        """Link the entry's result files into directory. False if the entry was evicted meanwhile."""
+        source = self._entry_dir(key)
+        try:
+            for name in os.listdir(source):
+                if name in RESULT_FILES:
+                    _link_or_copy(os.path.join(source, name), os.path.join(directory, name))
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, directory, fields):
+        """Store the result files in directory (linked, not copied) and fields under key, then evict"""
+        if not self.enabled or os.path.exists(self._entry_dir(key)):
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_dir = os.path.join(self.folder, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(tmp_dir)
+        try:
+            size = 0
+            for name in RESULT_FILES:
+                source = os.path.join(directory, name)
+                if os.path.exists(source):
+                    _link_or_copy(source, os.path.join(tmp_dir, name))
+                    size += os.path.getsize(source)
+            with open(os.path.join(tmp_dir, ENTRY_FILE), 'w') as f:
+                json.dump({**fields, 'bytes': size, 'stored_at': time.time()}, f)
+            os.rename(tmp_dir, self._entry_dir(key))  # Readers never see a half-written entry
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Stored by another process first
+            return
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.folder) if os.path.isdir(self.folder) else []:
+            if key.startswith('.'):
+                continue
+            path = os.path.join(self._entry_dir(key), ENTRY_FILE)
+            try:
+                used_at = os.path.getmtime(path)
+                with open(path) as f:
+                    size = json.load(f)['bytes']
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((used_at, key, size))
+            total += size
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'max_mb': round(self.max_bytes / (1024 * 1024), 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,135 @@
+"""
+Downloadable exports of file prediction results
+Results are read from a job's memory-mapped result files one block at a time
+and written out as CSV text or Parquet row groups as they are produced, so an
+export of any size is served with the same, small amount of server memory.
+Rows that failed validation are exported with empty inputs and prediction and a
+rejected_reason. Upload columns other than the six model inputs are not kept
+with the results, so they are not in the export.
+"""
+
+import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+INT_INPUT_FIELDS = ('month', 'hvac_appliances', 'time')  # Stored as float64, exported as integers
+
+
+def export_filename(filename, file_type, export_format):
+    """'meters.csv.gz' scored as 'csv.gz' -> 'meters-predictions.parquet'"""
+    suffix = f'.{file_type}'
+    base = filename[:-len(suffix)] if file_type and filename.lower().endswith(suffix) else filename
+    return f"{base or 'results'}-predictions.{export_format}"
+
+
+def export_frame(rows, inputs, predictions, input_fields, model_version, reasons=None):
+    """
+    One block of export rows: row, input columns (if kept), prediction_kwh, model_version and,
+    for jobs that kept their rejected rows, rejected_reason (empty inputs and prediction on those rows)
+    """
+    data = {'row': rows}
+    if inputs is not None:
+        for i, field in enumerate(input_fields):
+            column = inputs[:, i]
+            if field in INT_INPUT_FIELDS:
+                # Rejected rows have no inputs: nullable integers, so they stay integers in both formats
+                column = pd.array(column, dtype='Int64') if reasons is not None else column.astype(np.int64)
+            data[field] = column
+    data['prediction_kwh'] = predictions
+    data['model_version'] = np.full(len(rows), model_version or '', dtype=object)
+    if reasons is not None:
+        data['rejected_reason'] = reasons
+    return pd.DataFrame(data, copy=False)
+
+
+def _empty_frame(input_fields, model_version, with_inputs, with_reasons):
+    inputs = np.empty((0, len(input_fields))) if with_inputs else None
+    reasons = np.empty(0, dtype=object) if with_reasons else None
+    return export_frame(np.empty(0, dtype=np.int64), inputs, np.empty(0), input_fields, model_version, reasons)
+
+
+class _DrainableSink:
+    """Write-only file object for the Arrow writers whose bytes are taken out after each block"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _csv_writer(sink, schema):
+    from pyarrow import csv
+    return csv.CSVWriter(sink, schema, write_options=csv.WriteOptions(quoting_style='needed'))
+
+
+def _parquet_writer(sink, schema):
+    from pyarrow import parquet
+    return parquet.ParquetWriter(sink, schema, compression='zstd')
+
+
+def _iter_export(blocks, input_fields, model_version, with_inputs, with_reasons, open_writer):
+    """Bytes of each (rows, inputs, predictions, reasons) block as soon as the writer has encoded it"""
+    import pyarrow as pa
+
+    sink = _DrainableSink()
+    writer = None
+    for rows, inputs, predictions, reasons in blocks:
+        table = pa.Table.from_pandas(export_frame(rows, inputs, predictions, input_fields, model_version, reasons),
+                                     preserve_index=False)
+        if writer is None:
+            writer = open_writer(sink, table.schema)
+        writer.write_table(table)
+        data = sink.drain()
+        if data:
+            yield data
+    if writer is None:
+        # No rows: still a valid file with the header / schema
+        table = pa.Table.from_pandas(_empty_frame(input_fields, model_version, with_inputs, with_reasons),
+                                     preserve_index=False)
+        writer = open_writer(sink, table.schema)
+        writer.write_table(table)
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_csv_export(blocks, input_fields, model_version, with_inputs=True, with_reasons=False):
+    """
+    CSV bytes for (rows, inputs, predictions, reasons) blocks: the header with the first block,
+    then one piece per block
+    """
+    return _iter_export(blocks, input_fields, model_version, with_inputs, with_reasons, _csv_writer)
+
+
+def iter_parquet_export(blocks, input_fields, model_version, with_inputs=True, with_reasons=False):
+    """Parquet bytes for (rows, inputs, predictions, reasons) blocks, one row group per block and the footer last"""
+    return _iter_export(blocks, input_fields, model_version, with_inputs, with_reasons, _parquet_writer)
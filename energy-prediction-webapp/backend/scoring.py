@@ -0,0 +1,42 @@
+"""
+Scoring of parsed upload chunks
+Shared by the request path (app.score_frame) and the background job workers, so
+a file scores the same whichever path it takes.
+"""
+
+import numpy as np
+
+from feature_engine import engineer_feature_matrix, feature_frame, unique_input_rows
+from flat_ensemble import FlatEnsemble
+from input_schema import validate_frame
+
+
+def run_model(model, features):
+    """One model call on a feature matrix"""
+    # The flat backend takes the raw matrix; sklearn wants named columns
+    X = features if isinstance(model, FlatEnsemble) else feature_frame(features)
+    predictions = np.asarray(model.predict(X), dtype=np.float64)
+    return np.abs(predictions)  # Energy can't be negative
+
+
+def score_chunk(df, predict, report=None, statistics=None, dedup=None):
+    """
+    Validate a parsed upload chunk and predict its valid rows with one predict(features) call.
+    Repeated input rows are scored once. Returns (row numbers, predictions, input columns) for
+    the valid rows (columns is None when no row is valid); rejected rows are added to report,
+    scored rows to statistics and repeated rows to dedup.
+    """
+    result = validate_frame(df)
+    rows = df.index.to_numpy(dtype=np.int64)
+    if report is not None:
+        report.add(result, rows)
+    if not result.valid.any():
+        return rows[:0], np.empty(0), None
+    columns = result.valid_columns()
+    unique, inverse = unique_input_rows(columns)
+    if dedup is not None:
+        dedup.add(len(inverse), len(unique['temperature']))
+    predictions = np.asarray(predict(engineer_feature_matrix(unique)), dtype=np.float64)[inverse]
+    if statistics is not None:
+        statistics.add(rows[result.valid], predictions, columns)
+    return rows[result.valid], predictions, columns
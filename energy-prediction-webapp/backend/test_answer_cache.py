@@ -0,0 +1,278 @@
+"""
+Test script for the chatbot answer cache
+Covers question normalization, LRU eviction, TTL expiry, failed calls (shared,
+never cached), concurrent identical questions sharing one upstream call (also
+while the answer is streamed), and the chatbot answering repeated questions
+without calling Gemini again
+"""
+
+import threading
+import time
+
+from answer_cache import AnswerCache, StreamedAnswer, normalize_question
+from conftest import FakeGemini, client_for
+from llm_client import LLMUnavailable
+from test_prediction_stats import login
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_question():
+    assert normalize_question('What is HDD  and CDD?') == normalize_question('what is hdd and cdd') == \
+        'what is hdd and cdd'
+    assert normalize_question('  How accurate is the model?!') == 'how accurate is the model'
+    assert normalize_question('What’s a kWh, exactly...') == "what's a kwh exactly"
+    assert normalize_question('Is 2.5 kWh a lot?') != normalize_question('Is 25 kWh a lot?')
+    print('✓ Case, punctuation and spacing do not change the cache key')
+
+
+def test_hits_and_lru_eviction():
+    cache = AnswerCache(max_entries=2, ttl_seconds=0)
+    calls = []
+
+    def answer(text):
+        return lambda: calls.append(text) or text.upper()
+
+    assert cache.get_or_call(('project', 'a'), answer('a')) == 'A'
+    assert cache.get_or_call(('project', 'b'), answer('b')) == 'B'
+    assert cache.get_or_call(('project', 'a'), answer('a')) == 'A'  # Hit; 'a' is now most recent
+    cache.get_or_call(('project', 'c'), answer('c'))  # Evicts 'b'
+    cache.get_or_call(('project', 'a'), answer('a'))
+    cache.get_or_call(('project', 'b'), answer('b'))
+    assert calls == ['a', 'b', 'c', 'b'], calls
+    assert cache.get_or_call(('other', 'a'), answer('a')) == 'A' and calls[-1] == 'a'  # Intent is part of the key
+    stats = cache.stats()
+    assert (stats['hits'], stats['upstream_calls'], stats['evictions'], stats['entries']) == (2, 5, 3, 2)
+    print(f'✓ LRU eviction keeps recently asked questions: {stats}')
+
+
+def test_ttl_expiry():
+    clock = FakeClock()
+    cache = AnswerCache(max_entries=10, ttl_seconds=60, clock=clock)
+    calls = []
+    ask = lambda: cache.get_or_call(('project', 'q'), lambda: calls.append(1) or f'answer {len(calls)}')
+    assert ask() == 'answer 1'
+    clock.now = 59
+    assert ask() == 'answer 1'
+    clock.now = 61
+    assert ask() == 'answer 2'
+    assert cache.stats()['expirations'] == 1
+    print('✓ Answers older than the TTL are asked again')
+
+
+def test_errors_not_cached():
+    cache = AnswerCache()
+
+    def failing():
+        raise LLMUnavailable('timeout')
+
+    for _ in range(2):
+        try:
+            cache.get_or_call(('project', 'q'), failing)
+            raise AssertionError('expected LLMUnavailable')
+        except LLMUnavailable as e:
+            assert e.reason == 'timeout'
+    assert cache.get_or_call(('project', 'q'), lambda: 'ok') == 'ok'
+    stats = cache.stats()
+    assert stats['upstream_errors'] == 2 and stats['entries'] == 1
+    print('✓ Failed calls are not cached')
+
+
+def test_singleflight(threads=16):
+    cache = AnswerCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_answer():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return 'shared answer'
+
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(cache.get_or_call(('project', 'q'), slow_answer)))
+               for _ in range(threads)]
+    workers[0].start()
+    started.wait(2)
+    for worker in workers[1:]:
+        worker.start()
+    while cache.stats()['shared'] < threads - 1:
+        time.sleep(0.001)
+    release.set()
+    for worker in workers:
+        worker.join()
+    assert len(calls) == 1 and results == ['shared answer'] * threads
+    assert cache.stats()['shared'] == threads - 1
+
+    # A failure reaches every waiter, and the next question calls again
+    cache = AnswerCache()
+    started.clear()
+    release.clear()
+
+    def slow_failure():
+        started.set()
+        release.wait(2)
+        raise LLMUnavailable('upstream_error', 'HTTP 503')
+
+    errors = []
+
+    def ask():
+        try:
+            cache.get_or_call(('project', 'q'), slow_failure)
+        except LLMUnavailable as e:
+            errors.append(e.reason)
+
+    workers = [threading.Thread(target=ask) for _ in range(4)]
+    workers[0].start()
+    started.wait(2)
+    for worker in workers[1:]:
+        worker.start()
+    while cache.stats()['shared'] < 3:
+        time.sleep(0.001)
+    release.set()
+    for worker in workers:
+        worker.join()
+    assert errors == ['upstream_error'] * 4 and cache.stats()['in_flight'] == 0
+    print(f'✓ {threads} concurrent identical questions make one upstream call; a failure reaches every waiter')
+
+
+def test_streamed_singleflight(threads=4):
+    cache = AnswerCache()
+    key = ('project', 'q')
+    release = threading.Event()
+    calls = []
+
+    def chunks():
+        yield 'streamed '
+        release.wait(2)
+        yield 'answer'
+
+    def stream():
+        calls.append(1)
+        return chunks()
+
+    streamed = cache.get_or_stream(key, stream)
+    assert isinstance(streamed, StreamedAnswer) and next(streamed) == 'streamed '
+
+    # Identical questions asked mid-stream (streamed or not) wait for the whole answer
+    results = []
+    workers = [threading.Thread(target=lambda n=n: results.append(
+        cache.get_or_stream(key, stream) if n % 2 else cache.get_or_call(key, lambda: 'own call')))
+        for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    while cache.stats()['shared'] < threads:
+        time.sleep(0.001)
+    release.set()
+    assert list(streamed) == ['answer']
+    for worker in workers:
+        worker.join()
+    assert len(calls) == 1 and results == ['streamed answer'] * threads and cache.get(key) == 'streamed answer'
+
+    # A stream closed before its end is not cached; the question waiting on it asks again
+    cache = AnswerCache()
+    release.clear()
+    streamed = cache.get_or_stream(key, stream)
+    next(streamed)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_call(key, lambda: 'asked again')))
+    waiter.start()
+    while cache.stats()['shared'] < 1:
+        time.sleep(0.001)
+    streamed.close()
+    waiter.join(2)
+    release.set()
+    assert results[-1] == 'asked again' and cache.stats()['upstream_calls'] == 2
+    print(f'✓ {threads} identical questions asked while an answer streams wait for it; '
+          f'a stream closed early lets them ask again')
+
+
+def test_chatbot_repeats(fake):
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    original = app.gemini, app.chat_answers
+    try:
+        fake.mode, fake.delay = 'slow', 0.2
+        app.gemini = client_for(fake)
+        app.chat_answers = AnswerCache()
+        sent = len(fake.requests)
+        first = client.post('/api/chatbot/message', headers=headers, json={'message': 'What is HDD and CDD?'})
+        start = time.perf_counter()
+        again = client.post('/api/chatbot/message', headers=headers, json={'message': '  what is hdd and cdd'})
+        elapsed = time.perf_counter() - start
+        assert again.get_json()['response'] == first.get_json()['response'] == 'Fake answer to: What is HDD and CDD?'
+        assert len(fake.requests) == sent + 1 and elapsed < 0.1
+
+        # Concurrent identical questions while the first is still waiting on Gemini
+        bodies = []
+
+        def ask():
+            bodies.append(app.app.test_client().post('/api/chatbot/message', headers=headers,
+                                                     json={'message': 'How accurate is the model?'}).get_json())
+
+        workers = [threading.Thread(target=ask) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(fake.requests) == sent + 2
+        assert {body['response'] for body in bodies} == {'Fake answer to: How accurate is the model?'}
+
+        stats = client.get('/api/chatbot/answer-cache', headers=headers).get_json()
+        assert stats['hits'] + stats['shared'] == 6 and stats['upstream_calls'] == 2
+    finally:
+        app.gemini, app.chat_answers = original
+    print(f'✓ Chatbot answers a repeated question without calling Gemini ({elapsed * 1000:.1f} ms) '
+          f'and 6 concurrent askers share one call')
+
+
+def benchmark(fake, rounds=10):
+    """A FAQ mix through the cache against an upstream that takes 50 ms per answer"""
+    fake.mode, fake.delay = 'slow', 0.05
+    gemini = client_for(fake)
+    faqs = ['How accurate is the model?', 'What is HDD and CDD?', 'How do I upload a CSV file?',
+            'What file formats are supported?', 'Why is building size important?', 'How was the model trained?',
+            'What affects energy usage?', 'How can I reduce consumption?', 'What data do I need?',
+            'How recent is the training data?', 'What is a kWh?', 'How do seasons change usage?']
+    questions = [f'{faq[:-1].lower()}{"?" * (n % 2)}' for n in range(rounds) for faq in faqs]
+    for label, cache in (('no cache', AnswerCache(max_entries=0)), ('answer cache', AnswerCache())):
+        sent = len(fake.requests)
+        start = time.perf_counter()
+        for question in questions:
+            cache.get_or_call(('project', normalize_question(question)), lambda q=question: gemini.generate(q))
+        elapsed = time.perf_counter() - start
+        print(f'  {label}: {len(questions)} questions in {elapsed:.2f} s, '
+              f'{len(fake.requests) - sent} upstream calls')
+    hit_start = time.perf_counter()
+    for _ in range(rounds):
+        for question in questions:
+            cache.get_or_call(('project', normalize_question(question)), gemini.generate)
+    per_hit = (time.perf_counter() - hit_start) / (rounds * len(questions)) * 1e6
+    print(f'  repeat question (normalize + hit): {per_hit:.1f} µs')
+    gemini.close()
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('CHATBOT ANSWER CACHE TESTS')
+    print('=' * 80)
+    test_normalize_question()
+    test_hits_and_lru_eviction()
+    test_ttl_expiry()
+    test_errors_not_cached()
+    test_singleflight()
+    test_streamed_singleflight()
+    fake = FakeGemini()
+    try:
+        test_chatbot_repeats(fake)
+        print('\nBenchmark:')
+        benchmark(fake)
+    finally:
+        fake.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Test script for the batch prediction endpoint
+Checks that /api/predict/batch matches /api/predict/form record by record
+"""
+
+import random
+import sys
+import time
+
+import requests
+
+BASE_URL = "http://localhost:5000"
+
+TEST_EMAIL = "demo@example.com"
+TEST_PASSWORD = "password123"
+
+
+def get_headers():
+    """Get JWT auth headers"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": TEST_EMAIL,
+        "password": TEST_PASSWORD
+    })
+    if response.status_code != 200:
+        print(f"❌ Authentication failed: {response.text}")
+        sys.exit(1)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_batch_matches_form():
+    headers = get_headers()
+    records = [
+        {"temperature": 0, "humidity": 40, "square_footage": 3000, "month": 1, "hvac_appliances": 2, "time": 12},
+        {"temperature": 35, "humidity": 60, "square_footage": 4000, "month": 7, "hvac_appliances": 3, "time": 14},
+        {"temperature": 99, "humidity": 60, "square_footage": 4000, "month": 7, "hvac_appliances": 3, "time": 14},
+        {"temperature": "warm", "humidity": 60, "month": 7, "hvac_appliances": 3, "time": 14},
+        {"temperature": 15, "humidity": 55, "square_footage": 2500, "month": 4, "hvac_appliances": 1, "time": 10,
+         "hvac_type": "heat-pump", "season": "spring"},
+    ]
+
+    response = requests.post(f"{BASE_URL}/api/predict/batch", json={"records": records}, headers=headers)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["count"] == len(records)
+    assert result["valid_count"] == 3 and result["error_count"] == 2
+
+    for i, record in enumerate(records):
+        form = requests.post(f"{BASE_URL}/api/predict/form", json=record, headers=headers).json()
+        if result["errors"][i] is None:
+            assert abs(form["prediction"] - result["predictions"][i]) < 1e-9
+            print(f"✅ Record {i}: {result['predictions'][i]:.2f} kWh (matches form)")
+        else:
+            assert result["predictions"][i] is None
+            assert form["details"] == result["errors"][i]
+            print(f"✅ Record {i}: rejected with {result['errors'][i]}")
+
+
+def test_large_batch(n_records=50000):
+    headers = get_headers()
+    records = [{
+        "temperature": random.uniform(-10, 50),
+        "humidity": random.uniform(0, 100),
+        "square_footage": random.uniform(500, 50000),
+        "month": random.randint(1, 12),
+        "hvac_appliances": random.randint(0, 20),
+        "time": random.randint(0, 23),
+    } for _ in range(n_records)]
+
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/api/predict/batch", json=records, headers=headers)
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200, response.text
+    assert response.json()["valid_count"] == n_records
+    print(f"✅ {n_records} records scored in {elapsed:.2f}s ({elapsed / n_records * 1e6:.1f} µs/record)")
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("BATCH PREDICTION ENDPOINT - TEST SUITE")
+    print("=" * 70)
+    test_batch_matches_form()
+    test_large_batch()
@@ -0,0 +1,178 @@
+"""
+Test script for the single-pass chatbot field extractor
+Checks that extract_prediction_fields returns the same fields as the previous
+parse_prediction_input (one re.search per pattern, kept below as the reference)
+on the chatbot test messages and on a corpus of generated messages, and
+benchmarks the two
+"""
+
+import random
+import re
+import time
+
+from chat_extract import HVAC_TYPE_NAMES, MONTH_NAMES, SEASON_NAMES, extract_prediction_fields
+
+# Messages from test_regex.py, test_chatbot_hvac.py and test_structured_prediction.py
+CHATBOT_MESSAGES = {
+    "Predict energy at 25 degrees": {'day': 25, 'temperature': 25},
+    "hi there": {},
+    "I have a central AC with 2 units": {'day': 2, 'hvac_type': 'central-ac', 'hvac_appliances': 2},
+    "I want a prediction for my house. It's 5000 sqft, 4 people, 2 central AC units, temperature 22°C, humidity 55%, "
+    "in summer at 2 PM": {
+        'square_footage': 5000, 'applicants': 4, 'season': 'summer', 'time': 14, 'temperature': 5000,
+        'hvac_type': 'central-ac', 'hvac_appliances': 2},
+    "My place is 3500 square feet, 2 residents, 1 window AC unit, 18 degrees, 60% humidity, march, at 10 AM": {
+        'square_footage': 3500, 'applicants': 2, 'month': 3, 'time': 10, 'temperature': 3500,
+        'hvac_type': 'window-ac', 'hvac_appliances': 1},
+    "Predict for 4200 sqft, 3 people, heat pump system, temperature 20°C, humidity 45%, October at 6 PM": {
+        'square_footage': 4200, 'applicants': 3, 'month': 10, 'time': 18, 'temperature': 4200,
+        'hvac_type': 'heat-pump'},
+    "thanks for the help": {},
+    "My house is 1500 sqft with 3 occupants in summer at 6 PM": {
+        'square_footage': 1500, 'applicants': 3, 'season': 'summer', 'time': 18, 'hvac_appliances': 3},
+    "2 people, 1500 sqft house, month 9, 14:30": {
+        'square_footage': 1500, 'applicants': 2, 'day': 2, 'month': 9, 'time': 14},
+}
+
+MESSAGE_PIECES = [
+    '1500 sqft', 'house of 2000', 'my home is 1800', 'area 900', '3 people', '2 family members', '4 occupants',
+    'on 5th', 'day 12', 'the 3rd', 'january', 'mar', 'may', 'summary', 'june 21', '12/25', 'month 7', 'month 13',
+    'winter', 'autumn', 'fall', 'monsoon', 'spring', '14:30', '2:15 pm', '12:00 am', '12 am', '12 pm', '7 p.m',
+    '8 a.m', '25:00', 'at 6 pm', 'temperature 30', '25 degrees', '20°c', 'humidity 70%', '40%', 'humid',
+    'central air', 'window unit', 'furnace', '2 heat pumps', 'hybrid system', 'split system', 'portable ac',
+    'boiler', 'have 3', 'with 2 hvac', 'got 1 unit', '2 acs', '3 air conditioners', '123', '4567 ', '1/2', '0',
+    '99 ', 'predict', 'sq.ft', '2sqft', 'day7,', 'dec', 'octopus', 'feb 29th', '5th of august', 'size of 750',
+]
+
+
+def reference_fields(message):
+    """The fields parse_prediction_input extracted with one re.search per pattern"""
+    extracted = {}
+    msg_lower = message.lower()
+
+    def first_search(patterns):
+        for pattern in patterns:
+            match = re.search(pattern, msg_lower)
+            if match:
+                return match
+        return None
+
+    def first_word(table):
+        return next((value for word, value in table.items() if word in msg_lower), None)
+
+    area = first_search([r'(\d+)\s*(?:sqft|sq\.?ft|square\s*feet)',
+                         r'(?:area|size|house)\s+(?:of\s+)?(\d+)\s*(?:sqft|sq\.?ft|square\s*feet)?',
+                         r'(?:my\s+)?(?:home|house|place)\s+is\s+(\d+)'])
+    if area:
+        extracted['square_footage'] = int(area.group(1))
+    applicants = re.search(r'(\d+)\s*(?:applicants?|occupants?|residents?|people|family\s*members?|members)', msg_lower)
+    if applicants:
+        extracted['applicants'] = int(applicants.group(1))
+    day = re.search(r'(?:day|on)?\s*(?:day\s+)?(\d{1,2})(?:st|nd|rd|th)?(?:\s|,|$)', msg_lower)
+    if day and 1 <= int(day.group(1)) <= 31:
+        extracted['day'] = int(day.group(1))
+    month = first_word(MONTH_NAMES)
+    if month is None:
+        match = re.search(r'month\s+(\d{1,2})|(\d{1,2})/\d{1,2}', msg_lower)
+        if match and 1 <= int(match.group(1) or match.group(2)) <= 12:
+            month = int(match.group(1) or match.group(2))
+    if month is not None:
+        extracted['month'] = month
+    season = first_word(SEASON_NAMES)
+    if season:
+        extracted['season'] = season
+
+    hour = None
+    clock = re.search(r'(\d{1,2}):(\d{2})\s*(am|pm|a\.m|p\.m)?', msg_lower)
+    if clock:
+        hour, ampm = int(clock.group(1)), clock.group(3)
+        if hour < 13 and ampm:
+            if 'pm' in ampm and hour != 12:
+                hour += 12
+            elif 'am' in ampm and hour == 12:
+                hour = 0
+    else:
+        am = re.search(r'(?:at\s+)?(\d{1,2})\s+(?:am|a\.m)', msg_lower)
+        pm = re.search(r'(?:at\s+)?(\d{1,2})\s+(?:pm|p\.m)', msg_lower)
+        if am:
+            hour = 0 if int(am.group(1)) == 12 else int(am.group(1))
+        elif pm:
+            hour = 12 if int(pm.group(1)) == 12 else int(pm.group(1)) + 12
+    if hour is not None and 0 <= hour <= 23:
+        extracted['time'] = hour
+
+    if any(word in msg_lower for word in ['temperature', 'degrees', 'degree', '°c', '°f', 'celsius', 'fahrenheit']):
+        temperature = re.search(r'(\d+)\s*(?:degrees?|°|c|f)?', msg_lower)
+        if temperature:
+            extracted['temperature'] = int(temperature.group(1))
+    if any(word in msg_lower for word in ['humidity', 'humid', '%']):
+        humidity = re.search(r'(\d+)\s*%?(?:\s*humidity)?', msg_lower)
+        if humidity and 0 <= int(humidity.group(1)) <= 100:
+            extracted['humidity'] = int(humidity.group(1))
+    hvac_type = first_word(HVAC_TYPE_NAMES)
+    if hvac_type:
+        extracted['hvac_type'] = hvac_type
+    hvac = first_search([r'(\d+)\s*(?:hvac|air\s*con|ac|appliances?|units?)',
+                         r'(?:have|with|got|own)\s+(\d+)\s*(?:hvac|air\s*con|ac|appliances?|units?)?',
+                         r'(\d+)\s*(?:central|window|split|portable)?\s*(?:ac|air\s*conditioner)',
+                         r'(\d+)\s*(?:heat\s*pump|furnace|boiler)'])
+    if hvac:
+        extracted['hvac_appliances'] = int(hvac.group(1))
+    return extracted
+
+
+def generated_messages(count, seed=0):
+    """Messages stitched together from MESSAGE_PIECES with assorted separators and case"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        pieces = rng.choices(MESSAGE_PIECES, k=rng.randint(1, 7))
+        message = ''.join(piece + rng.choice([' ', ', ', '', '  ', '. ', ' and ']) for piece in pieces)
+        messages.append(message.upper() if rng.random() < 0.3 else message)
+    return messages
+
+
+def test_chatbot_messages():
+    for message, expected in CHATBOT_MESSAGES.items():
+        assert reference_fields(message) == expected, message
+        assert extract_prediction_fields(message) == expected, message
+    print(f'✓ {len(CHATBOT_MESSAGES)} chatbot test messages give the same fields as before')
+
+
+def test_generated_messages(count=20000):
+    messages = generated_messages(count)
+    mismatches = [m for m in messages if extract_prediction_fields(m) != reference_fields(m)]
+    assert not mismatches, mismatches[:5]
+    print(f'✓ {count} generated messages give the same fields as the pattern-by-pattern parser')
+
+
+def test_parse_prediction_input():
+    from app import parse_prediction_input
+
+    extracted, missing = parse_prediction_input("My house is 1500 sqft with 3 occupants in summer at 6 PM")
+    assert extracted['square_footage'] == 1500 and extracted['hvac_appliances'] == 3 and missing == []
+    extracted, missing = parse_prediction_input("hi there")
+    assert extracted == {} and missing == ['square_footage', 'hvac_appliances', 'month_or_season']
+    print('✓ parse_prediction_input reports missing fields from the extracted ones')
+
+
+def benchmark(rounds=200):
+    messages = list(CHATBOT_MESSAGES) + generated_messages(200, seed=1)
+    for label, parse in (('pattern-by-pattern', reference_fields), ('single pass', extract_prediction_fields)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message in messages:
+                parse(message)
+        per_message = (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+        print(f'  {label}: {per_message:.1f} µs/message')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('CHATBOT FIELD EXTRACTION TESTS')
+    print('=' * 80)
+    test_chatbot_messages()
+    test_generated_messages()
+    test_parse_prediction_input()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,234 @@
+"""
+Test script for streamed chatbot answers
+Checks that GeminiClient.stream forwards chunks as the fake Gemini server sends
+them (and times out or fails before and during the reply), that
+POST /api/chatbot/stream sends Gemini answers as 'token' events followed by a
+'done' event, that answers not from Gemini (greetings, predictions, cached and
+fallback answers) arrive as a single 'done' event, that identical questions
+asked while an answer streams share its Gemini call, and benchmarks time to
+first byte against /api/chatbot/message
+"""
+
+import json
+import threading
+import time
+
+from answer_cache import AnswerCache
+from conftest import FakeGemini, client_for
+from llm_client import LLMUnavailable
+from test_prediction_stats import login
+
+LONG_QUESTION = ('Can you walk me through how the energy model uses temperature, humidity, building size and the '
+                 'month, and what usually matters most for a typical family home during a hot summer week?')
+
+
+def sse_events(response):
+    """(seconds since the call, event, data) for each server-sent event of a streamed test client response"""
+    start = time.perf_counter()
+    events, buffer = [], ''
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines())
+            events.append((time.perf_counter() - start, fields['event'], json.loads(fields['data'])))
+    response.close()
+    return events
+
+
+def test_client_stream(fake):
+    fake.mode, fake.chunk_delay = 'ok', 0.05
+    client = client_for(fake)
+    start = time.perf_counter()
+    chunks = client.stream('one two three four five', system_instruction='You are a test.')
+    first_chunk = time.perf_counter() - start
+    received = list(chunks)
+    total = time.perf_counter() - start
+    assert ''.join(received) == 'Fake answer to: one two three four five' and len(received) == 8
+    assert fake.requests[-1]['path'].endswith(':streamGenerateContent?alt=sse')
+    assert fake.requests[-1]['body']['systemInstruction'] == {'parts': [{'text': 'You are a test.'}]}
+    assert first_chunk < total / 3, (first_chunk, total)
+    stats = client.stats()
+    assert (stats['streamed'], stats['succeeded'], stats['failed']) == (1, 1, 0)
+    assert client._slots.acquire(blocking=False) and client._slots.acquire(blocking=False)  # Slot was released
+    client._slots.release()
+    client._slots.release()
+
+    chunks = client.stream('stop early please')
+    next(chunks)
+    chunks.close()  # The reader went away
+    assert client.stats()['succeeded'] == 2 and client.breaker.state == 'closed'
+    client.close()
+    print(f'✓ Chunks are forwarded as they arrive (first after {first_chunk * 1000:.0f} ms of {total * 1000:.0f} ms)')
+
+
+def test_client_stream_failures(fake):
+    fake.mode = 'error'
+    client = client_for(fake, timeout=0.3)
+    try:
+        client.stream('question')
+        raise AssertionError('expected LLMUnavailable')
+    except LLMUnavailable as e:
+        assert e.reason == 'upstream_error'
+
+    fake.mode, fake.delay = 'slow', 1.0
+    start = time.perf_counter()
+    try:
+        client.stream('slow question')
+        raise AssertionError('expected a timeout')
+    except LLMUnavailable as e:
+        assert e.reason == 'timeout' and time.perf_counter() - start < 0.6
+
+    fake.mode, fake.chunk_delay = 'ok', 0.5  # Stalls between chunks
+    chunks = client.stream('stalling answer')
+    received = [next(chunks)]
+    try:
+        received.extend(chunks)
+        raise AssertionError('expected a timeout mid-stream')
+    except LLMUnavailable as e:
+        assert e.reason == 'timeout'
+    stats = client.stats()
+    assert (stats['failed'], stats['timed_out'], stats['circuit']['consecutive_failures']) == (1, 2, 3)
+    client.close()
+    print('✓ Errors and timeouts before the first chunk raise at once; a stall mid-answer ends the stream')
+
+
+def test_stream_endpoint(fake):
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    original = app.gemini, app.chat_answers
+    try:
+        fake.mode, fake.chunk_delay = 'ok', 0.02
+        app.gemini = client_for(fake)
+        app.chat_answers = AnswerCache()
+
+        response = client.post('/api/chatbot/stream', headers=headers, json={'message': 'What is HDD and CDD?'})
+        assert response.mimetype == 'text/event-stream'
+        events = sse_events(response)
+        names = [event for _, event, _ in events]
+        assert names == ['token'] * (len(events) - 1) + ['done'] and len(events) > 2, names
+        done = events[-1][2]
+        assert done['response'] == ''.join(data['text'] for _, event, data in events[:-1]) == \
+            'Fake answer to: What is HDD and CDD?'
+        assert done['suggested_questions'] and done['is_prediction'] is False
+
+        # The streamed answer was cached: asked again it arrives whole, without calling Gemini
+        sent = len(fake.requests)
+        events = sse_events(client.post('/api/chatbot/stream', headers=headers, json={'message': 'what is hdd and cdd'}))
+        assert [event for _, event, _ in events] == ['done'] and len(fake.requests) == sent
+        assert events[0][2]['response'] == done['response']
+
+        for message in ('Hello there', 'My house is 1500 sqft with 3 occupants in summer at 6 PM'):
+            streamed = sse_events(client.post('/api/chatbot/stream', headers=headers, json={'message': message}))
+            whole = client.post('/api/chatbot/message', headers=headers, json={'message': message}).get_json()
+            assert [event for _, event, _ in streamed] == ['done'] and streamed[0][2] == whole
+        assert len(fake.requests) == sent
+
+        fake.mode = 'error'
+        events = sse_events(client.post('/api/chatbot/stream', headers=headers, json={'message': 'How do I upload a file?'}))
+        assert [event for _, event, _ in events] == ['done'] and events[0][2]['mode'] == 'fallback'
+
+        fake.mode, fake.chunk_delay = 'ok', 0.5
+        app.gemini = client_for(fake, timeout=0.3)
+        events = sse_events(client.post('/api/chatbot/stream', headers=headers, json={'message': 'Explain the model'}))
+        assert events[0][1] == 'token' and events[-1][2]['incomplete'] and events[-1][2]['fallback_reason'] == 'timeout'
+        assert events[-1][2]['response'] == events[0][2]['text']
+        assert app.chat_answers.stats()['in_flight'] == 0
+
+        # A client that goes away before reading the stream does not leave its question in flight
+        fake.chunk_delay = 0.02
+        client.post('/api/chatbot/stream', headers=headers, json={'message': 'Explain the model again'}).close()
+        assert app.chat_answers.stats()['in_flight'] == 0
+
+        response = client.post('/api/chatbot/stream', headers=headers, json={'message': '  '})
+        assert response.status_code == 400 and response.get_json() == {'error': 'No message provided'}
+    finally:
+        app.gemini, app.chat_answers = original
+    print("✓ Gemini answers stream as 'token' events then 'done'; greetings, predictions, cached and fallback "
+          "answers are one 'done' event")
+
+
+def test_stream_shares_in_flight_answer(fake, clients=4):
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    original = app.gemini, app.chat_answers
+    try:
+        fake.mode, fake.chunk_delay = 'ok', 0.05
+        app.gemini = client_for(fake)
+        app.chat_answers = AnswerCache()
+        sent = len(fake.requests)
+        results = {}
+
+        def ask(n):
+            events = sse_events(app.app.test_client().post('/api/chatbot/stream', headers=headers,
+                                                           json={'message': 'How is the model trained?'}))
+            results[n] = [event for _, event, _ in events], events[-1][2]['response']
+
+        leader = threading.Thread(target=ask, args=(0,))
+        leader.start()
+        while app.chat_answers.stats()['in_flight'] == 0:
+            time.sleep(0.001)
+        waiters = [threading.Thread(target=ask, args=(n,)) for n in range(1, clients)]
+        for waiter in waiters:
+            waiter.start()
+        for thread in [leader] + waiters:
+            thread.join(10)
+        assert len(fake.requests) == sent + 1  # One Gemini call for every client
+        answer = 'Fake answer to: How is the model trained?'
+        assert results[0][0][-1] == 'done' and results[0][0].count('token') > 1 and results[0][1] == answer
+        for n in range(1, clients):
+            assert results[n] == (['done'], answer), results[n]
+        assert app.chat_answers.stats()['shared'] == clients - 1
+    finally:
+        app.gemini, app.chat_answers = original
+    print(f'✓ {clients} clients streaming the same question share one Gemini call; '
+          f"those that joined mid-answer get it as one 'done' event")
+
+
+def benchmark(fake, rounds=5):
+    """Time to first byte and to the whole answer for a long Gemini answer, one word every 20 ms"""
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    original = app.gemini, app.chat_answers
+    fake.mode, fake.chunk_delay = 'ok', 0.02
+    app.gemini = client_for(fake)
+    app.chat_answers = AnswerCache(max_entries=0)
+    try:
+        whole, first, total = [], [], []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            client.post('/api/chatbot/message', headers=headers, json={'message': LONG_QUESTION}).get_json()
+            whole.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            response = client.post('/api/chatbot/stream', headers=headers, json={'message': LONG_QUESTION})
+            returned = time.perf_counter() - start
+            events = sse_events(response)
+            first.append(returned + events[0][0])
+            total.append(time.perf_counter() - start)
+        print(f'  /api/chatbot/message: first byte after {min(whole) * 1000:.0f} ms (whole answer)')
+        print(f'  /api/chatbot/stream:  first byte after {min(first) * 1000:.0f} ms, '
+              f'whole answer after {min(total) * 1000:.0f} ms ({len(events) - 1} token events)')
+    finally:
+        app.gemini, app.chat_answers = original
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('CHATBOT STREAMING TESTS')
+    print('=' * 80)
+    fake = FakeGemini()
+    try:
+        test_client_stream(fake)
+        test_client_stream_failures(fake)
+        test_stream_endpoint(fake)
+        test_stream_shares_in_flight_answer(fake)
+        print('\nBenchmark:')
+        benchmark(fake)
+    finally:
+        fake.close()
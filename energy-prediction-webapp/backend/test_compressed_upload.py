@@ -0,0 +1,140 @@
+"""
+Test script for compressed CSV/TXT uploads
+Checks that gzip, bz2 and zstd uploads are decompressed while they are parsed,
+score exactly like the plain file, and that other compressed types are refused
+"""
+
+import bz2
+import gzip
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import zstandard
+
+from file_ingest import iter_upload_chunks, split_upload_type, upload_type
+from test_feature_engine import make_inputs
+
+COMPRESSORS = {
+    'gz': gzip.compress,
+    'bz2': bz2.compress,
+    'zst': lambda data: zstandard.ZstdCompressor().compress(data),
+}
+
+
+def make_csv(n_rows):
+    return pd.DataFrame(make_inputs(n_rows)).round(2).to_csv(index=False).encode()
+
+
+def test_upload_types():
+    import app
+
+    cases = {'meters.csv.gz': 'csv.gz', 'Meters.CSV.ZST': 'csv.zst', 'notes.txt.bz2': 'txt.bz2', 'bill.pdf': 'pdf',
+             'archive.tar.gz': 'tar.gz', 'my.data.csv': 'csv', 'noext': None}
+    for name, expected in cases.items():
+        assert upload_type(name) == expected, (name, upload_type(name))
+    assert split_upload_type('csv.gz') == ('csv', 'gzip') and split_upload_type('pdf') == ('pdf', None)
+    allowed = [name for name in cases if app.allowed_file(name)]
+    assert allowed == ['meters.csv.gz', 'Meters.CSV.ZST', 'notes.txt.bz2', 'bill.pdf', 'my.data.csv'], allowed
+    assert not app.allowed_file('bill.pdf.gz') and not app.allowed_file('meters.parquet.zst')
+    print(f'✓ Upload types resolved for {len(cases)} names; only CSV/TXT may be compressed')
+
+
+def test_chunks_match_plain():
+    data = make_csv(25000)
+    plain = pd.concat(iter_upload_chunks(io.BytesIO(data), 'csv', 10000))
+    for suffix, compress in COMPRESSORS.items():
+        upload = io.BytesIO(compress(data))
+        chunks = list(iter_upload_chunks(upload, f'csv.{suffix}', 10000))
+        assert [len(c) for c in chunks] == [10000, 10000, 5000]
+        pd.testing.assert_frame_equal(pd.concat(chunks), plain)
+        assert not upload.closed
+
+    # Concatenated gzip members and zstd frames (e.g. appended exports) are read to the end
+    header, body = data.split(b'\n', 1)
+    half = body.count(b'\n') // 2
+    lines = body.split(b'\n')
+    first = header + b'\n' + b'\n'.join(lines[:half]) + b'\n'
+    rest = b'\n'.join(lines[half:])
+    for suffix in ('gz', 'zst'):
+        joined = COMPRESSORS[suffix](first) + COMPRESSORS[suffix](rest)
+        assert sum(len(c) for c in iter_upload_chunks(io.BytesIO(joined), f'csv.{suffix}')) == 25000
+    print('✓ gzip, bz2 and zstd uploads parse to the same chunks as the plain CSV, multi-member files included')
+
+
+def test_api():
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    data = make_csv(3000)
+
+    def upload(payload, name):
+        return client.post('/api/predict/file?page_size=3000', headers=headers, data={'file': (io.BytesIO(payload), name)})
+
+    expected = upload(data, 'meters.csv').get_json()
+    for suffix, compress in COMPRESSORS.items():
+        body = upload(compress(data), f'meters.csv.{suffix}').get_json()
+        assert body['predictions'] == expected['predictions'] and body['statistics'] == expected['statistics']
+
+    refused = upload(gzip.compress(b'%PDF'), 'bill.pdf.gz')
+    assert refused.status_code == 400 and 'compressed' in refused.get_json()['error']
+    corrupt = upload(b'\x1f\x8b\x08\x00garbage', 'meters.csv.gz')
+    assert corrupt.status_code == 400 and corrupt.get_json()['error'].startswith('Error processing file')
+
+    response = client.post('/api/predict/jobs', headers=headers,
+                           data={'file': (io.BytesIO(COMPRESSORS['zst'](data)), 'meters.csv.zst')})
+    job_id = response.get_json()['job_id']
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        job = client.get(f'/api/predict/jobs/{job_id}', headers=headers).get_json()
+        if job['state'] in ('done', 'failed'):
+            break
+        time.sleep(0.2)
+    assert job['state'] == 'done' and job['total_rows'] == 3000, job
+    assert job['statistics'] == expected['statistics']
+    app.prediction_jobs.shutdown()
+    print(f"✓ API: compressed uploads score like the plain file; .pdf.gz and corrupt gzip are 400; "
+          f"a .csv.zst job counted {job['total_rows']} rows")
+
+
+def benchmark(n_rows=500000):
+    """Parse a gzip upload as a stream vs inflating it in memory first"""
+    data = make_csv(n_rows)
+    compressed = {suffix: compress(data) for suffix, compress in COMPRESSORS.items()}
+    print(f'  {n_rows} rows: CSV {len(data) / 1e6:.1f} MB; ' +
+          ', '.join(f'{s} {len(c) / 1e6:.1f} MB ({len(data) / len(c):.1f}x)' for s, c in compressed.items()))
+
+    def peak(fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = fn()
+        seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return rows, seconds, peak_bytes / 1e6
+
+    def inflate_first():
+        plain = gzip.decompress(compressed['gz'])
+        return sum(len(c) for c in iter_upload_chunks(io.BytesIO(plain), 'csv'))
+
+    for label, fn in (('inflate then parse', inflate_first),
+                      ('stream gz', lambda: sum(len(c) for c in iter_upload_chunks(io.BytesIO(compressed['gz']), 'csv.gz'))),
+                      ('stream zst', lambda: sum(len(c) for c in iter_upload_chunks(io.BytesIO(compressed['zst']), 'csv.zst')))):
+        rows, seconds, peak_mb = peak(fn)
+        assert rows == n_rows
+        print(f'  {label:18s} {seconds * 1000:5.0f} ms, peak memory {peak_mb:5.1f} MB')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('COMPRESSED UPLOAD TESTS')
+    print('=' * 80)
+    test_upload_types()
+    test_chunks_match_plain()
+    test_api()
+    print('\nBenchmark:')
+    benchmark()
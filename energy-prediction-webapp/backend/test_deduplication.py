@@ -0,0 +1,129 @@
+"""
+Test script for scoring repeated input rows once
+Checks that deduplicated scoring gives the same predictions as scoring every
+row and that the batch, file and job responses report the rows saved
+"""
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import DeduplicationReport, engineer_feature_matrix, unique_input_rows
+from test_feature_engine import make_inputs
+
+
+def repeated_inputs(n_rows, n_distinct, seed=11):
+    """n_rows inputs drawn from n_distinct combinations, like meter files with repeated conditions"""
+    base = make_inputs(n_distinct + 10)
+    pick = np.random.default_rng(seed).integers(0, n_distinct, n_rows)
+    return {field: values[10:][pick] for field, values in base.items()}
+
+
+def test_unique_rows_round_trip():
+    columns = repeated_inputs(20000, 300)
+    unique, inverse = unique_input_rows(columns)
+    assert len(unique['temperature']) == len(np.unique(np.column_stack(list(columns.values())), axis=0))
+    np.testing.assert_array_equal(engineer_feature_matrix(unique)[inverse], engineer_feature_matrix(columns))
+
+    # First appearance order, truncated integer fields merge, missing fields take defaults
+    rows = {'temperature': [20.0, 25.0, 20.0, 20.0], 'time': [14, 9, 14.5, 14]}
+    unique, inverse = unique_input_rows(rows)
+    assert unique['temperature'].tolist() == [20.0, 25.0] and inverse.tolist() == [0, 1, 0, 0]
+    assert unique['humidity'].tolist() == [50.0, 50.0]
+
+    # Continuous columns with no repeats take the overflow-safe re-coding path
+    rng = np.random.default_rng(2)
+    wide = {f: rng.uniform(0, 1, 100000) for f in ('temperature', 'humidity', 'square_footage')}
+    unique, inverse = unique_input_rows(wide)
+    assert len(unique['temperature']) == 100000 and (inverse == np.arange(100000)).all()
+    print('✓ unique rows scatter back to the full feature matrix; no key overflow with 100k distinct floats')
+
+
+def test_report():
+    report = DeduplicationReport()
+    report.add(10000, 800)
+    report.add(5000, 700)
+    assert report.to_dict() == {'rows': 15000, 'unique_rows': 1500, 'duplicate_rows': 13500, 'model_rows_saved_pct': 90.0}
+    assert DeduplicationReport().to_dict()['model_rows_saved_pct'] == 0.0
+    print('✓ Report sums rows and distinct rows over chunks')
+
+
+def login(client):
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_api_reports_deduplication():
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    columns = repeated_inputs(3000, 40)
+    records = pd.DataFrame(columns).to_dict('records')
+
+    batch = client.post('/api/predict/batch', json=records, headers=headers).get_json()
+    expected = app.run_model(app.serving_model().model, engineer_feature_matrix(columns))
+    np.testing.assert_allclose(batch['predictions'], expected, rtol=1e-12)
+    assert batch['deduplication']['rows'] == 3000 and batch['deduplication']['unique_rows'] == 40
+
+    csv = pd.DataFrame(columns).to_csv(index=False).encode()
+    body = client.post('/api/predict/file?page_size=3000', headers=headers,
+                       data={'file': (io.BytesIO(csv), 'meters.csv')}).get_json()
+    np.testing.assert_allclose([p['prediction'] for p in body['predictions']], expected, rtol=1e-12)
+    assert body['deduplication']['unique_rows'] == 40, body['deduplication']
+    print(f"✓ API: batch and file predictions equal scoring every row; "
+          f"deduplication {body['deduplication']}")
+
+
+def test_job_reports_deduplication():
+    import tempfile
+    from prediction_jobs import PredictionJobQueue
+    from test_prediction_jobs import MODEL_PATH, MODEL_VERSION, upload, wait_for
+
+    columns = repeated_inputs(6000, 25)
+    csv = pd.DataFrame(columns).to_csv(index=False).encode()
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PredictionJobQueue(tmp, workers=1, chunk_rows=4000)
+        try:
+            job = queue.submit(upload(csv), 'meters.csv', 'csv', 'demo@example.com', MODEL_PATH, MODEL_VERSION)
+            job, _ = wait_for(queue, job['job_id'], 'demo@example.com')
+        finally:
+            queue.shutdown()
+    # Distinct rows are counted per chunk: each of the 2 chunks holds all 25 combinations
+    assert job['state'] == 'done' and job['deduplication']['unique_rows'] == 50, job
+    print(f"✓ Background job records deduplication per chunk: {job['deduplication']}")
+
+
+def benchmark(n_rows=100000, n_distinct=2000):
+    """One 100k-row model call vs deduplicating first, on inputs with 2000 distinct combinations"""
+    import app
+
+    model = app.serving_model().model
+    columns = repeated_inputs(n_rows, n_distinct)
+
+    start = time.perf_counter()
+    full = app.run_model(model, engineer_feature_matrix(columns))
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    unique, inverse = unique_input_rows(columns)
+    dedup_s = time.perf_counter() - start
+    deduped = app.run_model(model, engineer_feature_matrix(unique))[inverse]
+    total_s = time.perf_counter() - start
+    np.testing.assert_allclose(deduped, full, rtol=1e-12)
+    print(f'  {n_rows} rows, {len(unique["temperature"])} distinct: every row {full_s * 1000:.0f} ms, '
+          f'deduplicated {total_s * 1000:.0f} ms (finding duplicates {dedup_s * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('DEDUPLICATION TESTS')
+    print('=' * 80)
+    test_unique_rows_round_trip()
+    test_report()
+    test_api_reports_deduplication()
+    test_job_reports_deduplication()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,61 @@
+"""
+Test script for fast-start mode
+Imports app.py in a fresh interpreter with FAST_START=1 and checks what got loaded
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+state_after_import = app.model_state
+heavy = [m for m in ('google.generativeai', 'PyPDF2') if m in sys.modules]
+client = app.app.test_client()
+first = client.get('/api/health')
+while app.model_state == 'loading':
+    time.sleep(0.05)
+ready = client.get('/api/health')
+print(json.dumps({'import_seconds': imported, 'heavy_at_import': heavy, 'state_after_import': state_after_import,
+                  'first_status': first.status_code, 'first_body': first.get_json(),
+                  'ready_status': ready.status_code, 'ready_body': ready.get_json()}))
+"""
+
+
+def run_probe(fast_start):
+    env = dict(os.environ, FAST_START='1' if fast_start else '0')
+    result = subprocess.run([sys.executable, '-c', PROBE], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=300)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_fast_start_defers_heavy_work():
+    fast = run_probe(fast_start=True)
+    # The model (and with it sklearn/xgboost/lightgbm) loads on a background thread
+    assert fast['state_after_import'] == 'loading'
+    assert not fast['heavy_at_import'], fast['heavy_at_import']
+    assert fast['first_status'] == 503 and fast['first_body']['status'] == 'starting'
+    assert fast['ready_status'] == 200 and fast['ready_body']['ready']
+    timings = fast['ready_body']['startup_timings']
+    assert {'imports', 'model', 'total'} <= set(timings)
+    print(f"✓ FAST_START=1: app imported in {fast['import_seconds']:.2f}s, health 503 until loaded, timings {timings}")
+
+
+def test_default_mode_loads_eagerly():
+    eager = run_probe(fast_start=False)
+    assert eager['first_status'] == 200 and eager['first_body']['ready']
+    print(f"✓ Default mode: app imported in {eager['import_seconds']:.2f}s with the model ready "
+          f"(timings {eager['first_body']['startup_timings']})")
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('FAST-START TESTS')
+    print('=' * 80)
+    test_fast_start_defers_heavy_work()
+    test_default_mode_loads_eagerly()
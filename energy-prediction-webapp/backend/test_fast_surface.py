@@ -0,0 +1,164 @@
+"""
+Test script for the interpolated "fast" prediction mode
+Checks interpolation_surface.py on known functions, then against energy_model.pkl and the API
+"""
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from interpolation_surface import InterpolationSurface, SURFACE_FIELDS, parse_grid_points
+from test_feature_engine import make_inputs
+
+BOUNDS = {
+    'temperature': (-10, 50),
+    'humidity': (0, 100),
+    'square_footage': (500, 50000),
+    'month': (1, 12),
+    'time': (0, 23),
+    'hvac_appliances': (0, 20),
+}
+
+# Small enough to build in a few seconds
+SMALL_GRID = 'temperature=7,humidity=3,square_footage=10,hvac_appliances=3'
+
+
+def linear(columns, n_rows):
+    """Multilinear in every input, so interpolation must reproduce it exactly"""
+    c = {f: np.asarray(columns[f], dtype=np.float64) for f in SURFACE_FIELDS}
+    return (3 * c['temperature'] + 0.5 * c['humidity'] * c['square_footage'] / 1000
+            + 7 * c['month'] - 2 * c['time'] * c['hvac_appliances'] + 100)
+
+
+def test_multilinear_function_is_exact():
+    surface = InterpolationSurface.build(linear, BOUNDS, parse_grid_points(SMALL_GRID))
+    columns = make_inputs(3000)
+    expected = linear({f: np.trunc(v) if f in ('month', 'time', 'hvac_appliances') else v
+                       for f, v in columns.items()}, 3000)
+    assert np.allclose(surface.predict_columns(columns), expected)
+    error = surface.measure_error(linear)
+    assert error['max_abs_error_kwh'] < 1e-6, error
+    print(f'✓ Multilinear function reproduced exactly on a {surface.n_points}-point grid')
+
+
+def test_single_row_matches_batch():
+    surface = InterpolationSurface.build(linear, BOUNDS, parse_grid_points(SMALL_GRID))
+    columns = make_inputs(200, seed=3)
+    batch = surface.predict_columns(columns)
+    for i in range(200):
+        record = {f: columns[f][i] for f in SURFACE_FIELDS}
+        assert abs(surface.predict_one(record) - batch[i]) < 1e-9
+    # Out-of-range inputs are clamped to the grid edge
+    edge = dict(temperature=50, humidity=100, square_footage=50000, month=12, time=23, hvac_appliances=20)
+    assert surface.predict_one(dict(edge, temperature=80)) == surface.predict_one(edge)
+    print('✓ predict_one agrees with predict_columns; inputs outside the grid are clamped')
+
+
+def test_grid_spec():
+    grid = parse_grid_points('square_footage=40, hvac_appliances=21')
+    assert grid['square_footage'] == 40 and grid['hvac_appliances'] == 21 and grid['month'] == 12
+    for bad in ('windspeed=4', 'humidity=1'):
+        try:
+            parse_grid_points(bad)
+        except ValueError as e:
+            print(f'✓ Bad grid spec {bad!r} rejected: {e}')
+        else:
+            raise AssertionError(f'expected ValueError for {bad!r}')
+
+
+def test_save_and_load():
+    surface = InterpolationSurface.build(linear, BOUNDS, parse_grid_points(SMALL_GRID), version='v-test')
+    surface.measure_error(linear)
+    columns = make_inputs(100)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'energy_model.surface.npz')
+        surface.save(path)
+        loaded = InterpolationSurface.load(path)
+    assert loaded.version == 'v-test' and loaded.error == surface.error
+    assert np.array_equal(loaded.predict_columns(columns), surface.predict_columns(columns))
+    print('✓ Save/load round trip keeps the grid, version and error report')
+
+
+def test_api_fast_mode():
+    import app
+
+    tmp = tempfile.mkdtemp()
+    app.FAST_SURFACE_GRID = parse_grid_points(SMALL_GRID)
+    app.FAST_SURFACE_PATH = os.path.join(tmp, 'energy_model.surface.npz')
+    app.build_fast_surface(app.model_manager.current)
+    assert app.fast_surface is not None and os.path.exists(app.FAST_SURFACE_PATH)
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    record = {'temperature': 25, 'humidity': 40, 'square_footage': 3000, 'month': 7, 'hvac_appliances': 2, 'time': 14}
+
+    exact = client.post('/api/predict/form', json=record, headers=headers).get_json()
+    fast = client.post('/api/predict/form?mode=fast', json=record, headers=headers).get_json()
+    assert exact['mode'] == 'exact' and fast['mode'] == 'fast'
+    assert fast['approximation_error']['samples'] > 0
+    assert abs(fast['prediction'] - exact['prediction']) < 0.1 * exact['prediction']
+
+    records = [{f: float(v[i]) for f, v in make_inputs(50, seed=9).items()} for i in range(50)]
+    batch = client.post('/api/predict/batch', json={'records': records, 'mode': 'fast'}, headers=headers).get_json()
+    assert batch['mode'] == 'fast' and batch['valid_count'] == 50
+
+    status = client.get('/api/model/surface', headers=headers).get_json()
+    assert status['ready'] and status['version'] == app.model_manager.current.version
+    os.remove(app.FAST_SURFACE_PATH)
+    os.rmdir(tmp)
+    print(f"✓ API: form {exact['prediction']:.1f} kWh exact vs {fast['prediction']:.1f} kWh fast; "
+          f"measured error {status['error']}")
+
+
+def benchmark():
+    """Error and speed of the default grid against the real model"""
+    import joblib
+    from feature_engine import engineer_feature_matrix, feature_frame
+
+    model = joblib.load(os.path.join(os.path.dirname(__file__), 'energy_model.pkl'))
+
+    def predict(columns, n_rows):
+        return np.abs(model.predict(feature_frame(engineer_feature_matrix(columns, n_rows=n_rows))))
+
+    for spec in (SMALL_GRID, ''):
+        start = time.perf_counter()
+        surface = InterpolationSurface.build(predict, BOUNDS, parse_grid_points(spec))
+        build_s = time.perf_counter() - start
+        error = surface.measure_error(predict)
+        print(f"  grid {surface.describe()['grid']} ({surface.n_points} points, "
+              f"{surface.values.nbytes / 1e6:.1f} MB): built in {build_s:.1f}s")
+        print(f"    error vs full model: mean {error['mean_abs_error_kwh']} kWh ({error['mean_pct_error']}%), "
+              f"p95 {error['p95_abs_error_kwh']} kWh, max {error['max_abs_error_kwh']} kWh")
+
+    columns = make_inputs(10000)
+    record = {f: float(columns[f][0]) for f in SURFACE_FIELDS}
+    start = time.perf_counter()
+    for _ in range(10000):
+        surface.predict_one(record)
+    single_us = (time.perf_counter() - start) / 10000 * 1e6
+    start = time.perf_counter()
+    surface.predict_columns(columns)
+    batch_ms = (time.perf_counter() - start) * 1000
+    model_row = engineer_feature_matrix({f: columns[f][:1] for f in SURFACE_FIELDS}, as_frame=True)
+    start = time.perf_counter()
+    for _ in range(20):
+        model.predict(model_row)
+    model_ms = (time.perf_counter() - start) / 20 * 1000
+    print(f'  fast mode: {single_us:.1f} µs/single row, 10000 rows in {batch_ms:.1f} ms '
+          f'(full model: {model_ms:.1f} ms/single row)')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('FAST INTERPOLATION MODE TESTS')
+    print('=' * 80)
+    test_multilinear_function_is_exact()
+    test_single_row_matches_batch()
+    test_grid_spec()
+    test_save_and_load()
+    test_api_fast_mode()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,108 @@
+"""
+Test script for the columnar feature engine
+Checks that feature_engine.py produces exactly the training pipeline's numbers
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import FEATURE_ORDER, columns_from_records, engineer_feature_matrix
+from train_improved_model import engineer_features as training_engineer_features
+
+
+def make_inputs(n_rows, seed=7):
+    """Random inputs spanning the ranges predict_form accepts, plus the edges"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        'temperature': rng.uniform(-10, 50, n_rows),
+        'humidity': rng.uniform(0, 100, n_rows),
+        'square_footage': rng.uniform(500, 50000, n_rows),
+        'month': rng.integers(1, 13, n_rows),
+        'time': rng.integers(0, 24, n_rows),
+        'hvac_appliances': rng.integers(0, 21, n_rows),
+    }
+    # Flag thresholds and degree-day bases
+    columns['temperature'][:6] = [18, 22, -10, 50, 20, 17.999]
+    columns['square_footage'][:3] = [7500, 7500.5, 500]
+    columns['time'][:6] = [14, 19, 22, 6, 0, 23]
+    return columns
+
+
+def training_frame(columns):
+    """Run the training script's feature engineering on the same inputs"""
+    df = pd.DataFrame({
+        'Temperature': columns['temperature'],
+        'Humidity': columns['humidity'],
+        'SquareFootage': columns['square_footage'],
+        'Month': columns['month'],
+        'Hour': columns['time'],
+        'HVAC_Appliances': columns['hvac_appliances'],
+    })
+    return training_engineer_features(df)[FEATURE_ORDER]
+
+
+def test_matches_training_pipeline():
+    columns = make_inputs(5000)
+    expected = training_frame(columns).to_numpy(dtype=np.float64)
+    matrix = engineer_feature_matrix(columns)
+
+    assert matrix.shape == (5000, 28)
+    assert matrix.flags['C_CONTIGUOUS']
+    assert np.array_equal(matrix, expected), 'columnar features differ from training features'
+    print('✓ 5000 rows identical to train_improved_model.engineer_features')
+
+
+def test_float32_and_frame_output():
+    columns = make_inputs(100)
+    matrix64 = engineer_feature_matrix(columns)
+    matrix32 = engineer_feature_matrix(columns, dtype=np.float32)
+    frame = engineer_feature_matrix(columns, as_frame=True)
+
+    assert matrix32.dtype == np.float32
+    assert np.array_equal(matrix32, matrix64.astype(np.float32))
+    assert list(frame.columns) == FEATURE_ORDER
+    assert np.array_equal(frame.to_numpy(), matrix64)
+    print('✓ float32 matrix and DataFrame output consistent')
+
+
+def test_record_conversion_and_defaults():
+    records = [
+        {'temperature': '25.5', 'humidity': 40, 'square_footage': 3000, 'month': 7.9, 'time': '14', 'hvac_appliances': 2},
+        {'temperature': 10},
+    ]
+    columns = columns_from_records(records)
+    matrix = engineer_feature_matrix(columns)
+
+    assert matrix[0, 3] == 7  # int() truncation, as in the single-row path
+    assert list(matrix[1, :6]) == [10, 50, 5000, 1, 12, 1]
+    print('✓ Record conversion and defaults match the single-row path')
+
+
+def benchmark(n_rows=10000):
+    columns = make_inputs(n_rows)
+    records = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    start = time.perf_counter()
+    for record in records[:1000]:
+        engineer_feature_matrix(columns_from_records([record]), as_frame=True)
+    per_row_ms = (time.perf_counter() - start) / 1000 * 1000
+
+    start = time.perf_counter()
+    engineer_feature_matrix(columns)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    print(f'  One row at a time (app.engineer_features): {per_row_ms:.3f} ms/row')
+    print(f'  Columnar, {n_rows} rows in one call: {batch_ms:.3f} ms total ({batch_ms / n_rows * 1000:.3f} µs/row)')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('COLUMNAR FEATURE ENGINE TESTS')
+    print('=' * 80)
+    test_matches_training_pipeline()
+    test_float32_and_frame_output()
+    test_record_conversion_and_defaults()
+    print('\nBenchmark:')
+    benchmark()
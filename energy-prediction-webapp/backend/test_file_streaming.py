@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Test script for chunked / streaming file predictions
+Uploads a generated CSV with and without ?stream=1 and compares the results
+"""
+
+import io
+import json
+import random
+import sys
+import time
+
+import requests
+
+BASE_URL = "http://localhost:5000"
+
+
+def get_headers():
+    """Get JWT auth headers"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": "demo@example.com",
+        "password": "password123"
+    })
+    if response.status_code != 200:
+        print(f"❌ Authentication failed: {response.text}")
+        sys.exit(1)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def make_csv(n_rows):
+    lines = ["temperature,humidity,square_footage,month,hvac_appliances,time"]
+    for _ in range(n_rows):
+        lines.append(
+            f"{random.uniform(-10, 50):.1f},{random.uniform(0, 100):.1f},{random.randint(500, 50000)},"
+            f"{random.randint(1, 12)},{random.randint(0, 20)},{random.randint(0, 23)}"
+        )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def fetch_all_rows(body, headers):
+    """Every row prediction of a file response: the first page plus the rest from results_url"""
+    rows = list(body["predictions"])
+    for page in range(2, body["total_pages"] + 1):
+        response = requests.get(f"{BASE_URL}{body['results_url']}", params={"page": page, "page_size": body["page_size"]},
+                                headers=headers)
+        rows += response.json()["predictions"]
+    return rows
+
+
+def test_stream_matches_json(n_rows=25000):
+    headers = get_headers()
+    content = make_csv(n_rows)
+
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/api/predict/file",
+                             files={"file": ("meters.csv", io.BytesIO(content))}, headers=headers)
+    json_seconds = time.perf_counter() - start
+    assert response.status_code == 200, response.text
+    expected = response.json()
+    expected_rows = fetch_all_rows(expected, headers)
+
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/api/predict/file?stream=1",
+                             files={"file": ("meters.csv", io.BytesIO(content))}, headers=headers, stream=True)
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+
+    first_line_seconds = None
+    rows = []
+    summary = None
+    for line in response.iter_lines():
+        if first_line_seconds is None:
+            first_line_seconds = time.perf_counter() - start
+        message = json.loads(line)
+        if message["type"] == "prediction":
+            rows.append(message)
+        elif message["type"] == "summary":
+            summary = message
+        else:
+            raise AssertionError(f"Stream reported an error: {message}")
+    stream_seconds = time.perf_counter() - start
+
+    assert summary is not None and summary["total_rows"] == n_rows
+    assert [r["row"] for r in rows] == list(range(n_rows))
+    assert len(expected_rows) == n_rows
+    assert all(a["prediction"] == b["prediction"] for a, b in zip(rows, expected_rows))
+    assert abs(summary["average_prediction"] - expected["average_prediction"]) < 1e-6
+    assert summary["statistics"] == expected["statistics"]
+
+    print(f"✅ {n_rows} rows: JSON response in {json_seconds:.2f}s, "
+          f"stream first row after {first_line_seconds:.2f}s, done in {stream_seconds:.2f}s")
+
+
+def test_stream_reports_errors():
+    headers = get_headers()
+    content = b"temperature,month\n20,1\nabc,2\n"
+    response = requests.post(f"{BASE_URL}/api/predict/file?stream=1",
+                             files={"file": ("bad.csv", io.BytesIO(content))}, headers=headers)
+    last = json.loads(response.text.strip().splitlines()[-1])
+    assert last["type"] == "summary" and last["validation"]["errors"][0]["rows"] == [1], last
+    print(f"✅ Bad cell skips its row: {last['validation']['errors'][0]['message']}")
+
+    response = requests.post(f"{BASE_URL}/api/predict/file?stream=1",
+                             files={"file": ("bad.pdf", io.BytesIO(b"not a pdf"))}, headers=headers)
+    last = json.loads(response.text.strip().splitlines()[-1])
+    assert last["type"] == "error", last
+    print(f"✅ Unreadable file ends the stream with: {last['error']}")
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("STREAMING FILE PREDICTION - TEST SUITE")
+    print("=" * 70)
+    test_stream_matches_json()
+    test_stream_reports_errors()
@@ -0,0 +1,125 @@
+"""
+Test script for the flat-array inference backend
+Checks that flat_ensemble.py reproduces energy_model.pkl and times both backends
+"""
+
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from feature_engine import engineer_feature_matrix
+from flat_ensemble import FlatEnsemble, compile_model
+from test_feature_engine import make_inputs
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), 'energy_model.pkl')
+
+_cache = {}
+
+
+def load_models():
+    """The trained VotingRegressor and its compiled flat version"""
+    if not _cache:
+        model = joblib.load(MODEL_PATH)
+        _cache['model'] = model
+        _cache['flat'] = compile_model(model)
+    return _cache['model'], _cache['flat']
+
+
+def test_matches_voting_regressor():
+    model, flat = load_models()
+    columns = make_inputs(5000)
+    expected = model.predict(engineer_feature_matrix(columns, as_frame=True))
+    predicted = flat.predict(engineer_feature_matrix(columns))
+
+    # LightGBM and the forest match exactly; XGBoost sums its trees in float32
+    max_diff = np.abs(predicted - expected).max()
+    assert max_diff < 1e-2, f'flat predictions differ by up to {max_diff}'
+    print(f'✓ 5000 rows match the VotingRegressor (max difference {max_diff:.2e} kWh)')
+
+
+def test_each_estimator():
+    model, _ = load_models()
+    X = engineer_feature_matrix(make_inputs(2000), as_frame=True)
+    for estimator in model.estimators_:
+        flat = compile_model(estimator)
+        max_diff = np.abs(flat.predict(X.to_numpy()) - estimator.predict(X)).max()
+        tolerance = 1e-2 if type(estimator).__name__ == 'XGBRegressor' else 1e-9
+        assert max_diff < tolerance, f'{type(estimator).__name__} differs by up to {max_diff}'
+        print(f'✓ {type(estimator).__name__}: max difference {max_diff:.2e}')
+
+
+def test_save_and_load():
+    _, flat = load_models()
+    X = engineer_feature_matrix(make_inputs(500))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'energy_model.flat.npz')
+        flat.save(path)
+        loaded = FlatEnsemble.load(path)
+
+    assert loaded.n_trees == flat.n_trees and loaded.n_nodes == flat.n_nodes
+    assert np.array_equal(loaded.predict(X), flat.predict(X))
+    print(f'✓ Save/load round trip ({flat.n_trees} trees, {flat.n_nodes} nodes)')
+
+
+def test_memory_mapped_directory():
+    _, flat = load_models()
+    X = engineer_feature_matrix(make_inputs(500))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'energy_model.flat')
+        flat.save(path)
+        mapped = FlatEnsemble.load(path)
+        copied = FlatEnsemble.load(path, mmap=False)
+
+        assert mapped.memory_mapped and not copied.memory_mapped
+        assert not mapped.threshold.flags.writeable
+        # Index tables are stored at native width, so no private copy is made on load
+        assert np.shares_memory(mapped._feature, mapped.feature) and np.shares_memory(mapped._left, mapped.left)
+        assert np.array_equal(mapped.predict(X), flat.predict(X))
+        assert np.array_equal(copied.predict(X), flat.predict(X))
+        del mapped
+    print('✓ Directory format is memory-mapped read-only and predicts identically')
+
+
+def test_rejects_wrong_shape():
+    _, flat = load_models()
+    try:
+        flat.predict(np.zeros((3, 5)))
+    except ValueError as e:
+        print(f'✓ Wrong feature count rejected: {e}')
+    else:
+        raise AssertionError('expected ValueError for 5 features')
+
+
+def benchmark(n_rows=20000):
+    model, flat = load_models()
+    columns = make_inputs(n_rows)
+    matrix = engineer_feature_matrix(columns)
+    frame = engineer_feature_matrix(columns, as_frame=True)
+
+    for name, predict, X in (('VotingRegressor', model.predict, frame), ('FlatEnsemble', flat.predict, matrix)):
+        predict(X[:1])
+        start = time.perf_counter()
+        for i in range(100):
+            predict(X[i:i + 1])
+        single_ms = (time.perf_counter() - start) / 100 * 1000
+
+        start = time.perf_counter()
+        predict(X)
+        batch_s = time.perf_counter() - start
+        print(f'  {name:>15}: {single_ms:.3f} ms/single row, {n_rows} rows in {batch_s:.2f}s')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('FLAT-ARRAY INFERENCE TESTS')
+    print('=' * 80)
+    test_matches_voting_regressor()
+    test_each_estimator()
+    test_save_and_load()
+    test_memory_mapped_directory()
+    test_rejects_wrong_shape()
+    print('\nBenchmark:')
+    benchmark()
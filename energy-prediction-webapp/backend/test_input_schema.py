@@ -0,0 +1,137 @@
+"""
+Test script for the shared input schema
+Checks header aliases, column-wise validation of uploaded files and that the
+form, batch and file endpoints apply the same rules
+"""
+
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from input_schema import ValidationReport, normalize_header, resolve_headers, validate_frame
+from test_feature_engine import make_inputs
+
+
+def test_header_aliases():
+    cases = {
+        'Temperature': 'temperature', 'temperature': 'temperature', 'Temperature (°C)': 'temperature',
+        ' temp ': 'temperature', 'Humidity (%)': 'humidity', 'SquareFootage': 'square_footage',
+        'Square Footage': 'square_footage', 'sqft': 'square_footage', 'Hour': 'time', 'time': 'time',
+        'Hour of day': 'time', 'HVAC_Appliances': 'hvac_appliances', 'HVAC Appliances': 'hvac_appliances',
+        'MONTH': 'month', 'HVAC Type': 'hvac_type', 'Energy (kWh)': None, 'notes': None,
+    }
+    for header, field in cases.items():
+        assert normalize_header(header) == field, (header, normalize_header(header))
+    mapping, ignored = resolve_headers(['Temperature', 'temp', 'Hour', 'notes'])
+    assert mapping == {'Temperature': 'temperature', 'Hour': 'time'} and ignored == ['temp']
+    print(f'✓ {len(cases)} header variants resolved; a second temperature column is ignored')
+
+
+def test_file_rows_rejected_individually():
+    csv = ('Temperature,Humidity (%),SquareFootage,Month,Hour,HVAC_Appliances\n'
+           '20,40,3000,7,14,2\n'
+           'abc,40,3000,7,14,2\n'      # not a number
+           '20,140,3000,7,14,2\n'      # out of range
+           '20,40,3000,,14,2\n'        # blank integer cell
+           '20,40,3000,7,14.5,2\n'     # float hour is truncated, as int() does
+           '20,40,3000,13,24,2\n')     # two range errors on one row
+    df = pd.read_csv(io.StringIO(csv))
+    result = validate_frame(df)
+    assert result.valid.tolist() == [True, False, False, False, True, False]
+    assert result.columns['time'][4] == 14
+    report = ValidationReport()
+    report.add(result, df.index.to_numpy() + 100)
+    summary = report.to_dict()
+    errors = {(e['field'], e['rule']): e for e in summary['errors']}
+    assert errors[('temperature', 'type')]['rows'] == [101]
+    assert errors[('humidity', 'range')]['rows'] == [102]
+    assert errors[('month', 'missing')]['rows'] == [103]
+    assert errors[('month', 'range')]['rows'] == [105] and errors[('time', 'range')]['rows'] == [105]
+    assert summary['invalid_rows'] == 4 and summary['valid_rows'] == 2
+    assert summary['renamed_columns']['Hour'] == 'time' and not summary['defaulted_fields']
+
+    kept = ValidationReport(keep_rejected=True)
+    kept.add(result, df.index.to_numpy() + 100)
+    rejected_rows, codes, reasons = kept.rejected_rows()
+    assert rejected_rows.tolist() == [101, 102, 103, 105] and len(set(codes.tolist())) == 4
+    assert '; ' in reasons[codes[-1]]  # Both range errors of row 105
+    print(f"✓ 6-row file: 4 rows rejected by {len(summary['errors'])} rules, 2 scored")
+
+
+def test_missing_columns_take_defaults():
+    df = pd.DataFrame({'temperature': [20.0, 25.0], 'square_footage': [3000, 4000]})
+    result = validate_frame(df)
+    assert result.valid.all()
+    assert set(result.defaulted_fields) == {'humidity', 'month', 'time', 'hvac_appliances'}
+    assert result.columns['humidity'].tolist() == [50.0, 50.0]
+    print(f'✓ Absent columns use the form defaults: {result.defaulted_fields}')
+
+
+def test_report_caps_row_lists():
+    report = ValidationReport(max_rows=5)
+    for start in (0, 1000):
+        df = pd.DataFrame({'temperature': np.full(1000, 99.0)}, index=pd.RangeIndex(start, start + 1000))
+        report.add(validate_frame(df), df.index.to_numpy())
+    entry = report.to_dict()['errors'][0]
+    assert entry['count'] == 2000 and entry['rows'] == [0, 1, 2, 3, 4]
+    print('✓ Error report counts every row but lists only the first few row numbers per rule')
+
+
+def test_endpoints_share_rules():
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    bad = {'temperature': 60, 'humidity': 'wet', 'square_footage': 3000, 'month': '7.5', 'time': 14,
+           'hvac_type': 'geothermal'}
+
+    form = client.post('/api/predict/form', json=bad, headers=headers).get_json()
+    batch = client.post('/api/predict/batch', json=[bad], headers=headers).get_json()
+    assert form['details'] == batch['errors'][0], (form['details'], batch['errors'][0])
+    assert form['details'] == ['Temperature (°C) must be between -10 and 50. Got 60.0.',
+                               'Humidity (%) must be a valid float', 'Month (1-12) must be a valid int',
+                               'Missing: HVAC Appliances count',
+                               'HVAC Type must be one of: central-ac, heat-pump, window-ac, baseboard, other']
+
+    csv = b'Temperature,Humidity,Square Footage,Month,Hour,HVAC Appliances\n60,40,3000,7,14,2\n20,40,3000,7,14,2\n'
+    response = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(csv), 'tiles.csv')})
+    body = response.get_json()
+    assert response.status_code == 200 and [p['row'] for p in body['predictions']] == [1]
+    assert body['validation']['errors'][0]['message'] == 'Temperature (°C) must be between -10 and 50'
+    print(f"✓ Form and batch return identical messages; the file endpoint scored row 1 and reported row 0")
+
+
+def benchmark(n_rows=200000):
+    """Validating an uploaded chunk column-wise vs the old per-row float()/int() conversions"""
+    columns = make_inputs(n_rows)
+    df = pd.DataFrame(columns).rename(columns={'temperature': 'Temperature', 'time': 'Hour'})
+    df.loc[::1000, 'Temperature'] = 99  # 0.1% bad rows
+
+    start = time.perf_counter()
+    result = validate_frame(df)
+    vector_s = time.perf_counter() - start
+
+    records = df.rename(columns={'Temperature': 'temperature', 'Hour': 'time'}).to_dict('records')
+    start = time.perf_counter()
+    for r in records:
+        float(r['temperature']), float(r['humidity']), float(r['square_footage'])
+        int(r['month']), int(r['time']), int(r['hvac_appliances'])
+    row_s = time.perf_counter() - start
+    print(f'  {n_rows} rows: column-wise validation {vector_s * 1000:.0f} ms '
+          f'({int((~result.valid).sum())} rejected), per-row conversion only {row_s * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('INPUT SCHEMA TESTS')
+    print('=' * 80)
+    test_header_aliases()
+    test_file_rows_rejected_individually()
+    test_missing_columns_take_defaults()
+    test_report_caps_row_lists()
+    test_endpoints_share_rules()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,169 @@
+"""
+Test script for the chatbot intent router
+Checks that the Aho-Corasick automaton finds every keyword occurrence, that the
+router makes the same routing decisions as the substring checks chatbot_message
+used before (kept below as the reference), that whole-word matching stops 'hi'
+from matching 'this', and that routed messages are counted per intent
+"""
+
+import random
+import time
+
+from intent_router import CHAT_INTENTS, IntentRouter, KeywordAutomaton
+from test_prediction_stats import login
+
+
+def reference_decisions(msg_lower):
+    """What the previous substring checks in chatbot_message decided for a message"""
+    project_keywords = ['energy', 'predict', 'consumption', 'temperature', 'humidity', 'model', 'forecast', 'usage',
+                        'kWh', 'efficiency', 'building', 'heating', 'cooling', 'report', 'upload', 'form', 'file',
+                        'data', 'hdd', 'cdd']
+    casual_greetings = ['hi', 'hello', 'hey', 'howdy', 'good morning', 'good afternoon', 'good evening', 'greetings',
+                        'what\'s up']
+    if any(greeting in msg_lower for greeting in casual_greetings):
+        return ('greeting',)
+    if any(word in msg_lower for word in ['thank', 'thanks', 'thx', 'appreciate', 'grateful']):
+        return ('gratitude',)
+    if any(farewell in msg_lower for farewell in ['bye', 'goodbye', 'see you', 'farewell', 'take care']):
+        return ('farewell',)
+    is_prediction_request = any(word in msg_lower for word in ['predict', 'forecast', 'calculate', 'estimate',
+                                                               'how much', 'consumption'])
+    parses = is_prediction_request or any(k in msg_lower for k in ['sqft', 'applicants', 'people', 'area', 'house'])
+    if not any(keyword in msg_lower for keyword in project_keywords):
+        general = next((k for k in ['what is ai', 'what is machine learning', 'how does'] if k in msg_lower), None)
+        return ('off_topic', is_prediction_request, parses, general)
+    if 'predict' in msg_lower or 'forecast' in msg_lower:
+        suggested = 'prediction'
+    elif 'upload' in msg_lower or 'file' in msg_lower or 'csv' in msg_lower:
+        suggested = 'upload'
+    elif 'temperature' in msg_lower or 'humidity' in msg_lower or 'factor' in msg_lower:
+        suggested = 'factors'
+    elif 'efficiency' in msg_lower or 'save' in msg_lower or 'reduce' in msg_lower:
+        suggested = 'efficiency'
+    elif 'model' in msg_lower or 'accuracy' in msg_lower:
+        suggested = 'model'
+    else:
+        suggested = None
+    fallback = next((k for k in ['predict', 'upload', 'accuracy', 'temperature', 'humidity', 'efficiency', 'file']
+                     if k in msg_lower), None)
+    return ('project', is_prediction_request, parses, suggested, fallback)
+
+
+def router_decisions(router, msg_lower):
+    """The same decisions, made the way chatbot_message makes them now"""
+    intents = router.match(msg_lower)
+    for route in ('greeting', 'gratitude', 'farewell'):
+        if route in intents:
+            return (route,)
+    is_prediction_request = 'prediction_request' in intents
+    parses = is_prediction_request or 'prediction_details' in intents
+    if 'project' not in intents:
+        return ('off_topic', is_prediction_request, parses, intents.first('general_question'))
+    suggested = next((topic for topic in ('prediction', 'upload', 'factors', 'efficiency', 'model')
+                      if f'topic_{topic}' in intents), None)
+    return ('project', is_prediction_request, parses, suggested, intents.first('fallback_topic'))
+
+
+WORDS = sorted({word for words in CHAT_INTENTS.values() for word in words}) + [
+    'kwh', 'this', 'ship', 'byelaw', 'the', 'my', 'how', 'what is', '2 people', 'sq', 'predic', 'is', 'thi', 'fil',
+    'energ', 'how muc', 'xyz', 'lightgbm', "what's", 'hdd/cdd', '😊', 'good']
+
+
+def generated_messages(count, seed=0):
+    rng = random.Random(seed)
+    return [''.join(word + rng.choice(['', ' ', ', ', '? ']) for word in rng.choices(WORDS, k=rng.randint(1, 6)))
+            for _ in range(count)]
+
+
+def test_automaton():
+    keywords = ['he', 'she', 'his', 'hers', 'hi', 'this', 'is', 'a', 'aa']
+    for native in (True, False):
+        automaton = KeywordAutomaton(keywords, native=native)
+        for text in ['ushers', 'this is his', 'aaa', 'xyz', '', 'shishers'] + generated_messages(2000, seed=3):
+            found = sorted((end, automaton.keywords[index]) for end, index in automaton.find(text))
+            expected = sorted((start + len(word), word) for word in keywords
+                              for start in range(len(text)) if text.startswith(word, start))
+            assert found == expected, (automaton.engine, text)
+            assert automaton.find_keywords(text) == {index for _, index in automaton.find(text)}
+    print(f'✓ The automaton finds every occurrence of every keyword, overlapping ones included '
+          f'({KeywordAutomaton(keywords).engine} and python)')
+
+
+def test_same_decisions(count=20000):
+    router = IntentRouter()
+    python_router = IntentRouter()
+    python_router._automaton = KeywordAutomaton(python_router._automaton.keywords, native=False)
+    chatbot_messages = ['hi there', 'I have a central AC with 2 units', 'thanks for the help', 'What is AI?',
+                        'Predict energy at 25 degrees', 'How do I upload a CSV file?', 'bye!', 'tell me a joke',
+                        'how much energy does a 2000 sqft house use', 'What is the model accuracy?']
+    messages = [m.lower() for m in chatbot_messages] + generated_messages(count)
+    for message in messages:
+        assert router_decisions(router, message) == reference_decisions(message), message
+        assert router_decisions(python_router, message) == reference_decisions(message), message
+    print(f'✓ {len(messages)} messages are routed as the substring checks routed them')
+
+
+def test_whole_words():
+    substring, whole = IntentRouter(), IntentRouter(whole_words=True)
+    assert 'greeting' in substring.match('is this the right form?')
+    assert 'greeting' not in whole.match('is this the right form?')
+    assert 'farewell' not in whole.match('byelaws for energy use') and 'project' in whole.match('energy use')
+    assert 'greeting' in whole.match('hi, what is the model accuracy?')
+    assert whole.match("what's up?").first('greeting') == "what's up"
+    print("✓ With whole_words, 'hi' no longer matches 'this' but still matches 'hi,'")
+
+
+def test_traffic_mix():
+    router = IntentRouter()
+    for message in ['hello', 'hi again', 'thanks', 'upload a file', 'predict 1500 sqft', 'tell me a joke']:
+        router.match(message)
+    stats = router.stats()
+    assert stats['messages'] == 6
+    assert stats['routes'] == {'greeting': 2, 'gratitude': 1, 'project': 1, 'prediction_request': 1, 'other': 1}
+    assert stats['intent_hits']['project'] == 2 and stats['intent_hits']['topic_upload'] == 1
+
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    before = client.get('/api/chatbot/intents', headers=headers).get_json()
+    response = client.post('/api/chatbot/message', headers=headers, json={'message': 'Hello there'}).get_json()
+    after = client.get('/api/chatbot/intents', headers=headers).get_json()
+    assert 'Hi there' in response['response'] or 'Hello' in response['response'] or 'Hey' in response['response'] \
+        or 'Greetings' in response['response']
+    assert after['messages'] == before['messages'] + 1
+    assert after['routes']['greeting'] == before['routes'].get('greeting', 0) + 1
+    print('✓ Messages are counted per routed intent; GET /api/chatbot/intents reports the mix')
+
+
+def benchmark(rounds=200):
+    messages = [m.lower() for m in [
+        "I want a prediction for my house. It's 5000 sqft, 4 people, 2 central AC units, temperature 22°C, "
+        "humidity 55%, in summer at 2 PM",
+        "Can you explain how the model uses temperature and humidity to estimate my building's consumption?",
+        'What file formats can I upload for a batch of readings from last year?',
+        'tell me a joke about cats', 'Hello!', 'How does the LightGBM model work?']] + generated_messages(200, seed=7)
+    router = IntentRouter()
+    python_router = IntentRouter()
+    python_router._automaton = KeywordAutomaton(python_router._automaton.keywords, native=False)
+    for label, decide in (('substring checks', reference_decisions),
+                          (f'automaton ({router._automaton.engine})', lambda m: router_decisions(router, m)),
+                          ('automaton (python)', lambda m: router_decisions(python_router, m))):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message in messages:
+                decide(message)
+        per_message = (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+        print(f'  {label}: {per_message:.1f} µs/message')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('CHATBOT INTENT ROUTER TESTS')
+    print('=' * 80)
+    test_automaton()
+    test_same_decisions()
+    test_whole_words()
+    test_traffic_mix()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,187 @@
+"""
+Test script for the chatbot's Gemini client
+Runs the client against a local fake Gemini server and checks that replies are
+parsed and connections reused, that slow calls are cut off at the timeout, that
+the circuit breaker stops calling a failing upstream (and lets a trial call
+through later), that calls over the concurrency limit are refused, and that the
+chatbot falls back to its canned answers when Gemini is unavailable
+"""
+
+import time
+
+from conftest import FakeGemini, client_for
+from llm_client import CircuitBreaker, LLMUnavailable
+from test_prediction_stats import login
+
+
+def test_reply_and_reused_connection(fake):
+    fake.mode = 'ok'
+    client = client_for(fake)
+    for n in range(5):
+        reply = client.generate(f'question {n}', system_instruction='You are a test.',
+                                generation_config={'maxOutputTokens': 50})
+        assert reply == f'Fake answer to: question {n}'
+    request = fake.requests[-1]
+    assert request['path'] == '/v1beta/models/gemini-test:generateContent' and request['key'] == 'test-key'
+    assert request['body']['systemInstruction'] == {'parts': [{'text': 'You are a test.'}]}
+    assert request['body']['generationConfig'] == {'maxOutputTokens': 50}
+    assert len(fake.connections) == 1, fake.connections
+    assert client.stats()['succeeded'] == 5
+    client.close()
+    print('✓ Replies are parsed, the system prompt goes in systemInstruction and one connection is reused')
+
+
+def test_timeout(fake):
+    fake.mode, fake.delay = 'slow', 1.5
+    client = client_for(fake, timeout=0.3)
+    start = time.perf_counter()
+    try:
+        client.generate('slow question')
+        raise AssertionError('expected a timeout')
+    except LLMUnavailable as e:
+        assert e.reason == 'timeout'
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.6, elapsed
+    assert client.stats()['timed_out'] == 1
+    client.close()
+    print(f'✓ A slow upstream is cut off at the timeout ({elapsed * 1000:.0f} ms for a 0.3 s limit)')
+
+
+def test_circuit_breaker(fake):
+    fake.mode = 'error'
+    client = client_for(fake, breaker=CircuitBreaker(failure_threshold=3, reset_seconds=0.3))
+    reasons = []
+    for _ in range(6):
+        try:
+            client.generate('question')
+        except LLMUnavailable as e:
+            reasons.append(e.reason)
+    assert reasons == ['upstream_error'] * 3 + ['circuit_open'] * 3, reasons
+    sent = len(fake.requests)
+
+    start = time.perf_counter()
+    try:
+        client.generate('question')
+    except LLMUnavailable as e:
+        assert e.reason == 'circuit_open'
+    assert time.perf_counter() - start < 0.01 and len(fake.requests) == sent  # Refused without calling upstream
+
+    time.sleep(0.35)
+    fake.mode = 'ok'
+    assert client.generate('trial').startswith('Fake answer')  # Half-open trial call succeeds and closes it
+    assert client.breaker.state == 'closed'
+    fake.mode = 'error'
+    for _ in range(3):
+        try:
+            client.generate('question')
+        except LLMUnavailable:
+            pass
+    time.sleep(0.35)
+    try:
+        client.generate('failed trial')
+    except LLMUnavailable as e:
+        assert e.reason == 'upstream_error'
+    assert client.breaker.state == 'open' and client.stats()['circuit']['times_opened'] == 3
+    client.close()
+    print('✓ The breaker opens after repeated failures, refuses calls at once, and re-tries after the reset time')
+
+
+def test_concurrency_limit(fake):
+    fake.mode, fake.delay = 'slow', 0.5
+    client = client_for(fake, max_concurrency=2)
+    in_flight = [client.submit(f'question {n}') for n in range(2)]
+    try:
+        client.submit('one too many')
+        raise AssertionError('expected the third call to be refused')
+    except LLMUnavailable as e:
+        assert e.reason == 'busy'
+    assert all(f.result(timeout=2).startswith('Fake answer') for f in in_flight)
+    time.sleep(0.05)
+    assert client.submit('after').result(timeout=2).startswith('Fake answer')  # Slots were released
+    assert client.stats()['refused_busy'] == 1
+    client.close()
+    print('✓ Calls beyond max_concurrency are refused instead of queued; slots free up when calls end')
+
+
+def test_malformed_payload(fake):
+    fake.mode = 'malformed'
+    client = client_for(fake, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    for call in (client.generate, lambda prompt: list(client.stream(prompt))):
+        try:
+            call('question')
+            raise AssertionError('expected LLMUnavailable')
+        except LLMUnavailable as e:
+            assert e.reason == 'upstream_error' and 'malformed response' in str(e), e
+    stats = client.stats()
+    assert (stats['failed'], stats['succeeded']) == (2, 0) and client.breaker.state == 'open'
+    client.close()
+    print('✓ A reply of the wrong shape is an upstream error (streamed or not) and counts toward the breaker')
+
+
+def test_chatbot_answers(fake):
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    original = app.gemini
+    try:
+        fake.mode = 'ok'
+        app.gemini = client_for(fake)
+        body = client.post('/api/chatbot/message', headers=headers,
+                           json={'message': 'What model is used for buildings?'}).get_json()
+        assert body['response'] == 'Fake answer to: What model is used for buildings?'
+        assert 'mode' not in body and fake.requests[-1]['body']['systemInstruction']
+
+        fake.mode = 'malformed'
+        body = client.post('/api/chatbot/message', headers=headers,
+                           json={'message': 'How do I upload a file?'}).get_json()
+        assert body['mode'] == 'fallback' and body['fallback_reason'] == 'upstream_error'
+
+        fake.mode = 'error'
+        app.gemini = client_for(fake, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+        for reason in ('upstream_error', 'circuit_open'):
+            body = client.post('/api/chatbot/message', headers=headers,
+                               json={'message': 'How do I upload a file?'}).get_json()
+            assert body['mode'] == 'fallback' and body['fallback_reason'] == reason
+            assert body['response'].startswith('You can upload CSV')
+
+        stats = client.get('/api/chatbot/llm', headers=headers).get_json()
+        assert stats['circuit']['state'] == 'open' and stats['refused_circuit_open'] == 1
+    finally:
+        app.gemini = original
+    print('✓ Chatbot answers from Gemini, and from the fallback answers when Gemini fails, replies with a malformed '
+          'payload or the breaker is open')
+
+
+def benchmark(fake, messages=20):
+    """Chatbot messages while the upstream hangs: every one waits for the timeout vs the breaker answering"""
+    fake.mode, fake.delay = 'slow', 5
+    for label, breaker in (('no breaker', CircuitBreaker(failure_threshold=10 ** 6)),
+                           ('breaker (3 failures)', CircuitBreaker(failure_threshold=3, reset_seconds=60))):
+        client = client_for(fake, timeout=0.2, max_concurrency=64, breaker=breaker)
+        start = time.perf_counter()
+        for _ in range(messages):
+            try:
+                client.generate('question')
+            except LLMUnavailable:
+                pass
+        print(f'  {label}: {messages} messages against a hanging upstream in {time.perf_counter() - start:.2f} s')
+        client.close()
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('GEMINI CLIENT TESTS')
+    print('=' * 80)
+    fake = FakeGemini()
+    try:
+        test_reply_and_reused_connection(fake)
+        test_timeout(fake)
+        test_circuit_breaker(fake)
+        test_concurrency_limit(fake)
+        test_malformed_payload(fake)
+        test_chatbot_answers(fake)
+        print('\nBenchmark:')
+        benchmark(fake)
+    finally:
+        fake.close()
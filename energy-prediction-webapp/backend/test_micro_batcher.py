@@ -0,0 +1,160 @@
+"""
+Test script for the micro-batcher
+Checks that concurrent single-row requests share model calls and get their own results
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from micro_batcher import MicroBatcher
+
+
+class RecordingModel:
+    """Sums each row and remembers the size of every call; each call costs `cost` seconds"""
+
+    def __init__(self, cost=0.01):
+        self.cost = cost
+        self.calls = []
+
+    def __call__(self, model, matrix):
+        self.calls.append(len(matrix))
+        time.sleep(self.cost)
+        return matrix.sum(axis=1)
+
+
+def run_concurrently(batcher, n_requests, model=None):
+    results = [None] * n_requests
+    barrier = threading.Barrier(n_requests)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.submit(model, np.array([i, 0.5]))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_requests)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_rows_share_calls():
+    predict = RecordingModel()
+    batcher = MicroBatcher(predict, window_ms=5, max_batch=16)
+    results = run_concurrently(batcher, 40)
+
+    assert results == [i + 0.5 for i in range(40)], 'a caller got someone else\'s result'
+    assert max(predict.calls) <= 16 and sum(predict.calls) == 40
+    assert len(predict.calls) < 40
+    print(f'✓ 40 concurrent requests scored in {len(predict.calls)} model calls: {predict.calls}')
+
+
+def test_lone_request_does_not_wait():
+    predict = RecordingModel(cost=0)
+    batcher = MicroBatcher(predict, window_ms=50, max_batch=16)
+    batcher.submit(None, np.array([1.0, 2.0]))  # start the worker
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert batcher.submit(None, np.array([1.0, 2.0])) == 3.0
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert elapsed_ms < 25, f'idle request waited {elapsed_ms:.1f} ms'
+    print(f'✓ Request on an idle server answered in {elapsed_ms:.2f} ms (window is 50 ms)')
+
+
+def test_errors_reach_every_caller():
+    def failing(model, matrix):
+        raise ValueError('model exploded')
+
+    batcher = MicroBatcher(failing, window_ms=5, max_batch=8)
+    try:
+        batcher.submit(None, np.array([1.0]))
+    except ValueError as e:
+        print(f'✓ Model errors are raised in the calling thread: {e}')
+    else:
+        raise AssertionError('expected ValueError')
+
+
+def test_models_are_not_mixed():
+    seen = []
+
+    def predict(model, matrix):
+        seen.append((model, len(matrix)))
+        time.sleep(0.005)
+        return matrix.sum(axis=1) * model
+
+    batcher = MicroBatcher(predict, window_ms=5, max_batch=64)
+    results = [None] * 20
+    barrier = threading.Barrier(20)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = batcher.submit(1 + i % 2, np.array([1.0]))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [1.0 + i % 2 for i in range(20)]
+    print(f'✓ Rows submitted with different models are scored separately ({len(seen)} calls)')
+
+
+def test_disabled_runs_inline():
+    predict = RecordingModel(cost=0)
+    batcher = MicroBatcher(predict, window_ms=0)
+    assert not batcher.enabled
+    assert batcher.submit(None, np.array([2.0, 2.0])) == 4.0
+    assert batcher._worker is None
+    print('✓ window_ms=0 predicts in the calling thread')
+
+
+def benchmark(n_requests=200, n_threads=16):
+    """Real model, 16 threads each predicting single rows, with and without batching"""
+    import joblib
+    from feature_engine import engineer_feature_matrix, feature_frame
+    from test_feature_engine import make_inputs
+
+    model = joblib.load('energy_model.pkl')
+    rows = engineer_feature_matrix(make_inputs(n_requests))
+
+    def predict(m, matrix):
+        return m.predict(feature_frame(matrix))
+
+    for window_ms in (0, 3):
+        batcher = MicroBatcher(predict, window_ms=window_ms, max_batch=64)
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(indexes):
+            for i in indexes:
+                start = time.perf_counter()
+                batcher.submit(model, rows[i])
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(range(t, n_requests, n_threads),)) for t in range(n_threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        print(f'  window {window_ms} ms: {n_requests / elapsed:.0f} predictions/s, '
+              f'p50 {np.percentile(latencies, 50) * 1000:.1f} ms, p95 {np.percentile(latencies, 95) * 1000:.1f} ms, '
+              f'{batcher.stats()}')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('MICRO-BATCHER TESTS')
+    print('=' * 80)
+    test_concurrent_rows_share_calls()
+    test_lone_request_does_not_wait()
+    test_errors_reach_every_caller()
+    test_models_are_not_mixed()
+    test_disabled_runs_inline()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,185 @@
+"""
+Test script for hot model reloads
+Unit-tests ModelManager, then reloads the real app in-process while requests keep flowing
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from model_manager import ModelManager, ModelValidationError, artifact_version, load_pinned
+
+
+def make_artifact(directory, name, content):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(content)
+    return path
+
+
+def test_swap_and_failed_validation():
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = {'path': make_artifact(tmp, 'model.txt', 'v1'), 'model': 'model-1'}
+        swaps = []
+
+        def validate(model):
+            if model == 'broken':
+                raise ModelValidationError('smoke prediction failed')
+
+        manager = ModelManager(lambda: (artifact['model'], artifact['path'], artifact_version(artifact['path'])),
+                               validate, swaps.append)
+        first = manager.reload(reason='startup')
+        assert first['reloaded'] and manager.current.model == 'model-1'
+
+        artifact['path'] = make_artifact(tmp, 'model2.txt', 'v2')
+        artifact['model'] = 'broken'
+        failed = manager.reload()
+        assert not failed['reloaded'] and 'smoke prediction failed' in failed['error']
+        assert manager.current.model == 'model-1' and manager.current.version == first['version']
+
+        artifact['model'] = 'model-2'
+        second = manager.reload()
+        assert second['reloaded'] and second['previous_version'] == first['version']
+        assert manager.current.version != first['version']
+        assert [s.model for s in swaps] == ['model-1', 'model-2']
+    print(f"✓ Failed validation keeps {first['version']}; valid model swapped in as {second['version']}")
+
+
+def test_version_follows_content():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_artifact(tmp, 'model.txt', 'v1')
+        v1 = artifact_version(path)
+        assert artifact_version(path) == v1
+        make_artifact(tmp, 'model.txt', 'v2')
+        assert artifact_version(path) != v1
+    print(f'✓ Version string changes with the artifact content ({v1})')
+
+
+def test_version_is_of_loaded_bytes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_artifact(tmp, 'model.txt', 'v1')
+        v1 = artifact_version(path)
+
+        def read(p):
+            with open(p) as f:
+                return f.read()
+
+        def replaced_mid_load(p):
+            content = read(p)
+            if content == 'v1':
+                make_artifact(tmp, 'model.txt', 'v2 - retrained')  # Overwritten in place after it was read
+            return content
+
+        model, version = load_pinned(path, replaced_mid_load)
+        assert model == 'v2 - retrained' and version == artifact_version(path) != v1
+
+        manager = ModelManager(lambda: (model, path, version))
+        assert manager.reload()['version'] == version
+
+        def always_changing(p):
+            make_artifact(tmp, 'model.txt', read(p) + '+')
+            return read(p)
+
+        try:
+            load_pinned(path, always_changing)
+            raise AssertionError('expected ModelValidationError')
+        except ModelValidationError as e:
+            assert 'kept changing' in str(e)
+    print('✓ An artifact replaced while loading is loaded again, so the version matches the model')
+
+
+def test_watcher_reloads_after_write_settles():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_artifact(tmp, 'model.txt', 'v1')
+        loads = []
+
+        def read(p):
+            with open(p) as f:
+                loads.append(f.read())
+            return loads[-1]
+
+        def load():
+            model, version = load_pinned(path, read)
+            return model, path, version
+
+        manager = ModelManager(load, watch_paths_fn=lambda: [path])
+        manager.reload(reason='startup')
+        manager.watch(0.05)
+        time.sleep(0.1)
+        make_artifact(tmp, 'model.txt', 'v2 - retrained')
+        deadline = time.time() + 3
+        while manager.current.model != 'v2 - retrained' and time.time() < deadline:
+            time.sleep(0.02)
+        manager.stop_watching()
+        assert manager.current.model == 'v2 - retrained', loads
+    print(f'✓ Watcher picked up the new artifact ({manager.reloads} loads)')
+
+
+def test_app_reload_under_load():
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    record = {'temperature': 25, 'humidity': 40, 'square_footage': 3000, 'month': 7, 'hvac_appliances': 2, 'time': 14}
+
+    response = client.post('/api/predict/form', json=record, headers=headers)
+    old_version = response.get_json()['model_version']
+    assert response.headers['X-Model-Version'] == old_version
+
+    assert client.post('/api/model/reload', headers=headers).status_code == 403
+    app.ADMIN_EMAILS.add('demo@example.com')
+
+    # Nightly retrain stand-in: a new copy of the model in a new location
+    tmp = tempfile.mkdtemp()
+    try:
+        shutil.copy(app.model_manager.current.source, os.path.join(tmp, 'energy_model.pkl'))
+        app.candidate_paths.insert(0, os.path.join(tmp, 'energy_model.pkl'))
+
+        failures, versions, stop = [], set(), threading.Event()
+
+        def hammer():
+            while not stop.is_set():
+                r = client.post('/api/predict/form', json=record, headers=headers)
+                if r.status_code != 200:
+                    failures.append(r.status_code)
+                else:
+                    versions.add(r.get_json()['model_version'])
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for t in threads:
+            t.start()
+        reload = client.post('/api/model/reload', headers=headers)
+        time.sleep(0.2)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        result = reload.get_json()
+        assert reload.status_code == 200 and result['reloaded'], result
+        assert result['previous_version'] == old_version and result['version'] != old_version
+        assert not failures, failures
+        response = client.post('/api/predict/form', json=record, headers=headers)
+        assert response.get_json()['model_version'] == result['version']
+        print(f"✓ Reloaded {old_version} -> {result['version']} in {result['seconds']:.2f}s "
+              f"with requests in flight (versions served: {sorted(versions)}, no failures)")
+    finally:
+        # Serve the original artifact again before its copy is deleted, so later tests score with a live model
+        app.candidate_paths.pop(0)
+        restored = client.post('/api/model/reload', headers=headers).get_json()
+        app.ADMIN_EMAILS.discard('demo@example.com')
+        shutil.rmtree(tmp, ignore_errors=True)
+        assert restored['reloaded'] and not app.model_manager.current.source.startswith(tmp), restored
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('MODEL RELOAD TESTS')
+    print('=' * 80)
+    test_swap_and_failed_validation()
+    test_version_follows_content()
+    test_version_is_of_loaded_bytes()
+    test_watcher_reloads_after_write_settles()
+    test_app_reload_under_load()
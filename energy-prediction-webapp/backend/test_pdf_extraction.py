@@ -0,0 +1,189 @@
+"""
+Test script for parallel, page-streaming PDF extraction
+Builds PDF uploads with one CSV table spread over many pages and checks that
+rows come out in order, match the old whole-document parse and start early
+"""
+
+import io
+import os
+import random
+import time
+
+import pandas as pd
+
+from file_ingest import iter_text_chunks, iter_upload_chunks
+from pdf_extract import iter_pdf_pages, page_timing_report
+
+HEADER = 'temperature,humidity,square_footage,month,hvac_appliances,time'
+
+
+def make_pdf(pages):
+    """Minimal PDF with one Helvetica text line per entry of each page's list of lines"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for lines in pages:
+        text = ''.join(f'({line}) Tj T* ' for line in lines)
+        stream = f'BT /F1 6 Tf 8 TL 20 820 Td {text}ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1'))
+    xref = out.tell()
+    out.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+    for offset in offsets:
+        out.write(f'{offset:010d} 00000 n \n'.encode())
+    out.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+    return out.getvalue()
+
+
+def make_bill(n_pages, rows_per_page=100, seed=1):
+    """A utility-bill style PDF: the header on page 1, then rows_per_page table rows per page"""
+    rng = random.Random(seed)
+    pages = []
+    for page in range(n_pages):
+        lines = [HEADER] if page == 0 else []
+        lines += [f'{rng.uniform(-10, 50):.1f},{rng.uniform(0, 100):.1f},{rng.randint(500, 50000)},'
+                  f'{rng.randint(1, 12)},{rng.randint(0, 20)},{rng.randint(0, 23)}' for _ in range(rows_per_page)]
+        pages.append(lines)
+    return make_pdf(pages)
+
+
+def old_parse(data):
+    """What predict_file did before: extract every page, join, then parse"""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return pd.read_csv(io.StringIO(''.join(page.extract_text() for page in reader.pages)))
+
+
+def test_text_chunks_match_read_csv():
+    texts = [f'{HEADER}\n1,2,3,4,5,6\n7,8,9,10,11,12\n', f'\n\n{HEADER}\n1,2,3,4,5,6\n\n7,8,9,10,11,12',
+             f'{HEADER}\r\n1,2,3,4,5,6\r\n\r\n7,8,9,10,11,12\r\n', f'{HEADER}\n1,,3,4,5,6\n,8,9,10,11,12']
+    checked = 0
+    for text in texts:
+        expected = pd.read_csv(io.StringIO(text))
+        for cut in range(1, len(text)):
+            for chunk_rows in (1, 2, 100):
+                got = pd.concat(list(iter_text_chunks([text[:cut], text[cut:]], chunk_rows)))
+                pd.testing.assert_frame_equal(got, expected, check_index_type=False)
+                checked += 1
+    try:
+        list(iter_text_chunks(['', '\n']))
+    except pd.errors.EmptyDataError:
+        pass
+    else:
+        raise AssertionError('expected EmptyDataError for an empty document')
+    print(f'✓ Streaming parser matches pd.read_csv for {checked} page splits; empty text still errors')
+
+
+def test_pdf_rows_match_old_parse():
+    data = make_bill(24)
+    expected = old_parse(data)
+    for workers in (1, 2):
+        page_seconds = []
+        chunks = list(iter_upload_chunks(io.BytesIO(data), 'pdf', 500, workers, page_seconds))
+        got = pd.concat(chunks)
+        pd.testing.assert_frame_equal(got, expected, check_index_type=False)
+        assert [len(c) for c in chunks][:-1] == [500] * (len(chunks) - 1)
+        assert len(page_seconds) == 24 and all(s > 0 for s in page_seconds)
+        report = page_timing_report(page_seconds, workers)
+        print(f"✓ {workers} worker(s): {len(got)} rows identical to the old parse, "
+              f"{report['pages']} pages timed (slowest {report['max_page_seconds'] * 1000:.1f} ms)")
+
+
+def test_rows_stream_before_last_page():
+    data = make_bill(40)
+    page_seconds = []
+    chunks = iter_upload_chunks(io.BytesIO(data), 'pdf', 100, 2, page_seconds)
+    first = next(chunks)
+    pages_at_first_chunk = len(page_seconds)
+    rest = list(chunks)
+    assert list(first.index) == list(range(100))
+    assert pages_at_first_chunk < 40 // 2, pages_at_first_chunk
+    assert sum(len(c) for c in rest) == 3900 and len(page_seconds) == 40
+    print(f'✓ First 100 rows were ready after {pages_at_first_chunk} of 40 pages')
+
+
+def test_pages_in_order():
+    import tempfile
+    pages = [[f'page {i}'] for i in range(30)]
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        tmp.write(make_pdf(pages))
+    try:
+        texts = list(iter_pdf_pages(tmp.name, workers=3))
+    finally:
+        os.remove(tmp.name)
+    assert [t.strip() for t in texts] == [f'page {i}' for i in range(30)]
+    print('✓ 30 pages extracted by 3 processes come back in page order')
+
+
+def test_api_reports_page_times():
+    import json
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    data = make_bill(20, rows_per_page=50)
+
+    # More rows than one page, so the results are kept (and cached) as a job
+    response = client.post('/api/predict/file?page_size=500', headers=headers, data={'file': (io.BytesIO(data), 'bill.pdf')})
+    body = response.get_json()
+    assert response.status_code == 200 and body['total_rows'] == 1000, body
+    assert body['pdf_extraction']['pages'] == 20 and len(body['pdf_extraction']['per_page_seconds']) == 20
+
+    # The same PDF again is answered from the result cache, with the first upload's page times
+    again = client.post('/api/predict/file?page_size=500', headers=headers,
+                        data={'file': (io.BytesIO(data), 'bill.pdf')}).get_json()
+    assert again['cache_hit'] and again['pdf_extraction'] == body['pdf_extraction']
+
+    response = client.post('/api/predict/file?stream=1', headers=headers, data={'file': (io.BytesIO(data), 'bill.pdf')})
+    summary = json.loads(response.get_data(as_text=True).strip().splitlines()[-1])
+    assert summary['type'] == 'summary' and summary['pdf_extraction']['pages'] == 20
+
+    csv = client.post('/api/predict/file', headers=headers,
+                      data={'file': (io.BytesIO(f'{HEADER}\n20,40,3000,7,2,14\n'.encode()), 'rows.csv')})
+    assert csv.get_json()['pdf_extraction'] is None
+    print(f"✓ API reports per-page extraction times ({body['pdf_extraction']['total_page_seconds']}s for 20 pages)")
+
+
+def benchmark(n_pages=120):
+    """Time to the first parsed rows and to the last, old whole-document parse vs streaming"""
+    data = make_bill(n_pages)
+    print(f'  {n_pages}-page PDF, {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPU core(s)')
+
+    start = time.perf_counter()
+    old_parse(data)
+    old_s = time.perf_counter() - start
+    print(f'  old (extract all, then parse): first rows after {old_s * 1000:.0f} ms, done {old_s * 1000:.0f} ms')
+
+    for workers in (1, 2, 4):
+        list(iter_upload_chunks(io.BytesIO(make_bill(16, 1)), 'pdf', 1000, workers))  # Start the pool
+        start = time.perf_counter()
+        chunks = iter_upload_chunks(io.BytesIO(data), 'pdf', 1000, workers)
+        next(chunks)
+        first_s = time.perf_counter() - start
+        for _ in chunks:
+            pass
+        total_s = time.perf_counter() - start
+        print(f'  streaming, {workers} worker(s): first rows after {first_s * 1000:.0f} ms, done {total_s * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('PDF EXTRACTION TESTS')
+    print('=' * 80)
+    test_text_chunks_match_read_csv()
+    test_pdf_rows_match_old_parse()
+    test_rows_stream_before_last_page()
+    test_pages_in_order()
+    test_api_reports_page_times()
+    print('\nBenchmark:')
+    benchmark()
@@ -0,0 +1,113 @@
+"""
+Test script for the prediction cache
+Covers LRU eviction, TTL expiry, model invalidation and the input keys
+"""
+
+import numpy as np
+
+from feature_engine import engineer_feature_matrix
+from prediction_cache import PredictionCache, input_keys
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_and_lru_eviction():
+    model = object()
+    cache = PredictionCache(max_entries=2, ttl_seconds=0)
+    cache.store([('a',), ('b',)], [1.0, 2.0], model)
+    assert cache.lookup([('a',)], model) == [1.0]  # 'a' is now most recent
+    cache.store([('c',)], [3.0], model)
+
+    assert cache.lookup([('a',), ('b',), ('c',)], model) == [1.0, None, 3.0]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (3, 1, 1, 2)
+    print(f"✓ LRU eviction keeps recently used entries: {stats}")
+
+
+def test_ttl_expiry():
+    model, clock = object(), FakeClock()
+    cache = PredictionCache(max_entries=10, ttl_seconds=60, clock=clock)
+    cache.store([('a',)], [1.0], model)
+    clock.now = 59
+    assert cache.lookup([('a',)], model) == [1.0]
+    clock.now = 61
+    assert cache.lookup([('a',)], model) == [None]
+    assert cache.stats()['expirations'] == 1 and cache.stats()['entries'] == 0
+    print('✓ Entries older than the TTL are misses')
+
+
+def test_new_model_invalidates():
+    old_model, new_model = object(), object()
+    cache = PredictionCache(max_entries=10, ttl_seconds=0)
+    cache.store([('a',)], [1.0], old_model)
+    assert cache.lookup([('a',)], new_model) == [None]
+    cache.store([('a',)], [5.0], new_model)
+    assert cache.lookup([('a',)], new_model) == [5.0]
+    assert cache.stats()['invalidations'] == 1
+    print('✓ Binding a different model drops old predictions')
+
+
+def test_disabled_cache():
+    cache = PredictionCache(max_entries=0)
+    cache.store([('a',)], [1.0], None)
+    assert not cache.enabled and cache.lookup([('a',)], None) == [None]
+    print('✓ max_entries=0 disables the cache')
+
+
+def test_bulk_requests_bypass():
+    cache = PredictionCache(max_entries=10, max_rows=5)
+    assert cache.accepts(1) and cache.accepts(5) and not cache.accepts(50000)
+    assert not PredictionCache(max_entries=0).accepts(1)
+    assert cache.stats()['bypassed'] == 1
+    print('✓ Requests over max_rows skip the cache')
+
+
+def test_api_bulk_file_skips_cache():
+    import io
+    import app
+    from test_prediction_stats import login, make_csv
+
+    client = app.app.test_client()
+    headers = login(client)
+    app.prediction_cache.clear()
+    record = {'temperature': 21, 'humidity': 45, 'square_footage': 2500, 'month': 3, 'hvac_appliances': 1, 'time': 9}
+    client.post('/api/predict/form', json=record, headers=headers)
+    before = app.prediction_cache.stats()
+    response = client.post('/api/predict/file', headers=headers,
+                           data={'file': (io.BytesIO(make_csv(5000)), 'bulk.csv')})
+    assert response.status_code == 200, response.get_json()
+    after = app.prediction_cache.stats()
+    assert after['bypassed'] > before['bypassed'] and after['evictions'] == before['evictions']
+    assert after['entries'] == before['entries'] == 1  # The form's entry is still there
+    print('✓ A 5000-row file is scored without touching the cache; interactive entries stay')
+
+
+def test_input_keys():
+    features = engineer_feature_matrix({
+        'temperature': [25.0, 25.0, np.nan],
+        'humidity': [40, 40, 40],
+        'month': [7.9, 7, 7],  # int() truncation makes the first two rows identical
+    })
+    keys = input_keys(features)
+    assert keys[0] == keys[1] == (25.0, 40.0, 5000.0, 7.0, 12.0, 1.0)
+    assert keys[2] is None
+    print('✓ Keys are the normalized inputs; NaN rows are not cached')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('PREDICTION CACHE TESTS')
+    print('=' * 80)
+    test_hits_and_lru_eviction()
+    test_ttl_expiry()
+    test_new_model_invalidates()
+    test_disabled_cache()
+    test_bulk_requests_bypass()
+    test_input_keys()
+    test_api_bulk_file_skips_cache()
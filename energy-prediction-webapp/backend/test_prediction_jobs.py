@@ -0,0 +1,239 @@
+"""
+Test script for background prediction jobs
+Queues generated CSV uploads, polls progress, pages through results and checks
+that interactive predictions stay fast while a job runs
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+
+from feature_engine import engineer_feature_matrix
+from model_manager import artifact_version
+from prediction_jobs import INPUT_FIELDS, PredictionJobQueue, count_data_lines, pin_model
+from test_feature_engine import make_inputs
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energy_model.pkl')
+MODEL_VERSION = artifact_version(MODEL_PATH)
+
+
+def make_csv(n_rows, seed=7):
+    return pd.DataFrame(make_inputs(n_rows, seed)).to_csv(index=False).encode('utf-8')
+
+
+def upload(data, filename='nightly.csv'):
+    return FileStorage(stream=io.BytesIO(data), filename=filename)
+
+
+def wait_for(queue, job_id, owner, timeout=300):
+    """Poll until the job finishes; returns (final job, rows_done values seen while running)"""
+    seen = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id, owner)
+        if job['state'] == 'running':
+            seen.append(job['rows_done'])
+        if job['state'] in ('done', 'failed'):
+            return job, seen
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish: {job}')
+
+
+def test_job_scores_file_in_pages():
+    n_rows = 30000
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PredictionJobQueue(tmp, workers=1, chunk_rows=5000)
+        try:
+            job = queue.submit(upload(make_csv(n_rows)), 'nightly.csv', 'csv', 'demo@example.com', MODEL_PATH, MODEL_VERSION)
+            assert job['state'] == 'queued'
+            job, seen = wait_for(queue, job['job_id'], 'demo@example.com')
+            assert job['state'] == 'done', job['error']
+            assert job['rows_done'] == job['total_rows'] == n_rows
+            assert seen == sorted(seen) and len(set(seen)) > 1, f'no progress reported while running: {seen}'
+
+            rows, predictions = [], []
+            page = 1
+            while True:
+                result = queue.results(job, page=page, page_size=7000)
+                if not result['predictions']:
+                    break
+                rows += [p['row'] for p in result['predictions']]
+                predictions += [p['prediction'] for p in result['predictions']]
+                page += 1
+            assert result['total_pages'] == 5 and rows == list(range(n_rows))
+
+            expected = np.abs(joblib.load(MODEL_PATH).predict(engineer_feature_matrix(make_inputs(n_rows), as_frame=True)))
+            assert np.allclose(predictions, expected)
+
+            # The scored inputs are kept for exports, in INPUT_FIELDS order
+            inputs = np.concatenate([block[1] for block in queue.iter_result_blocks(job, 8000)])
+            assert np.allclose(inputs, np.column_stack([make_inputs(n_rows)[f] for f in INPUT_FIELDS]))
+        finally:
+            queue.shutdown()
+    print(f'✓ {n_rows}-row job scored in the background, progress {sorted(set(seen))}, '
+          f'{page - 1} result pages match the model')
+
+
+def test_failed_job_and_isolation():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PredictionJobQueue(tmp, workers=1)
+        try:
+            job = queue.submit(upload(b'not a pdf', 'bill.pdf'), 'bill.pdf', 'pdf', 'demo@example.com', MODEL_PATH, MODEL_VERSION)
+            job, _ = wait_for(queue, job['job_id'], 'demo@example.com')
+            assert job['state'] == 'failed' and job['error'].startswith('Error processing file'), job
+            assert queue.get(job['job_id'], 'test@example.com') is None
+            assert queue.get('../../etc', 'demo@example.com') is None
+
+            # A bad cell only rejects its own row
+            bad = b'temperature,month\n20,\n21,3\n'  # Blank integer field
+            partial = queue.submit(upload(bad), 'bad.csv', 'csv', 'demo@example.com', MODEL_PATH, MODEL_VERSION)
+            partial, _ = wait_for(queue, partial['job_id'], 'demo@example.com')
+            assert partial['state'] == 'done' and partial['validation']['invalid_rows'] == 1, partial
+            assert queue.results(partial)['predictions'][0]['row'] == 1
+        finally:
+            queue.shutdown()
+    print(f"✓ Unreadable upload marks the job failed ({job['error']}); a bad cell only rejects its row; "
+          f"other users cannot see jobs")
+
+
+def test_job_keeps_its_model():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'energy_model.pkl')
+        shutil.copy2(MODEL_PATH, source)
+        pinned_dir = os.path.join(tmp, 'pinned')
+        os.makedirs(pinned_dir)
+        pinned = os.path.join(pinned_dir, pin_model(source, pinned_dir))
+
+        # A retrain replaces the artifact: the pinned one is still the submitted version
+        with open(source + '.new', 'wb') as f:
+            f.write(b'retrained')
+        os.replace(source + '.new', source)
+        assert artifact_version(pinned) == MODEL_VERSION != artifact_version(source)
+
+        queue = PredictionJobQueue(os.path.join(tmp, 'jobs'), workers=1)
+        try:
+            # An artifact that no longer matches the version the job reports fails the job instead of scoring
+            job = queue.submit(upload(make_csv(100)), 'stale.csv', 'csv', 'demo@example.com', MODEL_PATH, 'v-stale')
+            job, _ = wait_for(queue, job['job_id'], 'demo@example.com')
+            assert job['state'] == 'failed' and 'model artifact changed' in job['error'], job
+        finally:
+            queue.shutdown()
+    print(f"✓ Jobs score with the artifact pinned at submit time; a version mismatch fails the job ({job['error']})")
+
+
+def test_expired_jobs_removed_periodically():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = PredictionJobQueue(tmp, retention_seconds=-1, cleanup_interval_seconds=60)  # Every finished job is expired
+
+        def store(name):
+            return queue.store_results(name, 'csv', 'demo@example.com', MODEL_PATH, MODEL_VERSION,
+                                       [np.arange(3)], [np.ones(3)], 3)['job_id']
+
+        first = store('first.csv')  # Runs the first cleanup
+        second = store('second.csv')
+        assert sorted(os.listdir(tmp)) == sorted([first, second])  # No scan within the interval
+        queue._last_cleanup -= 60
+        third = store('third.csv')
+        assert os.listdir(tmp) == [third]
+    print('✓ Expired jobs are removed by at most one scan per cleanup interval, not on every new job')
+
+
+def test_count_data_lines():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rows.csv')
+        for content, expected in ((b'a,b\n1,2\n3,4\n', 2), (b'a,b\n1,2\n3,4', 2), (b'a,b\n', 0)):
+            with open(path, 'wb') as f:
+                f.write(content)
+            assert count_data_lines(path) == expected, content
+    print('✓ Row totals are counted with and without a trailing newline')
+
+
+def test_api_job_flow():
+    import app
+
+    client = app.app.test_client()
+
+    def login(email, password):
+        token = client.post('/api/auth/login', json={'email': email, 'password': password}).get_json()['access_token']
+        return {'Authorization': f'Bearer {token}'}
+
+    headers = login('demo@example.com', 'password123')
+    response = client.post('/api/predict/file?async=1', headers=headers,
+                           data={'file': (io.BytesIO(make_csv(2500)), 'tiles.csv')})
+    assert response.status_code == 202, response.get_json()
+    job = response.get_json()
+    assert job['status_url'].endswith(job['job_id'])
+
+    deadline = time.time() + 300
+    while job['state'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.1)
+        job = client.get(job['status_url'], headers=headers).get_json()
+    assert job['state'] == 'done' and job['progress'] == 1.0, job
+
+    page = client.get(job['results_url'] + '?page=3&page_size=1000', headers=headers).get_json()
+    assert page['total_pages'] == 3 and len(page['predictions']) == 500 and page['predictions'][0]['row'] == 2000
+    assert client.get(job['status_url'], headers=login('test@example.com', 'test123')).status_code == 404
+    assert client.get(job['results_url'] + '?page=x', headers=headers).status_code == 400
+    app.prediction_jobs.shutdown()
+    print(f"✓ API: 202 with job id, progress {job['progress']}, page 3 holds rows 2000-2499, "
+          f"other users get 404")
+
+
+def benchmark(n_rows=200000):
+    """Form prediction latency on an idle server vs while a large job is scored"""
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    app.prediction_cache.clear()
+
+    def form_latencies(offset, count=40):
+        latencies = []
+        for i in range(count):
+            record = {'temperature': 10 + offset + i * 0.37, 'humidity': 40, 'square_footage': 3000, 'month': 7,
+                      'hvac_appliances': 2, 'time': 14}  # New inputs each time, so the cache cannot help
+            start = time.perf_counter()
+            assert client.post('/api/predict/form', json=record, headers=headers).status_code == 200
+            latencies.append((time.perf_counter() - start) * 1000)
+        return np.array(latencies)
+
+    idle = form_latencies(0)
+    data = make_csv(n_rows)
+    start = time.perf_counter()
+    job = client.post('/api/predict/jobs', headers=headers,
+                      data={'file': (io.BytesIO(data), 'nightly.csv')}).get_json()
+    submit_ms = (time.perf_counter() - start) * 1000
+    while client.get(job['status_url'], headers=headers).get_json()['state'] != 'running':
+        time.sleep(0.05)
+    busy = form_latencies(0.1)
+    while job['state'] not in ('done', 'failed'):
+        time.sleep(0.2)
+        job = client.get(job['status_url'], headers=headers).get_json()
+    app.prediction_jobs.shutdown()
+    print(f'  {n_rows}-row upload accepted in {submit_ms:.0f} ms, scored in '
+          f"{job['finished_at'] - job['started_at']:.1f}s by the job process")
+    print(f'  form p50/p95: idle {np.percentile(idle, 50):.1f}/{np.percentile(idle, 95):.1f} ms, '
+          f'during the job {np.percentile(busy, 50):.1f}/{np.percentile(busy, 95):.1f} ms')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('PREDICTION JOB TESTS')
+    print('=' * 80)
+    test_job_scores_file_in_pages()
+    test_failed_job_and_isolation()
+    test_job_keeps_its_model()
+    test_expired_jobs_removed_periodically()
+    test_count_data_lines()
+    test_api_job_flow()
+    print('\nBenchmark:')
+    benchmark()
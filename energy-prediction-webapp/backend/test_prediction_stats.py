@@ -0,0 +1,153 @@
+"""
+Test script for server-side statistics of file predictions
+Checks the chunked aggregates against pandas and that /api/predict/file returns
+statistics plus one page of rows, with the rest paged from results_url (uploads that
+fit in one page come back whole, without a job)
+"""
+
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from prediction_stats import PredictionStatistics
+from test_feature_engine import make_inputs
+
+
+def test_matches_pandas(n_rows=50000, chunk_rows=7000):
+    columns = make_inputs(n_rows)
+    rng = np.random.default_rng(3)
+    predictions = rng.gamma(4, 100, n_rows)
+    rows = np.arange(n_rows) * 2  # Pretend every other file row failed validation
+
+    statistics = PredictionStatistics()
+    for start in range(0, n_rows, chunk_rows):
+        part = slice(start, start + chunk_rows)
+        statistics.add(rows[part], predictions[part], {f: v[part] for f, v in columns.items()})
+    summary = json.loads(json.dumps(statistics.to_dict()))  # Must be JSON-serialisable
+
+    df = pd.DataFrame({'row': rows, 'prediction': predictions, 'month': columns['month'], 'hour': columns['time']})
+    assert summary['count'] == n_rows
+    assert abs(summary['total_kwh'] - df.prediction.sum()) < 0.01
+    assert abs(summary['percentiles']['p95'] - df.prediction.quantile(0.95)) < 0.001
+    assert sum(summary['histogram']['counts']) == n_rows and len(summary['histogram']['edges']) == 21
+    by_month = df.groupby('month').prediction.sum()
+    assert all(abs(m['total_kwh'] - by_month[m['month']]) < 0.01 for m in summary['by_month'])
+    by_hour = df.groupby('hour').prediction.agg(['count', 'mean'])
+    assert all(h['rows'] == by_hour['count'][h['hour']] and abs(h['average_kwh'] - by_hour['mean'][h['hour']]) < 0.001
+               for h in summary['by_hour'])
+    top = df.nlargest(10, 'prediction')
+    assert [p['row'] for p in summary['peak_rows']] == top.row.tolist()
+    assert summary['peak_rows'][0]['month'] == top.month.iloc[0]
+    assert PredictionStatistics().to_dict() == {'count': 0}
+    print(f'✓ {n_rows} rows in {chunk_rows}-row chunks: totals, percentiles, month/hour totals and peaks match pandas')
+
+
+def login(client):
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def make_csv(n_rows):
+    columns = make_inputs(n_rows)
+    return pd.DataFrame(columns).to_csv(index=False).encode()
+
+
+def test_api_pages_and_statistics():
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    response = client.post('/api/predict/file?page_size=400', headers=headers,
+                           data={'file': (io.BytesIO(make_csv(1000)), 'meters.csv')})
+    body = response.get_json()
+    assert response.status_code == 200, body
+    assert body['total_rows'] == 1000 and len(body['predictions']) == 400 and body['total_pages'] == 3
+    assert body['statistics']['count'] == 1000
+    assert abs(body['statistics']['mean_kwh'] - body['average_prediction']) < 0.001
+
+    pages = [body['predictions']]
+    for page in (2, 3):
+        result = client.get(f"{body['results_url']}?page={page}&page_size=400", headers=headers).get_json()
+        pages.append(result['predictions'])
+    predictions = [p['prediction'] for page in pages for p in page]
+    assert [p['row'] for page in pages for p in page] == list(range(1000))
+    assert abs(sum(predictions) - body['statistics']['total_kwh']) < 0.01
+    assert max(predictions) == body['statistics']['peak_rows'][0]['prediction']
+
+    status = client.get(f"/api/predict/jobs/{body['job_id']}", headers=headers).get_json()
+    assert status['state'] == 'done' and status['statistics'] == body['statistics']
+    other = client.post('/api/auth/login', json={'email': 'test@example.com', 'password': 'test123'}).get_json()
+    forbidden = client.get(body['results_url'], headers={'Authorization': f"Bearer {other['access_token']}"})
+    assert forbidden.status_code == 404
+
+    bad = client.post('/api/predict/file?page_size=ten', headers=headers,
+                      data={'file': (io.BytesIO(make_csv(10)), 'meters.csv')})
+    assert bad.status_code == 400
+    print('✓ API: statistics plus a 400-row first page; pages 2-3 from results_url add up to the totals')
+
+
+def test_api_small_upload_inline():
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    data = make_csv(300)
+    jobs_before = set(os.listdir(app.prediction_jobs.folder))
+    start = time.perf_counter()
+    body = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(data), 'meters.csv')}).get_json()
+    inline_ms = (time.perf_counter() - start) * 1000
+    assert body['total_rows'] == 300 and body['total_pages'] == 1 and len(body['predictions']) == 300
+    assert body['job_id'] is None and body['results_url'] is None and body['export_url'] is None
+    assert set(os.listdir(app.prediction_jobs.folder)) == jobs_before  # Nothing kept on disk
+
+    # Same rows, statistics and validation as when the upload is kept as a job and paged
+    start = time.perf_counter()
+    paged = client.post('/api/predict/file?page_size=100', headers=headers,
+                        data={'file': (io.BytesIO(data), 'meters.csv')}).get_json()
+    stored_ms = (time.perf_counter() - start) * 1000
+    assert paged['job_id'] is not None and paged['total_pages'] == 3
+    assert fetch_all(client, headers, paged) == body['predictions']
+    for key in ('total_rows', 'average_prediction', 'statistics', 'validation', 'deduplication'):
+        assert paged[key] == body[key], key
+    print(f'✓ API: a 300-row upload comes back whole without a job ({inline_ms:.0f} ms; '
+          f'{stored_ms:.0f} ms when kept as a job)')
+
+
+def benchmark(n_rows=100000):
+    """Response size and time for a 100k-row file: first page + statistics vs every row in the body"""
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    data = make_csv(n_rows)
+    start = time.perf_counter()
+    response = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(data), 'campus.csv')})
+    seconds = time.perf_counter() - start
+    body = response.get_json()
+    all_rows = fetch_all(client, headers, body)
+    old_body = json.dumps({**body, 'predictions': all_rows, 'statistics': None})
+    print(f'  {n_rows} rows scored in {seconds:.2f}s: response {len(response.data) / 1e6:.2f} MB '
+          f'(statistics + {len(body["predictions"])} rows) vs {len(old_body) / 1e6:.1f} MB with every row')
+
+
+def fetch_all(client, headers, body):
+    rows = []
+    for page in range(1, -(-body['total_rows'] // 10000) + 1):
+        rows += client.get(f"{body['results_url']}?page={page}&page_size=10000", headers=headers).get_json()['predictions']
+    assert len(rows) == body['total_rows']
+    return rows
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('PREDICTION STATISTICS TESTS')
+    print('=' * 80)
+    test_matches_pandas()
+    test_api_pages_and_statistics()
+    test_api_small_upload_inline()
+    print('\nBenchmark:')
+    benchmark()
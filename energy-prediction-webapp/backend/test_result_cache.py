@@ -0,0 +1,178 @@
+"""
+Test script for the re-uploaded file result cache
+Checks that uploads are hashed while they are received, that results are found
+again by (content hash, file type, model version), that the cache stays under
+its size limit by dropping the least recently used entries, and that a repeat
+upload is answered from the cache
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+from werkzeug.datastructures import FileStorage
+
+from prediction_jobs import PredictionJobQueue
+from result_cache import ResultCache, result_cache_key
+from test_feature_engine import make_inputs
+from test_prediction_jobs import MODEL_PATH, MODEL_VERSION, upload, wait_for
+from test_prediction_stats import login
+from upload_spool import HashingStream, SpoolingRequest, upload_digest
+
+
+def unique_csv(n_rows):
+    """A CSV no earlier run has uploaded, so the first upload is a cache miss"""
+    return pd.DataFrame(make_inputs(n_rows, seed=time.time_ns() % 2**32)).to_csv(index=False).encode()
+
+
+def test_hashed_while_received():
+    with tempfile.TemporaryDirectory() as spool:
+        mini = Flask('hash-test')
+
+        class Request(SpoolingRequest):
+            spool_folder = spool
+
+        mini.request_class = Request
+
+        @mini.route('/upload', methods=['POST'])
+        def upload():
+            file = request.files['file']
+            hashed = isinstance(file.stream, HashingStream)
+            return jsonify({'digest': upload_digest(file), 'hashed': hashed, 'bytes': len(file.read())})
+
+        client = mini.test_client()
+        for data in (os.urandom(2 * 1024 * 1024), b'tiny'):  # Spooled to disk / kept in memory
+            body = client.post('/upload', data={'file': (io.BytesIO(data), 'meters.csv')}).get_json()
+            assert body['hashed'] and body['bytes'] == len(data)
+            assert body['digest'] == hashlib.sha256(data).hexdigest()
+
+    # Files that did not come through SpoolingRequest are hashed on demand, leaving the position alone
+    plain = FileStorage(stream=io.BytesIO(b'abc,def\n1,2\n'), filename='plain.csv')
+    plain.stream.seek(4)
+    assert upload_digest(plain) == hashlib.sha256(b'abc,def\n1,2\n').hexdigest() and plain.stream.tell() == 4
+    print('✓ Spooled and in-memory uploads are hashed as they are received; other files on demand')
+
+
+def result_dir(parent, name, n_rows):
+    directory = os.path.join(parent, name)
+    os.makedirs(directory)
+    np.save(os.path.join(directory, 'rows.npy'), np.arange(n_rows))
+    np.save(os.path.join(directory, 'predictions.npy'), np.full(n_rows, 1.5))
+    return directory
+
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, 'cache'), max_bytes=30000)
+        for name in ('a', 'b', 'c'):
+            cache.put(name, result_dir(tmp, name, 1000), {'total_rows': 1000})  # ~16 KB each
+            time.sleep(0.01)
+        assert cache.get('a') is None and cache.get('b') is None and cache.get('c')['total_rows'] == 1000
+        assert cache.stats()['evictions'] == 2
+
+        cache.put('d', result_dir(tmp, 'd', 100), {'total_rows': 100})
+        time.sleep(0.01)
+        cache.get('d')  # 'c' is now the least recently used
+        cache.put('e', result_dir(tmp, 'e', 800), {'total_rows': 800})
+        assert cache.get('c') is None and cache.get('d') and cache.get('e')
+
+        target = os.path.join(tmp, 'job')
+        os.makedirs(target)
+        assert cache.link_results('e', target)
+        assert os.path.samefile(os.path.join(target, 'rows.npy'), os.path.join(tmp, 'cache', 'e', 'rows.npy'))
+        assert not cache.link_results('a', target)
+
+        disabled = ResultCache(os.path.join(tmp, 'off'), max_bytes=0)
+        disabled.put('x', os.path.join(tmp, 'e'), {})
+        assert not disabled.enabled and disabled.get('x') is None
+    assert result_cache_key('h', 'csv', 'v1') != result_cache_key('h', 'csv', 'v2')
+    assert result_cache_key('h', 'csv', 'v1') != result_cache_key('h', 'csv.gz', 'v1')
+    print('✓ Least recently used entries are evicted past the size limit; results are linked, not copied')
+
+
+def test_background_job_cached():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, 'cache'))
+        queue = PredictionJobQueue(os.path.join(tmp, 'jobs'), workers=1, result_cache=cache)
+        try:
+            data = unique_csv(2000)
+            key = result_cache_key(hashlib.sha256(data).hexdigest(), 'csv', MODEL_VERSION)
+            job = queue.submit(upload(data), 'nightly.csv', 'csv', 'demo@example.com', MODEL_PATH, MODEL_VERSION,
+                               cache_key=key)
+            job, _ = wait_for(queue, job['job_id'], 'demo@example.com')
+            assert job['state'] == 'done', job['error']
+            for _ in range(100):  # Stored by the pool's completion callback, just after job.json says done
+                if cache.get(key):
+                    break
+                time.sleep(0.05)
+            hit = queue.cached_job(key, 'again.csv', 'csv', 'analyst@example.com', MODEL_PATH, MODEL_VERSION)
+            assert hit['cache_hit'] and hit['owner'] == 'analyst@example.com'
+            assert hit['statistics'] == job['statistics'] and hit['total_rows'] == 2000
+            assert queue.results(hit, 1, 5000)['predictions'] == queue.results(job, 1, 5000)['predictions']
+            other_model = result_cache_key(hashlib.sha256(data).hexdigest(), 'csv', 'v-other')
+            assert queue.cached_job(other_model, 'again.csv', 'csv', 'demo@example.com', MODEL_PATH, 'v-other') is None
+        finally:
+            queue.shutdown()
+    print('✓ Background job results are cached when the job finishes and reused for another user')
+
+
+def test_api_repeat_upload():
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    data = unique_csv(3000)
+    first = client.post('/api/predict/file?page_size=500', headers=headers,
+                        data={'file': (io.BytesIO(data), 'meters.csv')}).get_json()
+    second = client.post('/api/predict/file?page_size=500', headers=headers,
+                         data={'file': (io.BytesIO(data), 'meters-again.csv')}).get_json()
+    assert first['cache_hit'] is False and second['cache_hit'] is True
+    assert second['filename'] == 'meters-again.csv' and second['job_id'] != first['job_id']
+    for key in ('total_rows', 'predictions', 'statistics', 'validation', 'deduplication', 'model_version'):
+        assert second[key] == first[key], key
+    page = client.get(f"{second['results_url']}?page=6&page_size=500", headers=headers).get_json()
+    assert page['predictions'][-1]['row'] == 2999
+    assert client.get(second['export_url'], headers=headers).status_code == 200
+
+    queued = client.post('/api/predict/jobs', headers=headers, data={'file': (io.BytesIO(data), 'nightly.csv')})
+    job = queued.get_json()
+    assert queued.status_code == 202 and job['state'] == 'done' and job['cache_hit'], job
+
+    edited = data + data.splitlines(keepends=True)[1]  # One more row
+    third = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(edited), 'meters.csv')}).get_json()
+    assert third['cache_hit'] is False and third['total_rows'] == 3001
+    stats = client.get('/api/predict/result-cache', headers=headers).get_json()
+    assert stats['hits'] >= 2 and stats['stores'] >= 2
+    print('✓ API: a repeat upload (sync or as a job) is served from the cache; a changed file is scored again')
+
+
+def benchmark(n_rows=200000):
+    """First upload of a file vs the same file uploaded again"""
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    data = unique_csv(n_rows)
+    for label in ('first upload', 'repeat upload'):
+        start = time.perf_counter()
+        body = client.post('/api/predict/file', headers=headers,
+                           data={'file': (io.BytesIO(data), 'campus.csv')}).get_json()
+        print(f'  {label} of {n_rows} rows ({len(data) / 1e6:.1f} MB): {(time.perf_counter() - start) * 1000:.0f} ms '
+              f'(cache_hit={body["cache_hit"]})')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('RESULT CACHE TESTS')
+    print('=' * 80)
+    test_hashed_while_received()
+    test_lru_eviction()
+    test_background_job_cached()
+    test_api_repeat_upload()
+    print('\nBenchmark:')
+    benchmark()
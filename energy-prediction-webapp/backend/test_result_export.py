@@ -0,0 +1,198 @@
+"""
+Test script for CSV/Parquet exports of file prediction results
+Checks that exports hold the scored rows' inputs, predictions and model version,
+match the paged results, and are generated block by block in flat memory
+"""
+
+import io
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from prediction_jobs import INPUT_FIELDS, PredictionJobQueue
+from result_export import export_filename, iter_csv_export, iter_parquet_export
+from test_feature_engine import make_inputs
+from test_prediction_stats import login, make_csv
+
+
+def stored_job(queue, n_rows, chunk_rows=20000, version='v-test'):
+    """A finished job holding n_rows synthetic results, stored chunk by chunk"""
+    columns = make_inputs(n_rows)
+    rows, predictions, inputs = [], [], []
+    for start in range(0, n_rows, chunk_rows):
+        part = slice(start, start + chunk_rows)
+        chunk = {f: v[part].astype(np.float64) for f, v in columns.items()}
+        rows.append(np.arange(start, min(start + chunk_rows, n_rows)))
+        predictions.append(250 + chunk['temperature'] * 2 + chunk['square_footage'] / 50)
+        inputs.append(chunk)
+    job = queue.store_results('meters.csv.gz', 'csv.gz', 'demo@example.com', None, version,
+                              rows, predictions, n_rows, inputs)
+    return job, columns
+
+
+def test_formats_round_trip(n_rows=30000):
+    with tempfile.TemporaryDirectory() as folder:
+        queue = PredictionJobQueue(folder)
+        job, columns = stored_job(queue, n_rows)
+
+        csv_data = b''.join(iter_csv_export(queue.iter_result_blocks(job, 7000), INPUT_FIELDS, 'v-test'))
+        df = pd.read_csv(io.BytesIO(csv_data), float_precision='round_trip')
+        assert list(df.columns) == ['row', *INPUT_FIELDS, 'prediction_kwh', 'model_version']
+        assert len(df) == n_rows and (df.row.to_numpy() == np.arange(n_rows)).all()
+        for field in INPUT_FIELDS:
+            assert np.array_equal(df[field].to_numpy(), columns[field]), field
+        assert df.month.dtype == np.int64 and (df.model_version == 'v-test').all()
+
+        import pyarrow.parquet as pq
+        data = b''.join(iter_parquet_export(queue.iter_result_blocks(job, 7000), INPUT_FIELDS, 'v-test'))
+        parquet_file = pq.ParquetFile(io.BytesIO(data))
+        assert parquet_file.metadata.num_row_groups == 5  # One per block
+        table = parquet_file.read().to_pandas()
+        assert table.equals(df), 'Parquet and CSV exports differ'
+
+        # Jobs stored before inputs were kept export row, prediction and version only
+        empty = queue.store_results('old.csv', 'csv', 'demo@example.com', None, 'v0', [], [], 0)
+        assert not queue.has_inputs(empty)
+        old_csv = b''.join(iter_csv_export(queue.iter_result_blocks(empty), INPUT_FIELDS, 'v0', False))
+        assert list(pd.read_csv(io.BytesIO(old_csv)).columns) == ['row', 'prediction_kwh', 'model_version']
+        assert pq.read_table(io.BytesIO(b''.join(iter_parquet_export(
+            queue.iter_result_blocks(empty), INPUT_FIELDS, 'v0', False)))).num_rows == 0
+    assert export_filename('meters.csv.gz', 'csv.gz', 'parquet') == 'meters-predictions.parquet'
+    print(f'✓ {n_rows} rows: CSV and Parquet exports hold every row, input, prediction and the model version')
+
+
+def test_rejected_rows_exported():
+    with tempfile.TemporaryDirectory() as folder:
+        queue = PredictionJobQueue(folder)
+        columns = {f: np.array(v[:4], dtype=np.float64) for f, v in make_inputs(100).items()}
+        reasons = ['temperature must be a number', 'month must be between 1 and 12; time must be between 0 and 23']
+        rejected = (np.array([2, 4]), np.array([0, 1], dtype=np.int32), reasons)
+        job = queue.store_results('meters.csv', 'csv', 'demo@example.com', None, 'v-test',
+                                  [np.array([0, 1, 3, 5])], [np.arange(4) + 100.0], 6, [columns], rejected=rejected)
+        assert queue.has_rejected(job)
+        blocks = list(queue.iter_result_blocks(job, block_rows=3))
+        assert [block[0].tolist() for block in blocks] == [[0, 1, 2], [3, 4, 5]]
+
+        csv_data = b''.join(iter_csv_export(iter(blocks), INPUT_FIELDS, 'v-test', True, True))
+        df = pd.read_csv(io.BytesIO(csv_data))
+        assert list(df.columns) == ['row', *INPUT_FIELDS, 'prediction_kwh', 'model_version', 'rejected_reason']
+        assert df.row.tolist() == list(range(6))
+        assert df.prediction_kwh.isna().tolist() == [False, False, True, False, True, False]
+        assert df.rejected_reason.fillna('').tolist() == ['', '', reasons[0], '', reasons[1], '']
+        assert df.month.isna().tolist() == df.prediction_kwh.isna().tolist()
+        assert np.array_equal(df.month.dropna(), columns['month'])
+
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(b''.join(iter_parquet_export(
+            queue.iter_result_blocks(job, 3), INPUT_FIELDS, 'v-test', True, True))))
+        assert str(table.schema.field('month').type) == 'int64' and table.column('month').null_count == 2
+        assert table.column('rejected_reason').to_pylist() == ['', '', reasons[0], '', reasons[1], '']
+    print('✓ Rows that failed validation are exported in file order with an empty prediction and the reason')
+
+
+def export_peak(queue, job, export):
+    """(bytes written, peak bytes allocated) for one export of job"""
+    tracemalloc.start()
+    size = 0
+    for piece in export(queue.iter_result_blocks(job), INPUT_FIELDS, 'v-test'):
+        size += len(piece)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, peak
+
+
+def test_constant_memory(small_rows=200000, large_rows=800000):
+    with tempfile.TemporaryDirectory() as folder:
+        queue = PredictionJobQueue(folder)
+        small, _ = stored_job(queue, small_rows, chunk_rows=100000)
+        large, _ = stored_job(queue, large_rows, chunk_rows=100000)
+        for name, export in (('CSV', iter_csv_export), ('Parquet', iter_parquet_export)):
+            small_size, small_peak = export_peak(queue, small, export)
+            large_size, large_peak = export_peak(queue, large, export)
+            # Four times the rows, same memory: only one block is ever held
+            assert large_peak < small_peak * 1.5, f'{name}: peak {small_peak / 1e6:.1f} -> {large_peak / 1e6:.1f} MB'
+            assert large_peak < large_size / 2
+            print(f'✓ {name} export: {small_rows} rows ({small_size / 1e6:.1f} MB) peak {small_peak / 1e6:.1f} MB, '
+                  f'{large_rows} rows ({large_size / 1e6:.1f} MB) peak {large_peak / 1e6:.1f} MB')
+
+
+def test_api_export():
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    data = make_csv(3000)
+    body = client.post('/api/predict/file?page_size=1000', headers=headers,
+                       data={'file': (io.BytesIO(data), 'meters.csv')}).get_json()
+    assert body['export_url'] == f"/api/predict/jobs/{body['job_id']}/export"
+
+    response = client.get(body['export_url'], headers=headers)
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert 'meters-predictions.csv' in response.headers['Content-Disposition']
+    exported = pd.read_csv(io.BytesIO(response.data), float_precision='round_trip')
+    uploaded = pd.read_csv(io.BytesIO(data))
+    assert len(exported) == body['total_rows'] == 3000
+    first_page = exported[:len(body['predictions'])]
+    assert first_page.row.tolist() == [p['row'] for p in body['predictions']]
+    assert np.allclose(first_page.prediction_kwh, [p['prediction'] for p in body['predictions']])
+    assert (exported.model_version == body['model_version']).all()
+    for field in INPUT_FIELDS:
+        assert np.allclose(exported[field], uploaded[field].to_numpy()[exported.row]), field
+
+    parquet = client.get(f"{body['export_url']}?format=parquet", headers=headers)
+    assert parquet.status_code == 200 and parquet.mimetype == 'application/vnd.apache.parquet'
+    assert pd.read_parquet(io.BytesIO(parquet.data)).equals(exported)
+
+    assert client.get(f"{body['export_url']}?format=xlsx", headers=headers).status_code == 400
+    assert client.get('/api/predict/jobs/0123abcd/export', headers=headers).status_code == 404
+    status = client.get(f"/api/predict/jobs/{body['job_id']}", headers=headers).get_json()
+    assert status['export_url'] == body['export_url']
+
+    # A bad row is exported with its reason; the extra 'site' column is not carried through
+    bad = b'temperature,humidity,square_footage,month,time,hvac_appliances,site\n20,40,3000,7,14,2,a\n' \
+          b'20,140,3000,7,14,2,b\n21,40,3000,7,14,2,c\n'
+    body = client.post('/api/predict/file?page_size=1', headers=headers,
+                       data={'file': (io.BytesIO(bad), 'bad.csv')}).get_json()
+    exported = pd.read_csv(io.BytesIO(client.get(body['export_url'], headers=headers).data))
+    assert exported.row.tolist() == [0, 1, 2] and 'site' not in exported.columns
+    assert np.isnan(exported.prediction_kwh[1]) and 'Humidity' in exported.rejected_reason[1]
+    print('✓ API: CSV and Parquet downloads match the paged results and the uploaded inputs')
+
+
+def benchmark(n_rows=500000):
+    """Time and size to download every row: CSV/Parquet export vs paging the JSON results"""
+    import app
+
+    client = app.app.test_client()
+    headers = login(client)
+    body = client.post('/api/predict/file', headers=headers,
+                       data={'file': (io.BytesIO(make_csv(n_rows)), 'campus.csv')}).get_json()
+    start = time.perf_counter()
+    pages = 0
+    json_bytes = 0
+    for page in range(1, -(-body['total_rows'] // 10000) + 1):
+        json_bytes += len(client.get(f"{body['results_url']}?page={page}&page_size=10000", headers=headers).data)
+        pages += 1
+    print(f'  JSON pages ({pages} requests, row + prediction only): {time.perf_counter() - start:.2f}s, '
+          f'{json_bytes / 1e6:.1f} MB')
+    for export_format in ('csv', 'parquet'):
+        start = time.perf_counter()
+        response = client.get(f"{body['export_url']}?format={export_format}", headers=headers)
+        size = len(response.data)
+        print(f'  {export_format} export (inputs + prediction + version): {time.perf_counter() - start:.2f}s, '
+              f'{size / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('RESULT EXPORT TESTS')
+    print('=' * 80)
+    test_formats_round_trip()
+    test_rejected_rows_exported()
+    test_constant_memory()
+    test_api_export()
+    print('\nBenchmark:')
+    benchmark()
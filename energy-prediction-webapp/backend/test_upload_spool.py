@@ -0,0 +1,144 @@
+"""
+Test script for spooled uploads
+Checks that large uploads are written to the spool folder and removed after the
+request, that uploads beyond the old 16 MB limit are scored and that jobs
+hard-link spooled uploads instead of copying them
+"""
+
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask, jsonify, request
+from werkzeug.datastructures import FileStorage
+
+from file_ingest import upload_path
+from prediction_jobs import save_upload
+from upload_spool import SPOOL_PREFIX, SpoolingRequest, remove_stale_spool_files, spool_file
+
+
+def big_csv(n_rows, note_bytes=0):
+    """Valid input rows, padded with an ignored notes column to reach a given size"""
+    note = 'x' * note_bytes
+    lines = ['temperature,humidity,square_footage,month,time,hvac_appliances,notes']
+    lines += [f'{15 + i % 20},{40 + i % 30},{2000 + i % 5000},{1 + i % 12},{i % 24},{i % 4},{note}' for i in range(n_rows)]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def test_large_parts_spooled_and_removed():
+    with tempfile.TemporaryDirectory() as spool:
+        mini = Flask('spool-test')
+
+        class Request(SpoolingRequest):
+            spool_folder = spool
+
+        mini.request_class = Request
+        seen = {}
+
+        @mini.route('/upload', methods=['POST'])
+        def upload():
+            seen['path'] = upload_path(request.files['file'])
+            seen['listing'] = os.listdir(spool)
+            return jsonify({'bytes': len(request.files['file'].read())})
+
+        client = mini.test_client()
+        data = os.urandom(2 * 1024 * 1024)
+        response = client.post('/upload', data={'file': (io.BytesIO(data), 'meters.csv')})
+        assert response.get_json()['bytes'] == len(data)
+        assert seen['path'] and os.path.dirname(seen['path']) == os.path.abspath(spool), seen
+        assert seen['listing'][0].startswith(SPOOL_PREFIX)
+        assert os.listdir(spool) == [], 'spool file left behind'
+
+        response = client.post('/upload', data={'file': (io.BytesIO(b'tiny'), 'meters.csv')})
+        assert seen['path'] is None and seen['listing'] == []
+    print('✓ A 2 MB upload is spooled to a named file and removed after the request; small ones stay in memory')
+
+
+def test_stale_files_removed():
+    with tempfile.TemporaryDirectory() as spool:
+        old = os.path.join(spool, SPOOL_PREFIX + 'old.part')
+        fresh = os.path.join(spool, SPOOL_PREFIX + 'fresh.part')
+        other = os.path.join(spool, 'notes.txt')
+        for path in (old, fresh, other):
+            open(path, 'wb').close()
+        os.utime(old, (time.time() - 7200,) * 2)
+        os.utime(other, (time.time() - 7200,) * 2)
+        assert remove_stale_spool_files(spool) == 1
+        assert sorted(os.listdir(spool)) == sorted([os.path.basename(fresh), 'notes.txt'])
+    print('✓ Stale spool files from dead processes are removed; recent and unrelated files are kept')
+
+
+def test_job_links_spooled_upload():
+    with tempfile.TemporaryDirectory() as tmp:
+        spooled = spool_file(tmp)
+        spooled.write(big_csv(100))
+        spooled.seek(0)
+        destination = os.path.join(tmp, 'upload.csv')
+        save_upload(FileStorage(stream=spooled, filename='meters.csv'), destination)
+        assert os.stat(destination).st_ino == os.stat(spooled.name).st_ino
+        spooled.close()  # The request ends; the job keeps its link
+        assert os.path.getsize(destination) == len(big_csv(100))
+
+        in_memory = os.path.join(tmp, 'copy.csv')
+        save_upload(FileStorage(stream=io.BytesIO(b'temperature\n20\n'), filename='m.csv'), in_memory)
+        assert open(in_memory, 'rb').read() == b'temperature\n20\n'
+    print('✓ Jobs hard-link spooled uploads; in-memory uploads are copied')
+
+
+def test_api_beyond_old_limit():
+    import app
+
+    client = app.app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'demo@example.com', 'password': 'password123'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    data = big_csv(20000, note_bytes=1000)  # ~20 MB, over the old 16 MB cap
+    response = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(data), 'campus.csv')})
+    body = response.get_json()
+    assert response.status_code == 200 and body['total_rows'] == 20000, body.get('error')
+    assert not [n for n in os.listdir(app.UPLOAD_SPOOL_FOLDER) if n.startswith(SPOOL_PREFIX)]
+
+    limit = app.app.config['MAX_CONTENT_LENGTH']
+    app.app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
+    try:
+        response = client.post('/api/predict/file', headers=headers, data={'file': (io.BytesIO(data), 'campus.csv')})
+    finally:
+        app.app.config['MAX_CONTENT_LENGTH'] = limit
+    assert response.status_code == 413 and 'too large' in response.get_json()['error']
+    print(f'✓ API: {len(data) / 1e6:.0f} MB upload scored ({body["total_rows"]} rows); '
+          f'over the cap gives 413 "{response.get_json()["error"]}"')
+
+
+def benchmark(size_mb=128):
+    """Handing a spooled upload to a background job: copy (old) vs hard link"""
+    with tempfile.TemporaryDirectory() as tmp:
+        spooled = spool_file(tmp)
+        block = os.urandom(1 << 20)
+        for _ in range(size_mb):
+            spooled.write(block)
+        spooled.seek(0)
+        upload = FileStorage(stream=spooled, filename='campus.csv')
+
+        start = time.perf_counter()
+        upload.save(os.path.join(tmp, 'copied.csv'))
+        copy_s = time.perf_counter() - start
+        spooled.seek(0)
+
+        start = time.perf_counter()
+        save_upload(upload, os.path.join(tmp, 'linked.csv'))
+        link_s = time.perf_counter() - start
+        spooled.close()
+    print(f'  {size_mb} MB upload into the jobs folder: copy {copy_s * 1000:.0f} ms, link {link_s * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    print('=' * 80)
+    print('UPLOAD SPOOL TESTS')
+    print('=' * 80)
+    test_large_parts_spooled_and_removed()
+    test_stale_files_removed()
+    test_job_links_spooled_upload()
+    test_api_beyond_old_limit()
+    print('\nBenchmark:')
+    benchmark()
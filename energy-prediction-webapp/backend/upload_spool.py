@@ -0,0 +1,103 @@
+"""
+Disk spooling for large uploads
+File parts of big multipart requests are written straight to a named file in
+the spool folder while the request body is read, instead of an anonymous temp
+file, so readers can memory-map the upload, PDF extraction processes can open
+it by path and background jobs can hard-link it rather than copy it.
+Every file part is also hashed as it is written, so the result cache can
+recognise a re-uploaded file without reading it again.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+
+from flask import Request
+
+DEFAULT_MAX_UPLOAD_MB = 512
+SPOOL_THRESHOLD_BYTES = 500 * 1024  # Smaller requests stay in memory, as werkzeug does by default
+SPOOL_PREFIX = 'upload-'
+SPOOL_MAX_AGE_SECONDS = 3600  # Spool files this old were left behind by a killed process
+
+
+def spool_file(folder):
+    """A named temporary file in folder, deleted when it is closed"""
+    return tempfile.NamedTemporaryFile('w+b', dir=os.path.abspath(folder), prefix=SPOOL_PREFIX,
+                                       suffix='.part', delete=True)
+
+
+class HashingStream:
+    """File object wrapper that hashes (SHA-256) everything written through it"""
+
+    def __init__(self, file):
+        self._file = file
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+def upload_digest(file):
+    """SHA-256 hex digest of an upload's content: taken while it was received, else read from the file"""
+    stream = getattr(file, 'stream', file)  # werkzeug FileStorage
+    if isinstance(stream, HashingStream):
+        return stream.hexdigest()
+    # Not received through SpoolingRequest: hash it in one pass and rewind
+    digest = hashlib.sha256()
+    position = stream.tell()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(1 << 20), b''):
+        digest.update(block)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+class SpoolingRequest(Request):
+    """Request class that spools uploaded files to spool_folder (set by the app) and hashes them"""
+
+    spool_folder = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.spool_folder is None:
+            stream = super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        elif total_content_length is not None and total_content_length <= SPOOL_THRESHOLD_BYTES:
+            stream = io.BytesIO()
+        else:
+            # Closed (and so removed) with the request's files when the request ends
+            stream = spool_file(self.spool_folder)
+        return HashingStream(stream)
+
+
+def remove_stale_spool_files(folder, max_age_seconds=SPOOL_MAX_AGE_SECONDS):
+    """Delete spool files left by processes that died mid-request. Returns how many were removed."""
+    if not os.path.isdir(folder):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if name.startswith(SPOOL_PREFIX) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue  # Removed by its own request in the meantime
+    return removed
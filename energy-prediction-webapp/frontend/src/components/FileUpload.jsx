@@ -1,7 +1,7 @@
 import React, { useRef, useState } from 'react';
 import { Upload, FileText } from 'lucide-react';
 
-export const FileUpload = ({ onFileSelect, accept = '.csv,.pdf,.txt' }) => {
+export const FileUpload = ({ onFileSelect, accept = '.csv,.pdf,.txt,.parquet,.arrow,.feather,.gz,.bz2,.zst' }) => {
   const fileInputRef = useRef(null);
   const [fileName, setFileName] = useState('');
   const [isDragging, setIsDragging] = useState(false);
@@ -58,7 +58,7 @@ export const FileUpload = ({ onFileSelect, accept = '.csv,.pdf,.txt' }) => {
         {fileName || 'Drag and drop your file'}
       </p>
       <p className="text-slate-400 text-sm">
-        or click to select (CSV, PDF, TXT)
+        or click to select (CSV, PDF, TXT, Parquet, Arrow)
       </p>
       {fileName && (
         <div className="mt-4 flex items-center justify-center gap-2 text-green-400">
@@ -70,22 +70,28 @@ export const Chatbot = () => {
     setInputValue('');
     setLoading(true);
 
+    // The bot's reply grows as Gemini streams it; other answers arrive whole
+    const botId = messages.length + 2;
+    const showBotMessage = (text, extra = {}) =>
+      setMessages(prev => [
+        ...prev.filter(m => m.id !== botId),
+        { id: botId, text, sender: 'bot', timestamp: new Date(), ...extra },
+      ]);
+    let streamed = '';
+
     try {
-      const response = await chatbotService.sendMessage(messageText);
-      const botMessage = {
-        id: messages.length + 2,
-        text: response.data.response,
-        sender: 'bot',
-        timestamp: new Date(),
-        isPrediction: response.data.is_prediction,
-      };
-      setMessages(prev => [...prev, botMessage]);
+      const data = await chatbotService.streamMessage(messageText, (text) => {
+        streamed += text;
+        showBotMessage(streamed, { streaming: true });
+      });
+      showBotMessage(data.response, { isPrediction: data.is_prediction });
       
       // Update suggested questions if provided
-      if (response.data.suggested_questions) {
-        setSuggestedQuestions(response.data.suggested_questions);
+      if (data.suggested_questions) {
+        setSuggestedQuestions(data.suggested_questions);
       }
     } catch (error) {
+      if (streamed) showBotMessage(streamed);
       setToast({ type: 'error', message: error.response?.data?.error || 'Failed to send message' });
     } finally {
       setLoading(false);
@@ -179,7 +185,7 @@ export const Chatbot = () => {
                   )}
                 </div>
               ))}
-              {loading && (
+              {loading && !messages[messages.length - 1]?.streaming && (
                 <div className="flex justify-start">
                   <div className="bg-slate-700 px-4 py-2 rounded-lg rounded-bl-none">
                     <div className="flex gap-2">
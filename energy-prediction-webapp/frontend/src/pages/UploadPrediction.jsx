@@ -10,6 +10,10 @@ export const UploadPrediction = () => {
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
   const [toast, setToast] = useState(null);
+  const [rows, setRows] = useState([]);
+  const [page, setPage] = useState(1);
+  const [loadingRows, setLoadingRows] = useState(false);
+  const [exporting, setExporting] = useState(null);
 
   const handleFileSelect = async (file) => {
     setSelectedFile(file);
@@ -19,6 +23,9 @@ export const UploadPrediction = () => {
     try {
       const response = await predictionService.predictFile(file);
       setResults(response.data);
+      // Only the first page of rows comes with the response; the rest is fetched on demand
+      setRows(response.data.predictions);
+      setPage(1);
       setToast({ type: 'success', message: `Processed ${response.data.total_rows} rows successfully!` });
     } catch (error) {
       setToast({ type: 'error', message: error.response?.data?.error || 'File upload failed' });
@@ -28,6 +35,45 @@ export const UploadPrediction = () => {
     }
   };
 
+  const loadMoreRows = async () => {
+    setLoadingRows(true);
+    try {
+      const response = await predictionService.getFileResults(results.job_id, page + 1, results.page_size);
+      setRows((current) => [...current, ...response.data.predictions]);
+      setPage(page + 1);
+    } catch (error) {
+      setToast({ type: 'error', message: error.response?.data?.error || 'Could not load more rows' });
+    } finally {
+      setLoadingRows(false);
+    }
+  };
+
+  const downloadResults = async (format) => {
+    setExporting(format);
+    try {
+      const response = await predictionService.exportResults(results.job_id, format);
+      const baseName = (results.filename || 'results').split('.')[0];
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${baseName}-predictions.${format}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      setToast({ type: 'error', message: 'Could not download results' });
+    } finally {
+      setExporting(null);
+    }
+  };
+
+  const statistics = results?.statistics;
+  const checkedRows = results?.validation?.checked_rows || 0;
+  const successRate = checkedRows ? (results.validation.valid_rows / checkedRows) * 100 : 100;
+  const busiestMonth = statistics?.by_month?.reduce(
+    (best, month) => (month.total_kwh > best.total_kwh ? month : best),
+    statistics.by_month[0]
+  );
+
   return (
     <div className="container py-12">
       <h1 className="text-4xl font-bold mb-12 animate-fadeIn">File-Based Prediction</h1>
@@ -45,9 +91,12 @@ export const UploadPrediction = () => {
               <ul className="space-y-1 text-xs">
                 <li>• CSV (.csv)</li>
                 <li>• Text (.txt)</li>
+                <li>• Compressed CSV/TXT (.gz, .bz2, .zst)</li>
                 <li>• PDF (.pdf)</li>
+                <li>• Parquet (.parquet)</li>
+                <li>• Arrow / Feather (.arrow, .feather)</li>
               </ul>
-              <p className="mt-3 text-xs text-slate-400">Max file size: 16MB</p>
+              <p className="mt-3 text-xs text-slate-400">Max file size: 512MB</p>
             </div>
           </div>
         </div>
@@ -75,18 +124,49 @@ export const UploadPrediction = () => {
                 <div className="card text-center">
                   <p className="text-slate-400 text-sm">Avg Prediction</p>
                   <p className="text-3xl font-bold text-green-400">
-                    {results.average_prediction.toFixed(0)} kWh
+                    {results.average_prediction?.toFixed(0) ?? '-'} kWh
                   </p>
                 </div>
                 <div className="card text-center">
                   <p className="text-slate-400 text-sm">Success Rate</p>
-                  <p className="text-3xl font-bold text-yellow-400">100%</p>
+                  <p className="text-3xl font-bold text-yellow-400">{successRate.toFixed(0)}%</p>
                 </div>
               </div>
 
+              {statistics?.count > 0 && (
+                <div className="card">
+                  <h4 className="font-bold mb-4">Summary</h4>
+                  <div className="grid grid-cols-2 md:grid-cols-4 gap-4 text-sm">
+                    <div>
+                      <p className="text-slate-400">Total</p>
+                      <p className="font-semibold">{statistics.total_kwh.toFixed(0)} kWh</p>
+                    </div>
+                    <div>
+                      <p className="text-slate-400">Median</p>
+                      <p className="font-semibold">{statistics.percentiles.p50.toFixed(1)} kWh</p>
+                    </div>
+                    <div>
+                      <p className="text-slate-400">95th percentile</p>
+                      <p className="font-semibold">{statistics.percentiles.p95.toFixed(1)} kWh</p>
+                    </div>
+                    <div>
+                      <p className="text-slate-400">Peak</p>
+                      <p className="font-semibold">
+                        {statistics.max_kwh.toFixed(1)} kWh (row #{statistics.peak_rows[0].row + 1})
+                      </p>
+                    </div>
+                  </div>
+                  {busiestMonth && busiestMonth.rows > 0 && (
+                    <p className="text-slate-400 text-xs mt-4">
+                      Highest total in month {busiestMonth.month}: {busiestMonth.total_kwh.toFixed(0)} kWh over {busiestMonth.rows} rows
+                    </p>
+                  )}
+                </div>
+              )}
+
               <div className="card">
                 <h4 className="font-bold mb-4">Detailed Predictions</h4>
-                <div className="overflow-x-auto">
+                <div className="overflow-x-auto max-h-96 overflow-y-auto">
                   <table className="w-full text-sm">
                     <thead>
                       <tr className="border-b border-slate-700">
@@ -96,7 +176,7 @@ export const UploadPrediction = () => {
                       </tr>
                     </thead>
                     <tbody>
-                      {results.predictions.slice(0, 10).map((pred) => (
+                      {rows.map((pred) => (
                         <tr key={pred.row} className="border-b border-slate-700/50 hover:bg-slate-700/30">
                           <td className="py-2 px-2">#{pred.row + 1}</td>
                           <td className="py-2 px-2 font-semibold">{pred.prediction.toFixed(2)}</td>
@@ -107,14 +187,34 @@ export const UploadPrediction = () => {
                       ))}
                     </tbody>
                   </table>
-                  {results.predictions.length > 10 && (
-                    <p className="text-center text-slate-400 text-xs py-2">
-                      ... and {results.predictions.length - 10} more predictions
-                    </p>
+                  {rows.length < results.total_rows && (
+                    <button
+                      onClick={loadMoreRows}
+                      disabled={loadingRows}
+                      className="btn btn-secondary w-full mt-4 text-sm"
+                    >
+                      {loadingRows ? 'Loading...' : `Show more (${results.total_rows - rows.length} remaining)`}
+                    </button>
                   )}
                 </div>
               </div>
 
+              {/* Files that fit in one page come back whole, without a job to export from */}
+              {results.export_url && (
+                <div className="grid grid-cols-2 gap-4">
+                  {['csv', 'parquet'].map((format) => (
+                    <button
+                      key={format}
+                      onClick={() => downloadResults(format)}
+                      disabled={exporting !== null}
+                      className="btn btn-primary w-full"
+                    >
+                      {exporting === format ? 'Preparing...' : `Download ${format === 'csv' ? 'CSV' : 'Parquet'}`}
+                    </button>
+                  ))}
+                </div>
+              )}
+
               <button
                 onClick={() => setResults(null)}
                 className="btn btn-secondary w-full"
@@ -26,13 +26,26 @@ export const predictionService = {
       headers: getAuthHeader(),
     }),
   
-  predictFile: (file) => {
+  predictFile: (file, pageSize = 100) => {
     const formData = new FormData();
     formData.append('file', file);
     return axios.post(`${API_BASE_URL}/predict/file`, formData, {
+      params: { page_size: pageSize },
       headers: { ...getAuthHeader(), 'Content-Type': 'multipart/form-data' },
     });
   },
+
+  getFileResults: (jobId, page, pageSize) =>
+    axios.get(`${API_BASE_URL}/predict/jobs/${jobId}/results`, {
+      params: { page, page_size: pageSize },
+      headers: getAuthHeader(),
+    }),
+  exportResults: (jobId, format = 'csv') =>
+    axios.get(`${API_BASE_URL}/predict/jobs/${jobId}/export`, {
+      params: { format },
+      headers: getAuthHeader(),
+      responseType: 'blob',
+    }),
 };
 
 export const chatbotService = {
@@ -41,6 +54,39 @@ export const chatbotService = {
       headers: getAuthHeader(),
     }),
   
+  // Server-sent events: onToken(text) for each chunk of a Gemini answer as it is
+  // generated; resolves with the final payload (the only event for other answers).
+  // Errors are shaped like axios errors (error.response.data.error).
+  streamMessage: async (message, onToken) => {
+    const response = await fetch(`${API_BASE_URL}/chatbot/stream`, {
+      method: 'POST',
+      headers: { ...getAuthHeader(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message }),
+    });
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}));
+      throw Object.assign(new Error(data.error || 'Failed to send message'), { response: { data } });
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'token') onToken?.(data.text);
+        if (event === 'done') return data;
+      }
+    }
+    throw Object.assign(new Error('Chatbot stream ended early'), { response: { data: {} } });
+  },
+
   sendVoice: (audioFile) => {
     const formData = new FormData();
     formData.append('audio', audioFile);